@@ -0,0 +1,228 @@
+"""
+Batch inference offline untuk Arcana AI - baca prompt dari JSONL, tulis hasil bertahap dengan checkpoint
+
+Usage: python batch.py requests.jsonl results.jsonl
+
+Setiap baris input berisi salah satu dari:
+  {"id": ..., "prompt": "..."}                     -> raw completion
+  {"id": ..., "messages": [...]}                   -> chat OpenAI-style
+  {"id": ..., "user_message": "...", "language": "english", "mode": "coding"}
+  {"request_id": ..., "title": "...", "body": "..."}
+Parameter sampling (max_tokens, temperature, seed, ...) boleh ikut di tiap baris.
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict
+
+from config.settings import ModelConfig, GenerationConfig, AppConfig
+from config.prompts import get_system_prompt, get_chat_prompt, get_messages_prompt
+from core.streaming import stream_generate
+from core.model_loader import load_llama
+from core.hardware import AutoTuner
+from core.prefix_cache import PrefixStateCache, kv_config_tag
+from core.memory_profile import resolve_memory_profile
+from core.context_packer import ContextPacker, make_token_counter
+from core.metrics import summarize_results
+
+
+class BatchCheckpoint:
+    """Offset byte input yang semua barisnya sebelum itu sudah selesai"""
+    def __init__(self, path, input_path):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.offset = 0
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get('input') == self.input_path:
+                    self.offset = int(data.get('offset', 0))
+            except Exception as e:
+                print(f"⚠️ Checkpoint rusak, mulai dari awal: {e}")
+
+    def save(self, offset):
+        self.offset = offset
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'input': self.input_path, 'offset': offset}, f)
+        os.replace(tmp_path, self.path)
+
+
+def read_chunks(path, start_offset, chunk_size):
+    """
+    Yield (items, end_offset), item = (offset, dict, None) per baris input,
+    atau (offset, None, pesan error) untuk baris yang bukan object JSON valid.
+    """
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        chunk = []
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                # Baris rusak tidak menghentikan batch, jadi record error di output
+                try:
+                    item = json.loads(line)
+                except ValueError as e:
+                    chunk.append((offset, None, f"Invalid JSON: {e}"))
+                else:
+                    if isinstance(item, dict):
+                        chunk.append((offset, item, None))
+                    else:
+                        chunk.append((offset, None, "Baris input harus berupa object JSON"))
+            if len(chunk) >= chunk_size:
+                yield chunk, f.tell()
+                chunk = []
+        if chunk:
+            yield chunk, f.tell()
+
+
+def read_done_ids(output_path):
+    """Id yang sudah ada di output (untuk resume di tengah chunk)"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def item_id(item, offset):
+    return str(item.get('id') or item.get('request_id') or f"offset-{offset}")
+
+
+def build_item_prompt(item, app_config, packer, max_tokens):
+    """Return (system_prompt, formatted_prompt); system_prompt None untuk raw prompt"""
+    language = item.get('language', app_config.language)
+    mode = item.get('mode', app_config.mode)
+    if 'prompt' in item:
+        return None, item['prompt']
+    if 'messages' in item:
+        return get_messages_prompt(item['messages'], language, mode, packer=packer, max_tokens=max_tokens)
+
+    user_message = item.get('user_message')
+    if user_message is None:
+        user_message = "\n\n".join(part for part in (item.get('title'), item.get('body')) if part)
+    if not user_message:
+        raise ValueError("Baris input tidak punya prompt, messages, user_message, atau title/body")
+    system_prompt = get_system_prompt(language, mode)
+    return system_prompt, get_chat_prompt(system_prompt, user_message, packer=packer, max_tokens=max_tokens)
+
+
+def run_batch(input_path, output_path, chunk_size=64, resume=True, memory_profile=None):
+    model_config = ModelConfig()
+    app_config = AppConfig()
+    profile = resolve_memory_profile(memory_profile or app_config.memory_profile)
+    print(f"🧠 Memory profile: {model_config.apply_memory_profile(profile)}")
+
+    checkpoint = BatchCheckpoint(output_path + ".ckpt", input_path)
+    if not resume or not os.path.exists(output_path):
+        checkpoint.offset = 0
+        open(output_path, "w").close()
+    done_ids = read_done_ids(output_path)
+    if checkpoint.offset or done_ids:
+        print(f"⏩ Resume dari byte {checkpoint.offset}, {len(done_ids)} hasil sudah ada")
+
+    auto_tuner = None
+    if app_config.auto_tune:
+        auto_tuner = AutoTuner(app_config.cache_dir, model_config)
+        print(f"🔧 Hardware profile: {auto_tuner.probe()}")
+
+    print("🔮 Loading magical model...")
+    llm = load_llama(model_config)
+    if auto_tuner and auto_tuner.needs_calibration():
+        print("🔧 Calibrating for this machine...")
+        auto_tuner.finish(llm)
+    packer = ContextPacker(make_token_counter(llm), model_config.n_ctx)
+    prefix_cache = None
+    if app_config.use_prefix_cache:
+        prefix_cache = PrefixStateCache(
+            app_config.cache_dir,
+            model_config.model_path,
+            config_tag=kv_config_tag(model_config, llm.n_ctx())
+        )
+
+    results = []
+    started = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out:
+        for chunk, end_offset in read_chunks(input_path, checkpoint.offset, chunk_size):
+            # Kelompokkan per system prompt supaya prefix KV dipakai ulang berturut-turut
+            groups = OrderedDict()
+            for offset, item, error in chunk:
+                rid = item_id(item or {}, offset)
+                if rid in done_ids:
+                    continue
+                if error is None:
+                    gen_config = GenerationConfig()
+                    try:
+                        gen_config.apply_request_params(item)
+                        gen_config.stream = False
+                        system_prompt, prompt = build_item_prompt(item, app_config, packer, gen_config.max_tokens)
+                    except (ValueError, KeyError, TypeError) as e:
+                        error = str(e)
+                if error is not None:
+                    print(f"❌ {rid}: {error}")
+                    out.write(json.dumps({'id': rid, 'error': error}, ensure_ascii=False) + "\n")
+                    out.flush()
+                    done_ids.add(rid)
+                    continue
+                groups.setdefault(system_prompt, []).append((rid, prompt, gen_config))
+
+            for system_prompt, items in groups.items():
+                for rid, prompt, gen_config in items:
+                    record = {'id': rid}
+                    try:
+                        if system_prompt and prefix_cache:
+                            record['prefix'] = prefix_cache.prepare(llm, system_prompt)
+                        result = stream_generate(llm, prompt, gen_config)
+                        results.append(result)
+                        record.update({
+                            'text': result.text.strip(),
+                            'finish_reason': result.finish_reason,
+                            'metrics': result.to_dict()
+                        })
+                        print(f"✅ {rid}: {result.completion_tokens} tokens, {result.total_ms:.0f} ms")
+                    except Exception as e:
+                        record['error'] = str(e)
+                        print(f"❌ {rid}: {e}")
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    os.fsync(out.fileno())
+                    done_ids.add(rid)
+
+            checkpoint.save(end_offset)
+
+    summary = summarize_results(results, time.perf_counter() - started)
+    with open(output_path + ".summary.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arcana AI offline batch inference")
+    parser.add_argument("input", help="File JSONL berisi prompt")
+    parser.add_argument("output", help="File JSONL hasil (ditulis bertahap)")
+    parser.add_argument("--chunk-size", type=int, default=64,
+                        help="Jumlah baris yang dikelompokkan per system prompt sebelum checkpoint")
+    parser.add_argument("--no-resume", action="store_true", help="Abaikan checkpoint dan mulai dari awal")
+    parser.add_argument("--memory-profile", help="Profil memori (performance, standard, 8gb, 4gb, auto)")
+    args = parser.parse_args()
+
+    summary = run_batch(args.input, args.output, chunk_size=args.chunk_size, resume=not args.no_resume,
+                        memory_profile=args.memory_profile)
+    print("\n=== Batch Summary ===")
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Load test ArcanaEngine tanpa Tk: banyak client asyncio mengirim pesan bersamaan,
+diukur first chunk / total latency (termasuk waktu antre), throughput, dan berapa
+request yang ditolak antrian (backpressure) atau kena timeout.
+
+Usage:
+  python benchmarks/bench_engine.py --fake --clients 1 4 16
+  python benchmarks/bench_engine.py --fake --worker --clients 8 --queue-size 4 --timeout 2
+  python benchmarks/bench_engine.py --model model/Phi-3-mini-4k-instruct-q4.gguf --clients 2 --max-tokens 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import ModelConfig, GenerationConfig, AppConfig
+from core.engine import ArcanaEngine
+from core.model_loader import load_llama, load_worker_llama
+from core.inference_queue import QueueFullError
+from core.metrics import percentile
+
+MESSAGES = [
+    "Write a Python function that checks whether a string is a palindrome.",
+    "Explain why the sky is blue in two sentences.",
+    "Bagaimana cara membaca file CSV dengan pandas?",
+    "Apa perbedaan cuaca dan iklim?",
+]
+
+
+async def client(engine, index, requests, timeout, stats):
+    for turn in range(requests):
+        message = MESSAGES[(index + turn) % len(MESSAGES)]
+        started = time.perf_counter()
+        first = None
+        chunks = 0
+        try:
+            async for _ in engine.stream(message, timeout=timeout, speculative=False):
+                if first is None:
+                    first = time.perf_counter()
+                chunks += 1
+        except QueueFullError:
+            stats['rejected'] += 1
+            # Client yang ditolak mundur sebentar lalu lanjut, seperti client HTTP dengan retry
+            await asyncio.sleep(0.05)
+            continue
+        except asyncio.TimeoutError:
+            stats['timeouts'] += 1
+            continue
+        finished = time.perf_counter()
+        stats['total_ms'].append((finished - started) * 1000)
+        if first is not None:
+            stats['first_chunk_ms'].append((first - started) * 1000)
+        stats['chunks'] += chunks
+
+
+async def run(engine, clients, requests, timeout):
+    stats = {'first_chunk_ms': [], 'total_ms': [], 'chunks': 0, 'rejected': 0, 'timeouts': 0}
+    started = time.perf_counter()
+    await asyncio.gather(*(client(engine, index, requests, timeout, stats) for index in range(clients)))
+    elapsed = time.perf_counter() - started
+    return {
+        'clients': clients,
+        'completed': len(stats['total_ms']),
+        'rejected': stats['rejected'],
+        'timeouts': stats['timeouts'],
+        'first_chunk_p50_ms': round(percentile(stats['first_chunk_ms'], 50), 1),
+        'first_chunk_p95_ms': round(percentile(stats['first_chunk_ms'], 95), 1),
+        'total_p95_ms': round(percentile(stats['total_ms'], 95), 1),
+        'chunks_per_second': round(stats['chunks'] / elapsed, 1) if elapsed else 0.0
+    }
+
+
+async def main_async(args):
+    model_config = ModelConfig()
+    model_config.model_path = args.model
+    gen_config = GenerationConfig()
+    gen_config.max_tokens = args.max_tokens
+    gen_config.use_generation_guard = False  # Panjang output tetap; jawaban FakeLlama memang kalimat berulang
+    app_config = AppConfig()
+    app_config.auto_tune = False
+
+    fake_params = {}
+    if args.fake:
+        model_config.backend = "fake"
+        fake_params = {'load_ms': 10.0, 'prompt_ms_per_token': 0.05,
+                       'decode_ms_per_token': args.fake_decode_ms, 'reply_tokens': args.max_tokens}
+
+    # Backend pluggable: loader yang sama dengan bawaan engine, plus latency FakeLlama
+    def loader(config, path):
+        if args.worker:
+            return load_worker_llama(config, ring_kb=app_config.worker_ring_kb, model_path=path, **fake_params)
+        return load_llama(config, model_path=path, **fake_params)
+
+    engine = ArcanaEngine(model_config, gen_config, app_config, loader=loader, queue_size=args.queue_size)
+    started = time.perf_counter()
+    await engine.load()
+    print(f"🔮 Engine loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    rows = []
+    try:
+        for clients in args.clients:
+            row = await run(engine, clients, args.requests, args.timeout)
+            rows.append(row)
+            print(row)
+    finally:
+        await engine.close()
+    return rows
+
+
+def main():
+    defaults = ModelConfig()
+    parser = argparse.ArgumentParser(description="Arcana AI engine load test")
+    parser.add_argument("--model", default=defaults.model_path)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=4, help="Pesan per client")
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=None, help="Timeout per request (detik)")
+    parser.add_argument("--worker", action="store_true", help="Model di proses worker (RemoteLlama)")
+    parser.add_argument("--output", default="bench_results/engine.json")
+    parser.add_argument("--fake", action="store_true", help="Pakai FakeLlama, tanpa file model")
+    parser.add_argument("--fake-decode-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rows = asyncio.run(main_async(args))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    print(f"📊 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark redraw sidebar history: CTkScrollableFrame lama vs VirtualHistoryList
+
+Usage: python benchmarks/bench_history_sidebar.py --sizes 100 1000 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import customtkinter as ctk
+
+from ui.history_list import VirtualHistoryList, format_history_preview
+
+COLORS = {'bg': "#1A1A1A", 'hover': "#7A4BA8", 'text': "#B0B0B0"}
+
+
+def fake_history(size):
+    return [
+        {
+            'timestamp': f"2024-01-01T00:{i % 60:02d}:00",
+            'user_message': f"Pertanyaan nomor {i} tentang python list comprehension",
+            'ai_response': "Jawaban " * 20
+        }
+        for i in range(size)
+    ]
+
+
+def legacy_redraw(frame, history):
+    """Cara lama update_history_display: destroy lalu buat ulang semua tombol"""
+    for widget in frame.winfo_children():
+        widget.destroy()
+    for i, chat in enumerate(history):
+        btn = ctk.CTkButton(frame, text=format_history_preview(chat),
+                            command=lambda idx=i: None, height=50, anchor="w",
+                            fg_color=COLORS['bg'], hover_color=COLORS['hover'],
+                            text_color=COLORS['text'], corner_radius=8)
+        btn.pack(fill="x", pady=2, padx=5)
+
+
+def timed(window, fn):
+    start = time.perf_counter()
+    fn()
+    window.update_idletasks()
+    return (time.perf_counter() - start) * 1000
+
+
+def run(sizes, legacy_limit):
+    window = ctk.CTk()
+    window.geometry("300x600")
+    results = []
+
+    for size in sizes:
+        history = fake_history(size)
+        row = {'size': size}
+
+        if size <= legacy_limit:
+            frame = ctk.CTkScrollableFrame(window)
+            frame.pack(fill="both", expand=True)
+            window.update()
+            row['legacy_redraw_ms'] = timed(window, lambda: legacy_redraw(frame, history))
+            history.append(history[-1])
+            row['legacy_append_ms'] = timed(window, lambda: legacy_redraw(frame, history))
+            history.pop()
+            frame.destroy()
+
+        vlist = VirtualHistoryList(window, history, on_select=lambda idx: None, colors=COLORS)
+        vlist.pack(fill="both", expand=True)
+        window.update()
+        row['virtual_redraw_ms'] = timed(window, vlist.reset)
+        history.append(history[-1])
+        row['virtual_append_ms'] = timed(window, vlist.append_item)
+        row['virtual_widgets'] = vlist.rows_created()
+        vlist.destroy()
+
+        results.append(row)
+        print(row)
+
+    window.destroy()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--legacy-limit", type=int, default=2000,
+                        help="Ukuran maksimum yang dicoba dengan cara lama (lambat)")
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_limit)
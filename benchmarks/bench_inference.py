@@ -0,0 +1,154 @@
+"""
+Benchmark inferensi Arcana AI - load time, prompt eval, decode tokens/sec, first-token latency
+dengan sweep n_threads / n_batch / n_ctx. Hasil ditulis ke JSON dan CSV.
+
+Usage:
+  python benchmarks/bench_inference.py --threads 2 4 8 --batch 128 512 --ctx 2048 4096
+  python benchmarks/bench_inference.py --fake --thresholds benchmarks/thresholds_fake.json
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import ModelConfig, GenerationConfig
+from config.prompts import get_system_prompt, get_chat_prompt
+from core.streaming import stream_generate
+from core.model_loader import load_llama
+from core.metrics import percentile
+
+# Prompt tetap supaya hasil antar run bisa dibandingkan
+PROMPT_SET = [
+    ("english", "coding", "Write a Python function that checks whether a string is a palindrome."),
+    ("english", "general", "Explain why the sky is blue in two sentences."),
+    ("indonesia", "coding", "Bagaimana cara membaca file CSV dengan pandas?"),
+    ("indonesia", "general", "Apa perbedaan cuaca dan iklim?"),
+]
+
+
+def bench_config(model_config, max_tokens, repeat, fake_params):
+    """Load model sekali lalu jalankan semua prompt dari state kosong"""
+    started = time.perf_counter()
+    llm = load_llama(model_config, **fake_params)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    gen_config = GenerationConfig()
+    gen_config.max_tokens = max_tokens
+    gen_config.use_generation_guard = False  # Panjang output tetap; jawaban FakeLlama memang kalimat berulang
+    gen_config.seed = 42
+    gen_config.stream = True
+
+    first_token, prompt_tps, decode_tps = [], [], []
+    for _ in range(repeat):
+        for language, mode, question in PROMPT_SET:
+            prompt = get_chat_prompt(get_system_prompt(language, mode), question)
+            llm.reset()  # ukur prompt eval penuh, tanpa prefix match
+            result = stream_generate(llm, prompt, gen_config, on_text=lambda text: None)
+            if result.first_token_ms:
+                first_token.append(result.first_token_ms)
+                prompt_tps.append(result.prompt_tokens / (result.first_token_ms / 1000))
+            decode_tps.append(result.tokens_per_second)
+
+    del llm
+    return {
+        'n_threads': model_config.n_threads,
+        'n_batch': model_config.n_batch,
+        'n_ctx': model_config.n_ctx,
+        'load_ms': round(load_ms, 1),
+        'prompt_eval_tokens_per_second': round(percentile(prompt_tps, 50), 1),
+        'decode_tokens_per_second': round(percentile(decode_tps, 50), 2),
+        'first_token_p50_ms': round(percentile(first_token, 50), 1),
+        'first_token_p95_ms': round(percentile(first_token, 95), 1)
+    }
+
+
+def check_thresholds(rows, thresholds):
+    """Return daftar pelanggaran threshold regresi"""
+    failures = []
+    for row in rows:
+        label = f"threads={row['n_threads']} batch={row['n_batch']} ctx={row['n_ctx']}"
+        if 'max_load_ms' in thresholds and row['load_ms'] > thresholds['max_load_ms']:
+            failures.append(f"{label}: load_ms {row['load_ms']} > {thresholds['max_load_ms']}")
+        if 'max_first_token_ms' in thresholds and row['first_token_p95_ms'] > thresholds['max_first_token_ms']:
+            failures.append(f"{label}: first_token_p95_ms {row['first_token_p95_ms']} > {thresholds['max_first_token_ms']}")
+        if 'min_decode_tokens_per_second' in thresholds and \
+                row['decode_tokens_per_second'] < thresholds['min_decode_tokens_per_second']:
+            failures.append(f"{label}: decode_tokens_per_second {row['decode_tokens_per_second']} "
+                            f"< {thresholds['min_decode_tokens_per_second']}")
+        if 'min_prompt_eval_tokens_per_second' in thresholds and \
+                row['prompt_eval_tokens_per_second'] < thresholds['min_prompt_eval_tokens_per_second']:
+            failures.append(f"{label}: prompt_eval_tokens_per_second {row['prompt_eval_tokens_per_second']} "
+                            f"< {thresholds['min_prompt_eval_tokens_per_second']}")
+    return failures
+
+
+def write_results(rows, output_prefix):
+    os.makedirs(os.path.dirname(os.path.abspath(output_prefix)), exist_ok=True)
+    with open(output_prefix + ".json", "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    with open(output_prefix + ".csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    defaults = ModelConfig()
+    parser = argparse.ArgumentParser(description="Arcana AI inference benchmark")
+    parser.add_argument("--model", default=defaults.model_path)
+    parser.add_argument("--threads", type=int, nargs="+", default=[defaults.n_threads])
+    parser.add_argument("--batch", type=int, nargs="+", default=[defaults.n_batch])
+    parser.add_argument("--ctx", type=int, nargs="+", default=[defaults.n_ctx])
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="bench_results/inference",
+                        help="Prefix file output (.json dan .csv)")
+    parser.add_argument("--fake", action="store_true", help="Pakai FakeLlama, tanpa file model")
+    parser.add_argument("--fake-decode-ms", type=float, default=5.0)
+    parser.add_argument("--fake-prompt-ms", type=float, default=0.2)
+    parser.add_argument("--thresholds", help="File JSON threshold regresi, exit 1 kalau dilanggar")
+    args = parser.parse_args()
+
+    fake_params = {}
+    if args.fake:
+        fake_params = {
+            'load_ms': 10.0,
+            'decode_ms_per_token': args.fake_decode_ms,
+            'prompt_ms_per_token': args.fake_prompt_ms
+        }
+
+    rows = []
+    for n_threads, n_batch, n_ctx in itertools.product(args.threads, args.batch, args.ctx):
+        model_config = ModelConfig()
+        model_config.model_path = args.model
+        model_config.n_threads = n_threads
+        model_config.n_batch = n_batch
+        model_config.n_ctx = n_ctx
+        if args.fake:
+            model_config.backend = "fake"
+        row = bench_config(model_config, args.max_tokens, args.repeat, fake_params)
+        rows.append(row)
+        print(row)
+
+    write_results(rows, args.output)
+    print(f"📊 Results written to {args.output}.json / .csv")
+
+    if args.thresholds:
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            thresholds = json.load(f)
+        failures = check_thresholds(rows, thresholds)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            sys.exit(1)
+        print("✅ All thresholds passed")
+
+
+if __name__ == "__main__":
+    main()
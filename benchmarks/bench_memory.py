@@ -0,0 +1,93 @@
+"""
+Benchmark profil memori: setiap profil dimuat di proses worker baru (RSS tidak tercampur
+antar profil), lalu peak RSS generasi uji dibandingkan dengan estimasi GGUF dan target profil.
+
+Usage:
+  python benchmarks/bench_memory.py --profiles standard 8gb 4gb
+  python benchmarks/bench_memory.py --fake --profiles 8gb 4gb
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import ModelConfig, MEMORY_PROFILES
+from core.model_loader import load_worker_llama
+from core.model_registry import estimate_model_ram
+from core.gguf import inspect_gguf, plan_model_load, GGUFError
+from core.memory_profile import check_memory_budget
+
+
+def bench_profile(model_path, profile, fake):
+    model_config = ModelConfig()
+    model_config.model_path = model_path
+    if fake:
+        model_config.backend = "fake"
+    model_config.apply_memory_profile(profile)
+
+    # n_ctx disesuaikan ke target profil seperti preflight engine
+    try:
+        info = inspect_gguf(model_path)
+        model_config.n_ctx, _, notes = plan_model_load(info, model_config, psutil.virtual_memory().available)
+        for note in notes:
+            print(f"📐 {note}")
+    except (OSError, GGUFError):
+        pass
+
+    started = time.perf_counter()
+    llm = load_worker_llama(model_config)
+    load_ms = (time.perf_counter() - started) * 1000
+    try:
+        check = check_memory_budget(llm, model_config)
+    finally:
+        llm.close()
+    estimate = estimate_model_ram(model_path, model_config.n_ctx, model_config.n_batch,
+                                  model_config.type_k, model_config.type_v, model_config.speculative)
+    return {
+        'profile': profile,
+        'n_ctx': check['n_ctx'],
+        'type_k': check['type_k'],
+        'type_v': check['type_v'],
+        'load_ms': round(load_ms, 1),
+        'estimated_mb': round(estimate / 1024 ** 2, 1),
+        'peak_rss_mb': check['peak_rss_mb'],
+        'target_rss_mb': check['target_rss_mb'],
+        'within_budget': check['within_budget'],
+        'test_tokens_per_second': round(check['test_tokens'] * 1000 / check['test_ms'], 1) if check['test_ms'] else 0.0
+    }
+
+
+def main():
+    defaults = ModelConfig()
+    parser = argparse.ArgumentParser(description="Arcana AI memory profile benchmark")
+    parser.add_argument("--model", default=defaults.model_path)
+    parser.add_argument("--profiles", nargs="+", default=list(MEMORY_PROFILES), choices=list(MEMORY_PROFILES))
+    parser.add_argument("--output", default="bench_results/memory.json")
+    parser.add_argument("--fake", action="store_true", help="Pakai FakeLlama, tanpa file model")
+    args = parser.parse_args()
+
+    rows = []
+    for profile in args.profiles:
+        row = bench_profile(args.model, profile, args.fake)
+        rows.append(row)
+        print(row)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    print(f"📊 Results written to {args.output}")
+
+    over = [row['profile'] for row in rows if not row['within_budget']]
+    if over:
+        print(f"❌ Over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark insert chat_display: CTkTextbox tanpa batas vs TranscriptRenderer, terhadap panjang transcript
+
+Usage: python benchmarks/bench_transcript.py --lines 1000 10000 50000 --answer-kb 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import customtkinter as ctk
+
+from ui.transcript import TranscriptRenderer
+
+
+def fake_answer(size_kb):
+    """Jawaban panjang berisi blok kode, seperti output mode coding"""
+    block = "```python\ndef handler(request):\n    return {'status': 'ok', 'items': list(range(10))}\n```\n"
+    text = ""
+    while len(text) < size_kb * 1024:
+        text += "Berikut contoh implementasinya:\n" + block
+    return text
+
+
+def fill_legacy(textbox, lines):
+    textbox.configure(state="normal")
+    for i in range(0, lines, 4):
+        textbox.insert("end", f"👤 You: pertanyaan {i}\n\n🤖 Arcana: jawaban {i}\n\n")
+    textbox.configure(state="disabled")
+
+
+def fill_renderer(renderer, lines):
+    for i in range(0, lines, 4):
+        renderer.append(f"👤 You: pertanyaan {i}\n\n")
+        renderer.end_message()
+        renderer.append(f"🤖 Arcana: jawaban {i}\n\n")
+        renderer.end_message()
+
+
+def drain(window, renderer):
+    """Pompa mainloop sampai semua potongan tersisip, catat jeda terpanjang antar event"""
+    longest = 0.0
+    while renderer.pending():
+        start = time.perf_counter()
+        window.update()
+        longest = max(longest, (time.perf_counter() - start) * 1000)
+    return longest
+
+
+def run(line_counts, answer_kb, max_lines, chunk_chars):
+    window = ctk.CTk()
+    window.geometry("800x600")
+    answer = fake_answer(answer_kb)
+    results = []
+
+    for lines in line_counts:
+        row = {'lines': lines, 'answer_kb': answer_kb}
+
+        textbox = ctk.CTkTextbox(window, wrap="word")
+        textbox.pack(fill="both", expand=True)
+        fill_legacy(textbox, lines)
+        window.update()
+        start = time.perf_counter()
+        textbox.configure(state="normal")
+        textbox.insert("end", answer)
+        textbox.see("end")
+        textbox.configure(state="disabled")
+        window.update_idletasks()
+        row['legacy_insert_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        textbox.destroy()
+
+        textbox = ctk.CTkTextbox(window, wrap="word")
+        textbox.pack(fill="both", expand=True)
+        renderer = TranscriptRenderer(textbox, max_lines=max_lines, chunk_chars=chunk_chars)
+        fill_renderer(renderer, lines)
+        drain(window, renderer)
+        renderer.stats['max_op_ms'] = 0.0
+        start = time.perf_counter()
+        renderer.append(answer)
+        renderer.end_message()
+        longest_stall = drain(window, renderer)
+        window.update_idletasks()
+        row['renderer_total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        row['renderer_max_chunk_ms'] = round(renderer.stats['max_op_ms'], 1)
+        row['renderer_max_stall_ms'] = round(longest_stall, 1)
+        row['renderer_live_lines'] = renderer.live_lines()
+        row['renderer_trimmed'] = len(renderer.trimmed)
+        textbox.destroy()
+
+        results.append(row)
+        print(row)
+
+    window.destroy()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--answer-kb", type=int, default=20)
+    parser.add_argument("--max-lines", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.lines, args.answer_kb, args.max_lines, args.chunk_chars)
@@ -0,0 +1,173 @@
+"""
+Benchmark worker inferensi: latency round-trip RPC, overhead tokens/sec dan first token
+streaming lewat ring buffer dibanding in-process, serta waktu recovery setelah worker crash.
+
+Usage:
+  python benchmarks/bench_worker.py --fake --fake-decode-ms 0 5
+  python benchmarks/bench_worker.py --model model/Phi-3-mini-4k-instruct-q4.gguf --max-tokens 128
+  python benchmarks/bench_worker.py --fake --thresholds benchmarks/thresholds_worker_fake.json
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import ModelConfig, GenerationConfig
+from config.prompts import get_system_prompt, get_chat_prompt
+from core.streaming import stream_generate
+from core.model_loader import load_llama, load_worker_llama
+from core.inference_worker import WorkerCrashedError
+from core.metrics import percentile
+
+
+def bench_round_trip(llm, repeat):
+    """Latency satu panggilan kecil (tokenize pesan pendek), ms"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        llm.tokenize(b"Halo, apa kabar?", add_bos=False, special=True)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        'round_trip_p50_ms': round(percentile(samples, 50), 3),
+        'round_trip_p95_ms': round(percentile(samples, 95), 3)
+    }
+
+
+def bench_stream(llm, gen_config, repeat):
+    """
+    First token dan tokens/sec diukur dari waktu teks tiba di proses pemanggil
+    (bukan timing di dalam worker), jadi latency ring buffer ikut terhitung.
+    """
+    prompt = get_chat_prompt(get_system_prompt("english", "coding"),
+                             "Write a Python function that checks whether a string is a palindrome.")
+    first_token, tps = [], []
+    for _ in range(repeat):
+        llm.reset()
+        arrivals = []
+        started = time.perf_counter()
+        result = stream_generate(llm, prompt, gen_config, on_text=lambda text: arrivals.append(time.perf_counter()))
+        if not arrivals:
+            continue
+        first_token.append((arrivals[0] - started) * 1000)
+        if len(arrivals) > 1 and arrivals[-1] > arrivals[0]:
+            tps.append((result.completion_tokens - 1) / (arrivals[-1] - arrivals[0]))
+    return {
+        'first_token_p50_ms': round(percentile(first_token, 50), 2),
+        'tokens_per_second': round(percentile(tps, 50), 1)
+    }
+
+
+def bench_restart(llm, gen_config):
+    """Kill worker, ukur sampai request gagal terdeteksi dan worker baru siap melayani"""
+    started = time.perf_counter()
+    os.kill(llm.pid(), signal.SIGKILL)
+    try:
+        stream_generate(llm, "<|user|>hi<|end|>\n<|assistant|>", gen_config)
+    except WorkerCrashedError:
+        pass
+    llm.tokenize(b"ok", add_bos=False)
+    return {'restart_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+
+def run(model_config, fake_params, max_tokens, repeat, rpc_repeat, ring_kb):
+    gen_config = GenerationConfig()
+    gen_config.max_tokens = max_tokens
+    gen_config.use_generation_guard = False  # Panjang output tetap; jawaban FakeLlama memang kalimat berulang
+    gen_config.seed = 42
+
+    local = load_llama(model_config, **fake_params)
+    in_process = {**bench_round_trip(local, rpc_repeat), **bench_stream(local, gen_config, repeat)}
+    del local
+
+    remote = load_worker_llama(model_config, ring_kb=ring_kb, **fake_params)
+    try:
+        worker = {**bench_round_trip(remote, rpc_repeat), **bench_stream(remote, gen_config, repeat)}
+        if hasattr(signal, "SIGKILL"):
+            worker.update(bench_restart(remote, gen_config))
+    finally:
+        remote.close()
+
+    row = {
+        'decode_ms_per_token': fake_params.get('decode_ms_per_token'),
+        **{f"in_process_{key}": value for key, value in in_process.items()},
+        **{f"worker_{key}": value for key, value in worker.items()},
+    }
+    if in_process['tokens_per_second']:
+        row['tokens_per_second_overhead_pct'] = round(
+            (1 - worker['tokens_per_second'] / in_process['tokens_per_second']) * 100, 1)
+    row['first_token_overhead_ms'] = round(worker['first_token_p50_ms'] - in_process['first_token_p50_ms'], 2)
+    return row
+
+
+def check_thresholds(rows, thresholds):
+    failures = []
+    for row in rows:
+        label = f"decode_ms={row['decode_ms_per_token']}"
+        if 'max_round_trip_p95_ms' in thresholds and row['worker_round_trip_p95_ms'] > thresholds['max_round_trip_p95_ms']:
+            failures.append(f"{label}: worker_round_trip_p95_ms {row['worker_round_trip_p95_ms']} "
+                            f"> {thresholds['max_round_trip_p95_ms']}")
+        if 'max_first_token_overhead_ms' in thresholds and \
+                row['first_token_overhead_ms'] > thresholds['max_first_token_overhead_ms']:
+            failures.append(f"{label}: first_token_overhead_ms {row['first_token_overhead_ms']} "
+                            f"> {thresholds['max_first_token_overhead_ms']}")
+        # Overhead relatif hanya bermakna kalau decode punya latency realistis
+        if 'max_tokens_per_second_overhead_pct' in thresholds and row['decode_ms_per_token'] and \
+                row.get('tokens_per_second_overhead_pct', 0) > thresholds['max_tokens_per_second_overhead_pct']:
+            failures.append(f"{label}: tokens_per_second_overhead_pct {row['tokens_per_second_overhead_pct']} "
+                            f"> {thresholds['max_tokens_per_second_overhead_pct']}")
+    return failures
+
+
+def main():
+    defaults = ModelConfig()
+    parser = argparse.ArgumentParser(description="Arcana AI inference worker benchmark")
+    parser.add_argument("--model", default=defaults.model_path)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rpc-repeat", type=int, default=500)
+    parser.add_argument("--ring-kb", type=int, default=1024)
+    parser.add_argument("--output", default="bench_results/worker.json")
+    parser.add_argument("--fake", action="store_true", help="Pakai FakeLlama, tanpa file model")
+    parser.add_argument("--fake-decode-ms", type=float, nargs="+", default=[0.0, 5.0],
+                        help="0 = overhead IPC murni, 5+ = mendekati decode model kecil di CPU")
+    parser.add_argument("--thresholds", help="File JSON threshold regresi, exit 1 kalau dilanggar")
+    args = parser.parse_args()
+
+    model_config = ModelConfig()
+    model_config.model_path = args.model
+    sweeps = [{}]
+    if args.fake:
+        model_config.backend = "fake"
+        sweeps = [{'load_ms': 10.0, 'batch_overhead_ms': 0.0, 'prompt_ms_per_token': 0.01,
+                   'decode_ms_per_token': decode_ms, 'reply_tokens': args.max_tokens}
+                  for decode_ms in args.fake_decode_ms]
+
+    rows = []
+    for fake_params in sweeps:
+        row = run(model_config, fake_params, args.max_tokens, args.repeat, args.rpc_repeat, args.ring_kb)
+        rows.append(row)
+        print(row)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    print(f"📊 Results written to {args.output}")
+
+    if args.thresholds:
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            thresholds = json.load(f)
+        failures = check_thresholds(rows, thresholds)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            sys.exit(1)
+        print("✅ All thresholds passed")
+
+
+if __name__ == "__main__":
+    main()
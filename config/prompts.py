@@ -85,31 +85,84 @@ ANSWER FORMAT:
     return base_prompts[lang][mod]
 
 
-def get_chat_prompt(system_prompt, user_message, chat_history=None):
+def format_history_turn(chat):
+    """Format satu entry history menjadi turn user + assistant"""
+    return (f"<|user|>\n{chat['user_message']}<|end|>\n"
+            f"<|assistant|>\n{chat['ai_response']}<|end|>\n")
+
+
+def format_summary_block(summary):
+    """Ringkasan percakapan lama, disisipkan tepat setelah system prompt"""
+    if not summary:
+        return ""
+    return f"<|system|>\nSummary of the earlier conversation:\n{summary}<|end|>\n"
+
+
+def get_chat_prompt(system_prompt, user_message, chat_history=None, packer=None, max_tokens=2048, summary=None,
+                    retrieved=None, max_recent=None, retrieval_budget=None):
     """
-    Format prompt untuk chat dengan context management yang balanced
+    Format prompt untuk chat dengan context management yang balanced.
+    Kalau packer diberikan, history dipilih berdasarkan budget token model.
+    summary menggantikan turn lama yang sudah diringkas (chat_history cukup berisi sisanya).
+    retrieved/max_recent/retrieval_budget diteruskan ke packer (turn lama yang relevan + window terbaru).
     """
+    system_prompt = f"{system_prompt}{format_summary_block(summary)}"
     context = ""
     if chat_history and len(chat_history) > 0:
-        # Balanced context - cukup untuk continuity tapi tidak overload
-        recent_history = chat_history[-3:]  # 3 pesan terakhir untuk context yang baik
-        for chat in recent_history:
-            # Biarkan context lebih panjang untuk jawaban yang lengkap
-            user_msg = chat['user_message'][:150]  # Max 150 chars
-            ai_resp = chat['ai_response'][:200]    # Max 200 chars
-            
-            context += f"<|user|>\n{user_msg}<|end|>\n"
-            context += f"<|assistant|>\n{ai_resp}<|end|>\n"
+        if packer is not None:
+            packed = packer.pack(system_prompt, user_message, chat_history, max_tokens,
+                                 retrieved=retrieved, max_recent=max_recent,
+                                 retrieval_budget=retrieval_budget)
+            for chat in packed.turns:
+                context += format_history_turn(chat)
+        else:
+            # Fallback tanpa tokenizer - 3 pesan terakhir, dipotong per karakter
+            recent_history = chat_history[-3:]
+            for chat in recent_history:
+                user_msg = chat['user_message'][:150]  # Max 150 chars
+                ai_resp = chat['ai_response'][:200]    # Max 200 chars
+                
+                context += f"<|user|>\n{user_msg}<|end|>\n"
+                context += f"<|assistant|>\n{ai_resp}<|end|>\n"
     
     return f"{system_prompt}{context}<|user|>\n{user_message}<|end|>\n<|assistant|>\n"
 
 
+def get_messages_prompt(messages, language="indonesia", mode="coding", packer=None, max_tokens=2048):
+    """
+    Ubah daftar messages gaya OpenAI menjadi (system_prompt, formatted_prompt) Phi-3.
+    Tanpa pesan system, system prompt bawaan (language, mode) yang dipakai.
+    """
+    system_prompt = None
+    history = []
+    pending_user = None
+    for message in messages:
+        role = message.get('role')
+        content = message.get('content') or ""
+        if role == 'system':
+            system_prompt = f"<|system|>\n{content}<|end|>\n"
+        elif role == 'user':
+            if pending_user is not None:
+                history.append({'user_message': pending_user, 'ai_response': ""})
+            pending_user = content
+        elif role == 'assistant':
+            history.append({'user_message': pending_user or "", 'ai_response': content})
+            pending_user = None
+
+    if pending_user is None:
+        raise ValueError("Pesan terakhir harus dari role 'user'")
+
+    system_prompt = system_prompt or get_system_prompt(language, mode)
+    prompt = get_chat_prompt(system_prompt, pending_user, history, packer=packer, max_tokens=max_tokens)
+    return system_prompt, prompt
+
+
 def get_debug_info():
     """Info untuk debugging prompt settings"""
     return {
         "model_size": "3B",
         "optimization": "balanced_length",
-        "max_history": 3,
+        "max_history": "token_budget",
         "response_style": "clear_complete_explanations",
         "focus": "informative_structured_answers"
     }
@@ -121,30 +174,45 @@ PRESET_CONFIGS = {
         "language": "indonesia",
         "mode": "coding",
         "description": "ID + Coding",
-        "note": "Penjelasan lengkap dengan contoh kode"
+        "note": "Penjelasan lengkap dengan contoh kode",
+        # Kode banyak mengulang identifier dari prompt: prompt-lookup draft. Penalty sampling
+        # llama.cpp ikut membaca token draft yang belum diverifikasi, jadi preset speculative
+        # sengaja memakai repeat_penalty netral (loop tetap ditahan RepetitionGuard)
+        "speculative": True,
+        "sampling": {"repeat_penalty": 1.0},
+        "max_tokens": 1536  # Jawaban kode panjang, tapi tetap menyisakan context untuk history
     },
     "indonesia_general": {
         "language": "indonesia", 
         "mode": "general",
         "description": "ID + General",
-        "note": "Jawaban informatif dan mudah dipahami"
+        "note": "Jawaban informatif dan mudah dipahami",
+        "max_tokens": 768
     },
     "english_coding": {
         "language": "english",
         "mode": "coding", 
         "description": "EN + Coding",
-        "note": "Complete explanations with code examples"
+        "note": "Complete explanations with code examples",
+        "speculative": True,
+        "sampling": {"repeat_penalty": 1.0},
+        "max_tokens": 1536  # Jawaban kode panjang, tapi tetap menyisakan context untuk history
     },
     "english_general": {
         "language": "english",
         "mode": "general",
         "description": "EN + General", 
-        "note": "Informative and well-structured answers"
+        "note": "Informative and well-structured answers",
+        "max_tokens": 768
     }
 }
 
 
 # Quick preset functions untuk akses mudah
+def get_active_preset(language, mode):
+    """Preset yang cocok dengan language + mode saat ini (None kalau tidak ada)"""
+    return PRESET_CONFIGS.get(f"{language}_{mode}")
+
 def get_preset_config(preset_id):
     """Get preset configuration by ID"""
     return PRESET_CONFIGS.get(preset_id, PRESET_CONFIGS["indonesia_coding"])
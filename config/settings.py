@@ -15,16 +15,96 @@ def resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
+# Profil memori: n_ctx = batas atas (diturunkan sampai estimasi muat di target_rss_mb),
+# type_k/type_v = tipe KV cache llama.cpp. V cache terkuantisasi butuh flash attention.
+MEMORY_PROFILES = {
+    "performance": {
+        "description": "16 GB+ · weights locked in RAM",
+        "target_rss_mb": None,
+        "n_ctx": 4096, "type_k": "f16", "type_v": "f16", "flash_attn": False,
+        "use_mmap": True, "use_mlock": True
+    },
+    "standard": {
+        "description": "12 GB+ · 4K context, f16 KV",
+        "target_rss_mb": None,
+        "n_ctx": 4096, "type_k": "f16", "type_v": "f16", "flash_attn": False,
+        "use_mmap": True, "use_mlock": False
+    },
+    "8gb": {
+        "description": "8 GB · q8_0 KV, ~4 GB budget",
+        "target_rss_mb": 4096,
+        "n_ctx": 4096, "type_k": "q8_0", "type_v": "q8_0", "flash_attn": True,
+        "use_mmap": True, "use_mlock": False
+    },
+    "4gb": {
+        "description": "4-6 GB · 2K context, q4_0 KV",
+        "target_rss_mb": 3072,
+        "n_ctx": 2048, "type_k": "q4_0", "type_v": "q4_0", "flash_attn": True,
+        "use_mmap": True, "use_mlock": False
+    },
+}
+
+def auto_memory_profile(total_bytes):
+    """Profil default dari total RAM mesin"""
+    total_gb = total_bytes / 1024 ** 3
+    if total_gb >= 12:
+        return "standard"
+    if total_gb >= 7:  # "8 GB" biasanya terbaca ~7.6 GB
+        return "8gb"
+    return "4gb"
+
 class ModelConfig:
-    """Configuration untuk model Phi-3 dengan GPU support"""
-    def __init__(self):
+    """
+    Configuration untuk model Phi-3 dengan GPU support.
+    Keyword argument dianggap setting eksplisit dan tidak ditimpa auto-tuning hardware.
+    """
+    TUNABLE = ('n_threads', 'n_batch', 'n_gpu_layers')
+    PROFILE_FIELDS = ('n_ctx', 'type_k', 'type_v', 'flash_attn', 'use_mmap', 'use_mlock')
+
+    def __init__(self, **overrides):
+        self.model_dir = resource_path("model")
         self.model_path = resource_path("model/Phi-3-mini-4k-instruct-q4.gguf")
         self.n_ctx = 4096  # Context penuh
-        self.n_threads = max(1, os.cpu_count() - 1)
+        self.n_threads = max(1, os.cpu_count() - 1)  # Fallback sebelum probe hardware
         self.n_batch = 512  # Optimal batch size
         self.n_gpu_layers = 20  # GPU layers untuk Intel UHD
         self.verbose = False
-        self.use_mlock = False
+        self.use_mmap = True    # Weights di-mmap: halaman file bisa dilepas OS saat RAM sempit
+        self.use_mlock = False  # Kunci weights di RAM (tidak di-swap), butuh RAM lega
+        self.type_k = "f16"     # Tipe KV cache: "f16", "q8_0", atau "q4_0"
+        self.type_v = "f16"
+        self.flash_attn = False  # Wajib untuk type_v terkuantisasi
+        self.target_rss_mb = None  # Budget RSS profil memori, None = pakai RAM tersedia
+        self.memory_profile = None
+        self.speculative = False  # Muat dengan draft_model (logits_all) untuk preset speculative
+        self.backend = "llama"  # "fake" = FakeLlama untuk benchmark/CI tanpa file model
+        
+        for key, value in overrides.items():
+            if not hasattr(self, key):
+                raise ValueError(f"Unknown ModelConfig setting: {key}")
+            setattr(self, key, value)
+        self.explicit = set(overrides)
+    
+    def apply_memory_profile(self, name):
+        """Pakai profil memori untuk setting yang tidak diset eksplisit, return nama profil"""
+        if name not in MEMORY_PROFILES:
+            raise ValueError(f"Unknown memory profile: {name}")
+        profile = MEMORY_PROFILES[name]
+        for key in self.PROFILE_FIELDS:
+            if key not in self.explicit:
+                setattr(self, key, profile[key])
+        self.target_rss_mb = profile['target_rss_mb']
+        self.memory_profile = name
+        return name
+    
+    def apply_hardware_profile(self, profile):
+        """Pakai hasil auto-tuning untuk setting yang tidak diset eksplisit"""
+        applied = {}
+        for key in self.TUNABLE:
+            if key in profile and key not in self.explicit:
+                setattr(self, key, profile[key])
+                applied[key] = profile[key]
+        return applied
 
 class GenerationConfig:
     """Configuration untuk text generation yang optimal untuk Phi-3 3B"""
@@ -48,12 +128,24 @@ class GenerationConfig:
         self.stop_sequences = []  
         
         # Generation mode
-        self.stream = False       # Non-streaming untuk stability
+        self.stream = True        # Token tampil bertahap di chat_display
         self.echo = False         
         
         # Performance
         self.seed = -1           
         
+        # Response cache: otomatis kalau sampling deterministik, True = selalu pakai cache
+        self.cache_responses = False
+        
+        # Generation guard
+        self.context_margin = 16            # Token context yang selalu disisakan (draft speculative ikut dievaluasi)
+        self.use_generation_guard = True    # Hentikan loop repetisi / output tanpa kemajuan
+        self.repetition_ngram = 8           # n-gram yang berulang memicu pengecekan loop
+        self.repetition_min_repeats = 3     # Salinan pola berturut-turut sebelum dianggap loop
+        self.repetition_min_span = 48       # Panjang minimal loop (token), supaya "----" pendek tidak kena
+        self.repetition_max_period = 512    # Pola loop terpanjang yang dideteksi (token)
+        self.no_progress_tokens = 64        # Token berturut-turut tanpa teks selain whitespace
+        
     def get_generation_kwargs(self):
         """Return kwargs untuk llama.cpp generation"""
         return {
@@ -69,7 +161,49 @@ class GenerationConfig:
             'echo': self.echo,
             'seed': self.seed
         }
+
+    def is_deterministic(self):
+        """Output bisa diulang persis kalau seed tetap atau temperature 0"""
+        return self.seed != -1 or self.temperature == 0
+
+    def use_response_cache(self):
+        return self.is_deterministic() or self.cache_responses
+
+    def get_sampling_kwargs(self):
+        """Return kwargs untuk Llama.generate() (token-level streaming)"""
+        return {
+            'temp': self.temperature,
+            'top_p': self.top_p,
+            'top_k': self.top_k,
+            'repeat_penalty': self.repeat_penalty,
+            'frequency_penalty': self.frequency_penalty,
+            'presence_penalty': self.presence_penalty
+        }
     
+    def apply_request_params(self, params):
+        """Override sampling dari dict request (server / batch), key mengikuti OpenAI API"""
+        if 'max_tokens' in params:
+            self.max_tokens = int(params['max_tokens'])
+        if 'temperature' in params:
+            self.temperature = float(params['temperature'])
+        if 'top_p' in params:
+            self.top_p = float(params['top_p'])
+        if 'top_k' in params:
+            self.top_k = int(params['top_k'])
+        if params.get('seed') is not None:
+            self.seed = int(params['seed'])
+        if 'repeat_penalty' in params:
+            self.repeat_penalty = float(params['repeat_penalty'])
+        if 'presence_penalty' in params:
+            self.presence_penalty = float(params['presence_penalty'])
+        if 'frequency_penalty' in params:
+            self.frequency_penalty = float(params['frequency_penalty'])
+        stop = params.get('stop')
+        if stop:
+            # Stop token template Phi-3 tetap dipakai supaya jawaban tidak bocor ke turn berikutnya
+            self.stop_tokens = self.stop_tokens + ([stop] if isinstance(stop, str) else list(stop))
+        self.stream = bool(params.get('stream', False))
+
     def set_creative_mode(self):
         """Set parameters untuk mode kreatif"""
         self.temperature = 0.8
@@ -117,4 +251,49 @@ class AppConfig:
         self.window_size = "1000x700"
         self.theme = "dark"
         self.language = "indonesia"
-        self.mode = "coding"
\ No newline at end of file
+        self.mode = "coding"
+        self.stream_flush_ms = 33  # ~30 FPS, token digabung per frame
+        self.transcript_max_lines = 2000   # Baris live di chat_display, pesan lama dipangkas
+        self.transcript_chunk_chars = 2000  # Teks panjang disisipkan per potongan di idle callback
+        self.cache_dir = resource_path("cache")
+        self.use_prefix_cache = True  # Snapshot KV system prompt di cache_dir
+        self.history_preload = 200    # Entry history terbaru yang dibaca saat startup
+        self.response_cache_entries = 256
+        self.response_cache_disk_mb = 64
+        self.auto_tune = True  # Probe hardware + kalibrasi thread/batch sekali per mesin
+        self.model_ram_budget_mb = None  # Budget model resident, None = 60% RAM total
+        self.generation_queue_size = 8  # Pesan yang boleh antre saat model masih menjawab
+        self.inference_process = True   # Llama di proses worker terpisah (UI tidak ikut crash/tersendat)
+        self.worker_ring_kb = 1024      # Ring buffer shared memory untuk streaming token dari worker
+        self.memory_profile = "auto"    # Kunci MEMORY_PROFILES, "auto" = pilih dari total RAM
+        self.verify_memory_budget = True  # Ukur peak RSS saat generasi uji setelah profil dipakai
+        
+        # Telemetry
+        self.telemetry_interval_s = 1.0       # Sampling RSS/CPU saat idle
+        self.telemetry_busy_interval_s = 0.25  # Sampling lebih rapat selama generasi
+        self.metrics_log_interval_s = 10.0    # Sample idle ditulis ke metrics.jsonl paling sering segini
+        self.metrics_log_mb = 2               # metrics.jsonl dirotasi ke .1 setelah ukuran ini
+        
+        # Rolling summary turn lama
+        self.use_rolling_summary = True
+        self.summary_idle_ms = 3000     # Model harus idle selama ini sebelum meringkas
+        self.summary_keep_recent = 3    # Turn terbaru yang selalu dikirim utuh
+        self.summary_chunk_turns = 2    # Turn yang diringkas per job
+        self.summary_max_tokens = 256
+        
+        # Speculative decoding (prompt lookup) untuk preset yang mengaktifkannya. Preset itu
+        # memakai repeat_penalty 1.0; penalty lain (request/override) mematikan drafting
+        self.use_speculative = True
+        self.speculative_draft_tokens = 10
+        self.speculative_ngram = 3
+        
+        # Retrieval turn lama yang relevan
+        self.use_retrieval = True
+        self.retrieval_top_k = 3
+        self.retrieval_budget_tokens = 600  # Batas token turn hasil retrieval di context
+        self.retrieval_recent_turns = 3     # Window turn terbaru yang selalu dikirim
+        
+        # Sesi
+        self.session_state_disk_mb = 2048  # Total snapshot KV per sesi di cache/sessions
+        self.session_resume_turns = 5      # Turn terakhir yang ditampilkan saat pindah sesi
+        self.session_save_interval_s = 30  # Snapshot KV setelah giliran selesai paling sering segini
@@ -0,0 +1,111 @@
+"""
+Context packer untuk Phi-3 Chat App - isi history berdasarkan budget token, bukan jumlah karakter
+"""
+
+import hashlib
+
+from config.prompts import format_history_turn
+
+
+def approx_token_count(text):
+    """Perkiraan kasar (~3 karakter per token) kalau tokenizer model belum ada"""
+    return len(text) // 3 + 1
+
+
+def make_token_counter(llm):
+    """Token counter memakai tokenizer model yang sedang dimuat"""
+    def count(text):
+        return len(llm.tokenize(text.encode("utf-8"), add_bos=False, special=True))
+    return count
+
+
+class PackResult:
+    """Hasil packing beserta keputusan per entry untuk debugging"""
+    def __init__(self, budget):
+        self.budget = budget
+        self.used = 0
+        self.turns = []
+        self.decisions = []
+
+    def describe(self):
+        included = sum(1 for d in self.decisions if d['included'])
+        return f"{included}/{len(self.decisions)} turns, {self.used}/{self.budget} tokens"
+
+
+class ContextPacker:
+    """
+    Isi context dari turn terbaru ke belakang sampai budget
+    n_ctx - max_tokens - system_prompt - pesan user habis.
+    """
+    def __init__(self, count_tokens, n_ctx):
+        self.count_tokens = count_tokens
+        self.n_ctx = n_ctx
+        self._token_counts = {}
+        self.last_result = None
+
+    def cached_count(self, text):
+        """Jumlah token sebuah teks, di-memoize per isi teks"""
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        count = self._token_counts.get(key)
+        if count is None:
+            count = self.count_tokens(text)
+            self._token_counts[key] = count
+        return count
+
+    def turn_tokens(self, chat):
+        """Jumlah token satu entry history"""
+        return self.cached_count(format_history_turn(chat))
+
+    def budget_for(self, system_prompt, user_message, max_tokens):
+        current_turn = f"<|user|>\n{user_message}<|end|>\n<|assistant|>\n"
+        fixed = self.cached_count(system_prompt) + self.count_tokens(current_turn) + 1  # +1 BOS
+        return max(0, self.n_ctx - max_tokens - fixed)
+
+    def pack(self, system_prompt, user_message, chat_history, max_tokens,
+             retrieved=None, max_recent=None, retrieval_budget=None):
+        """
+        Pilih turn history terbaru yang muat di budget, urut kronologis.
+        max_recent membatasi jumlah turn terbaru; retrieved ([(index, chat)] urut relevansi)
+        lalu mengisi sisa budget sampai retrieval_budget token, ditaruh sebelum turn terbaru.
+        """
+        result = PackResult(self.budget_for(system_prompt, user_message, max_tokens))
+
+        picked = []
+        stop = 0 if max_recent is None else max(0, len(chat_history) - max_recent)
+        for index in range(len(chat_history) - 1, stop - 1, -1):
+            tokens = self.turn_tokens(chat_history[index])
+            fits = result.used + tokens <= result.budget
+            result.decisions.append({
+                'index': index,
+                'tokens': tokens,
+                'included': fits,
+                'reason': 'fits' if fits else 'over_budget'
+            })
+            if not fits:
+                # Berhenti di turn pertama yang tidak muat supaya percakapan tetap berurutan
+                break
+            result.used += tokens
+            picked.append(chat_history[index])
+
+        relevant = []
+        retrieval_used = 0
+        retrieval_budget = result.budget if retrieval_budget is None else retrieval_budget
+        for index, chat in retrieved or ():
+            tokens = self.turn_tokens(chat)
+            fits = (result.used + tokens <= result.budget
+                    and retrieval_used + tokens <= retrieval_budget)
+            result.decisions.append({
+                'index': index,
+                'tokens': tokens,
+                'included': fits,
+                'reason': 'retrieved' if fits else 'over_retrieval_budget'
+            })
+            if fits:
+                # Turn relevan yang tidak muat dilewati saja, urutan kronologis dijaga lewat sort
+                result.used += tokens
+                retrieval_used += tokens
+                relevant.append((index, chat))
+
+        result.turns = [chat for _, chat in sorted(relevant, key=lambda item: item[0])] + list(reversed(picked))
+        self.last_result = result
+        return result
@@ -0,0 +1,436 @@
+"""
+ArcanaEngine - lifecycle model, prompt building, dan generasi tanpa Tk.
+API sinkron (dipakai GUI lewat antrian + callback) dan asyncio (load/stream/complete).
+"""
+
+import asyncio
+import os
+import threading
+
+import psutil
+
+from config.settings import ModelConfig, GenerationConfig, AppConfig
+from config.prompts import get_system_prompt, get_chat_prompt, get_active_preset, PRESET_CONFIGS
+from core.streaming import stream_generate
+from core.model_loader import load_llama, load_worker_llama
+from core.hardware import AutoTuner
+from core.prefix_cache import PrefixStateCache, model_fingerprint, kv_config_tag
+from core.model_registry import ModelPool, estimate_model_ram
+from core.gguf import inspect_gguf, plan_model_load, GGUFError
+from core.context_packer import ContextPacker, make_token_counter
+from core.inference_queue import InferenceQueue
+from core.speculative import PromptLookupDraft, DecodeSpeedTracker, speculation_blocker
+from core.memory_profile import MemoryProfileStore, resolve_memory_profile, check_memory_budget, describe_check
+
+SAMPLING_ATTRS = ("temperature", "top_p", "top_k", "repeat_penalty")
+
+
+class EngineNotLoadedError(RuntimeError):
+    """Generasi diminta sebelum model dimuat"""
+
+
+class ArcanaEngine:
+    """
+    Satu engine = satu model aktif + antrian generasi FIFO terbatas.
+
+    Backend pluggable lewat `loader(model_config, path) -> llm`: default Llama di proses
+    worker (AppConfig.inference_process) atau in-process; ModelConfig(backend="fake")
+    memakai FakeLlama untuk load test tanpa file model.
+
+    Backpressure: submit/stream/complete langsung gagal dengan QueueFullError kalau
+    antrian penuh, dan stream() menahan decoding kalau consumer tertinggal `buffer` potongan.
+    """
+    def __init__(self, model_config=None, gen_config=None, app_config=None, loader=None, queue_size=None):
+        self.model_config = model_config or ModelConfig()
+        self.gen_config = gen_config or GenerationConfig()
+        self.app_config = app_config or AppConfig()
+        self.loader = loader or default_loader(self.app_config)
+        if "speculative" not in self.model_config.explicit:
+            # Preset speculative butuh draft_model sejak model dimuat (logits_all tidak bisa
+            # diaktifkan belakangan), jadi diputuskan dari PRESET_CONFIGS, bukan preset aktif
+            self.model_config.speculative = self.app_config.use_speculative and any(
+                preset.get("speculative") for preset in PRESET_CONFIGS.values())
+        # Profil memori dipakai sebelum pool dibuat: estimasi RAM model ikut tipe KV profil
+        self.memory_profiles = MemoryProfileStore(self.app_config.cache_dir)
+        self.model_config.apply_memory_profile(
+            resolve_memory_profile(self.memory_profiles.selected or self.app_config.memory_profile))
+        self.memory_check = None
+        self.llm = None
+        self.lock = threading.Lock()
+        self.queue = InferenceQueue(
+            None,
+            maxsize=queue_size or self.app_config.generation_queue_size,
+            lock=self.lock
+        )
+        self.pool = ModelPool(
+            lambda path: self.loader(self.model_config, path),
+            self.ram_budget(),
+            estimate=lambda path: estimate_model_ram(path, self.model_config.n_ctx, self.model_config.n_batch,
+                                                     self.model_config.type_k, self.model_config.type_v,
+                                                     self.model_config.speculative)
+        )
+        self.requested_n_ctx = self.model_config.n_ctx
+        self.model_info = None
+        self.model_id = ""
+        self.prefix_cache = None
+        self.context_packer = None
+        self.decode_speed = DecodeSpeedTracker()
+        self.base_sampling = {attr: getattr(self.gen_config, attr) for attr in SAMPLING_ATTRS}
+        self.base_max_tokens = self.gen_config.max_tokens
+
+    # --- Lifecycle model ---
+
+    def ram_budget(self):
+        """Budget RAM untuk model resident (bytes)"""
+        if self.app_config.model_ram_budget_mb:
+            return self.app_config.model_ram_budget_mb * 1024 * 1024
+        return int(psutil.virtual_memory().total * 0.6)
+
+    def preflight(self, model_path):
+        """
+        Baca header GGUF sebelum load: n_ctx disesuaikan dengan context training dan RAM
+        tersedia, atau MemoryError kalau model tidak mungkin muat.
+        """
+        if self.model_config.backend == "fake" or not os.path.exists(model_path):
+            return
+        try:
+            info = inspect_gguf(model_path)
+        except GGUFError as e:
+            print(f"⚠️ Could not inspect GGUF header: {e}")
+            return
+
+        # Mulai dari n_ctx yang diminta, bukan hasil penyesuaian model sebelumnya
+        self.model_config.n_ctx = self.requested_n_ctx
+        available = psutil.virtual_memory().available
+        n_ctx, estimate, notes = plan_model_load(info, self.model_config, available)
+        for note in notes:
+            print(f"📐 {note}")
+        self.model_config.n_ctx = n_ctx
+        print(f"📐 {info.name}: ~{estimate['total_bytes'] / 1024 ** 3:.2f} GB estimated "
+              f"(weights {estimate['weights_bytes'] / 1024 ** 3:.2f} GB, KV {estimate['kv_bytes'] / 1024 ** 3:.2f} GB)")
+
+    def load_model(self, model_path=None, system_prompt=None, on_status=None, timer=None):
+        """
+        Muat (atau ambil dari pool) model lalu jadikan aktif. Model pertama ikut auto-tuning
+        hardware. Dipanggil dari background thread; on_status(text) untuk progress,
+        timer (StartupTimer) untuk mencatat tahap model_mmap.
+        """
+        model_path = model_path or self.model_config.model_path
+        status = on_status or (lambda text: None)
+
+        auto_tuner = None
+        if self.app_config.auto_tune and self.llm is None:
+            auto_tuner = AutoTuner(self.app_config.cache_dir, self.model_config)
+            print(f"🔧 Hardware profile: {auto_tuner.probe()}")
+
+        if model_path not in self.pool.resident():
+            self.preflight(model_path)
+
+        status("🔮 Loading magical model...")
+        if timer:
+            timer.start("model_mmap")
+        kv_types = (self.model_config.type_k, self.model_config.type_v)
+        llm = self.pool.acquire(model_path)
+        if (self.model_config.type_k, self.model_config.type_v) != kv_types:
+            llm = self.replan_after_kv_fallback(llm, model_path)
+        if timer:
+            timer.stop("model_mmap")
+
+        if auto_tuner and auto_tuner.needs_calibration():
+            status("🔧 Calibrating for this machine...")
+            profile = auto_tuner.finish(llm)
+            print(f"🔧 Calibrated: {profile['n_threads']} threads, batch {profile['n_batch']}")
+
+        self.activate(llm, model_path)
+        if self.app_config.verify_memory_budget:
+            self.check_memory(system_prompt, on_status=on_status)
+        status("🔮 Preparing spell prefix...")
+        if system_prompt:
+            self.warm_prefix(system_prompt)
+        return llm
+
+    def replan_after_kv_fallback(self, llm, model_path):
+        """
+        Backend menolak KV terkuantisasi dan memuat f16: n_ctx preflight dihitung untuk KV
+        yang lebih kecil, jadi estimasi diulang dan model dimuat ulang kalau n_ctx harus turun.
+        """
+        loaded_ctx = self.model_config.n_ctx
+        try:
+            self.preflight(model_path)
+        except MemoryError:
+            self.pool.release(model_path)
+            raise
+        if self.model_config.n_ctx >= loaded_ctx:
+            self.model_config.n_ctx = loaded_ctx
+            self.pool.reestimate(model_path)
+            return llm
+        print(f"📐 f16 KV cache: reloading with n_ctx {self.model_config.n_ctx}")
+        self.pool.release(model_path)
+        return self.pool.acquire(model_path)
+
+    def activate(self, llm, model_path):
+        """Jadikan llm model aktif: context packer, prefix cache, dan model id ikut model ini"""
+        with self.lock:
+            self.llm = llm
+            self.queue.llm = llm
+            self.decode_speed.reset()
+            self.model_config.model_path = model_path
+            self.model_id = model_fingerprint(model_path)
+            self.context_packer = ContextPacker(make_token_counter(llm), llm.n_ctx())
+            self.prefix_cache = None
+            if self.app_config.use_prefix_cache:
+                self.prefix_cache = PrefixStateCache(
+                    self.app_config.cache_dir,
+                    model_path,
+                    config_tag=self.kv_config_tag()
+                )
+            try:
+                self.model_info = inspect_gguf(model_path)
+            except (OSError, ValueError, GGUFError):
+                self.model_info = None
+        self.pool.activate(model_path)
+
+    def kv_config_tag(self):
+        return kv_config_tag(self.model_config, self.n_ctx())
+
+    def n_ctx(self):
+        return self.llm.n_ctx() if self.llm else self.model_config.n_ctx
+
+    def warm_prefix(self, system_prompt):
+        """Siapkan KV-cache system prompt, return 'live'/'disk'/'miss' atau None kalau tidak dipakai"""
+        if not self.prefix_cache or not self.llm:
+            return None
+        try:
+            with self.lock:
+                source = self.prefix_cache.prepare(self.llm, system_prompt)
+            print(f"⚡ Prefix cache: {source}")
+            return source
+        except Exception as e:
+            print(f"⚠️ Prefix cache error: {e}")
+            return None
+
+    # --- Profil memori ---
+
+    def set_memory_profile(self, name, system_prompt=None, on_status=None):
+        """
+        Ganti profil memori dan muat ulang model aktif dengan setting baru (n_ctx, tipe KV,
+        mmap/mlock tidak bisa diubah pada instance yang sudah jalan). Dipanggil dari
+        background thread saat antrian generasi kosong.
+        """
+        self.model_config.apply_memory_profile(name)
+        self.requested_n_ctx = self.model_config.n_ctx
+        self.memory_profiles.select(name)
+        model_path = self.model_config.model_path
+        with self.lock:
+            self.llm = None
+            self.queue.llm = None
+        self.pool.clear()
+        return self.load_model(model_path, system_prompt=system_prompt, on_status=on_status)
+
+    def check_memory(self, system_prompt=None, on_status=None, force=False):
+        """
+        Peak RSS generasi uji vs target profil, sekali per model + profil + konfigurasi KV
+        (hasil disimpan di cache/memory_profile.json). Return dict hasil cek.
+        """
+        key = f"{self.model_id}:{self.model_config.memory_profile}:{self.kv_config_tag()}"
+        check = None if force else self.memory_profiles.check_for(key)
+        if check is None:
+            if on_status:
+                on_status("🧠 Checking memory budget...")
+            try:
+                with self.lock:
+                    check = check_memory_budget(self.llm, self.model_config, system_prompt)
+            except Exception as e:
+                print(f"⚠️ Memory check error: {e}")
+                return None
+            self.memory_profiles.record_check(key, check)
+        self.memory_check = check
+        print(describe_check(check))
+        return check
+
+    # --- Prompt dan sampling ---
+
+    def apply_preset(self, language, mode):
+        """
+        Override sampling dan batas max_tokens mode dari preset aktif, default kalau preset
+        tidak mengaturnya (preset speculative menetralkan repeat_penalty lewat "sampling")
+        """
+        preset = get_active_preset(language, mode) or {}
+        sampling = preset.get("sampling", {})
+        for attr, default in self.base_sampling.items():
+            setattr(self.gen_config, attr, sampling.get(attr, default))
+        self.gen_config.max_tokens = min(self.base_max_tokens, preset.get("max_tokens", self.base_max_tokens))
+
+    def make_draft(self, language, mode, gen_config=None):
+        """Draft prompt-lookup untuk preset yang mengaktifkannya, None kalau tidak dipakai"""
+        preset = get_active_preset(language, mode) or {}
+        if not (self.app_config.use_speculative and preset.get("speculative")):
+            return None
+        blocker = speculation_blocker(gen_config or self.gen_config)
+        if blocker:
+            print(f"🎯 Speculative decoding off: {blocker} would change the output")
+            return None
+        return PromptLookupDraft(
+            max_ngram_size=self.app_config.speculative_ngram,
+            num_pred_tokens=self.app_config.speculative_draft_tokens
+        )
+
+    def build_prompt(self, user_message, history=None, system_prompt=None, gen_config=None, summary=None,
+                     retrieved=None, max_recent=None, retrieval_budget=None):
+        """Prompt Phi-3 lengkap dengan history yang di-pack sesuai budget token model"""
+        if system_prompt is None:
+            system_prompt = get_system_prompt(self.app_config.language, self.app_config.mode)
+        prompt = get_chat_prompt(
+            system_prompt,
+            user_message,
+            history,
+            packer=self.context_packer,
+            max_tokens=(gen_config or self.gen_config).max_tokens,
+            summary=summary,
+            retrieved=retrieved,
+            max_recent=max_recent,
+            retrieval_budget=retrieval_budget
+        )
+        if self.context_packer and self.context_packer.last_result:
+            print(f"📦 Context: {self.context_packer.last_result.describe()}")
+        return prompt
+
+    # --- Generasi (dipanggil di worker antrian, lock sudah dipegang) ---
+
+    def generate(self, llm, prompt, system_prompt=None, gen_config=None, on_text=None, should_stop=None, draft=None):
+        """Satu generasi: siapkan prefix, stream token, catat kecepatan decode. Return GenerationResult."""
+        if system_prompt and self.prefix_cache:
+            self.prefix_cache.prepare(llm, system_prompt)
+        result = stream_generate(llm, prompt, gen_config or self.gen_config,
+                                 on_text=on_text, should_stop=should_stop, draft=draft)
+        self.decode_speed.record(result.speculative is not None, result.decode_tokens_per_second)
+        return result
+
+    def submit(self, fn, on_start=None, on_done=None):
+        """fn(llm, job) di antrian generasi (QueueFullError kalau penuh)"""
+        return self.queue.submit(fn, on_start=on_start, on_done=on_done)
+
+    def cancel_all(self):
+        """Buang job yang menunggu dan hentikan yang sedang jalan, return (dropped, job aktif)"""
+        return self.queue.drop_pending(), self.queue.cancel_current()
+
+    # --- API asyncio ---
+
+    async def load(self, model_path=None, timeout=None):
+        """
+        Muat model di thread executor. Timeout hanya berhenti menunggu: loading yang
+        sudah berjalan tetap selesai di background dan model tetap masuk pool.
+        """
+        loop = asyncio.get_running_loop()
+        system_prompt = get_system_prompt(self.app_config.language, self.app_config.mode)
+        self.apply_preset(self.app_config.language, self.app_config.mode)
+        await asyncio.wait_for(
+            loop.run_in_executor(None, lambda: self.load_model(model_path, system_prompt=system_prompt)),
+            timeout
+        )
+        return self
+
+    async def stream(self, user_message, history=None, system_prompt=None, gen_config=None,
+                     timeout=None, buffer=64, speculative=True):
+        """
+        Async iterator potongan teks jawaban. `timeout` (detik) mencakup waktu antre dan generasi;
+        kalau lewat, generasi dihentikan dan asyncio.TimeoutError dilempar. Keluar dari loop
+        lebih awal (break / task dibatalkan) juga menghentikan generasi.
+        """
+        run = self._start_stream(user_message, history, system_prompt, gen_config, buffer, speculative)
+        async for text in run.texts(timeout):
+            yield text
+
+    async def complete(self, user_message, history=None, system_prompt=None, gen_config=None,
+                       timeout=None, speculative=True):
+        """Jawaban lengkap sebagai GenerationResult (teks + timing)"""
+        run = self._start_stream(user_message, history, system_prompt, gen_config, None, speculative)
+        async for _ in run.texts(timeout):
+            pass
+        return run.job.result
+
+    async def close(self):
+        """Hentikan antrian dan lepaskan semua model (proses worker ikut ditutup)"""
+        self.cancel_all()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.shutdown)
+
+    def shutdown(self):
+        with self.lock:
+            self.llm = None
+            self.queue.llm = None
+        self.pool.clear()
+
+    def _start_stream(self, user_message, history, system_prompt, gen_config, buffer, speculative):
+        if self.llm is None:
+            raise EngineNotLoadedError("Model belum dimuat, panggil await engine.load() dulu")
+        gen_config = gen_config or self.gen_config
+        language, mode = self.app_config.language, self.app_config.mode
+        if system_prompt is None:
+            system_prompt = get_system_prompt(language, mode)
+        run = _StreamRun(asyncio.get_running_loop(), buffer)
+
+        def work(llm, job):
+            prompt = self.build_prompt(user_message, history, system_prompt, gen_config=gen_config)
+            draft = self.make_draft(language, mode, gen_config) if speculative else None
+            return self.generate(llm, prompt, system_prompt, gen_config,
+                                 on_text=run.deliver if gen_config.stream else None,
+                                 should_stop=job.cancelled.is_set, draft=draft)
+
+        run.job = self.submit(work, on_done=run.finish)
+        return run
+
+
+_END = object()
+
+
+class _StreamRun:
+    """
+    Jembatan satu job antrian (worker thread) ke consumer asyncio. Slot buffer dipegang
+    semaphore thread: decoding berhenti menunggu kalau consumer tertinggal `buffer` potongan.
+    """
+    def __init__(self, loop, buffer):
+        self.loop = loop
+        self.chunks = asyncio.Queue()
+        self.slots = threading.Semaphore(buffer) if buffer else None
+        self.job = None
+
+    def deliver(self, text):
+        """Dipanggil di worker thread untuk setiap potongan teks"""
+        if self.slots is not None:
+            while not self.slots.acquire(timeout=0.05):
+                if self.job.cancelled.is_set():
+                    return
+        self.loop.call_soon_threadsafe(self.chunks.put_nowait, text)
+
+    def finish(self, job):
+        self.loop.call_soon_threadsafe(self.chunks.put_nowait, _END)
+
+    async def texts(self, timeout):
+        deadline = None if timeout is None else self.loop.time() + timeout
+        try:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - self.loop.time())
+                try:
+                    text = await asyncio.wait_for(self.chunks.get(), remaining)
+                except asyncio.TimeoutError:
+                    raise asyncio.TimeoutError(f"Generation exceeded {timeout} s") from None
+                if text is _END:
+                    break
+                if self.slots is not None:
+                    self.slots.release()
+                yield text
+            if self.job.error:
+                raise self.job.error
+        finally:
+            if not self.job.done.is_set():
+                self.job.cancelled.set()
+
+
+def default_loader(app_config):
+    """Loader model bawaan: proses worker kalau AppConfig.inference_process, selain itu in-process"""
+    def load(model_config, path):
+        if app_config.inference_process:
+            return load_worker_llama(model_config, ring_kb=app_config.worker_ring_kb, model_path=path)
+        return load_llama(model_config, model_path=path)
+    return load
@@ -0,0 +1,164 @@
+"""
+FakeLlama - backend stub dengan latency buatan untuk benchmark dan CI tanpa file model
+"""
+
+import os
+import time
+
+SPECIAL_TOKENS = {
+    "<|endoftext|>": 0,
+    "<|system|>": 1,
+    "<|user|>": 2,
+    "<|assistant|>": 3,
+    "<|end|>": 4,
+}
+BOS_TOKEN = 5
+BYTE_OFFSET = 16  # token = byte + BYTE_OFFSET
+
+
+class FakeState:
+    """Pengganti LlamaState yang bisa di-pickle"""
+    def __init__(self, input_ids, n_tokens):
+        self.input_ids = input_ids
+        self.n_tokens = n_tokens
+
+
+class FakeLlama:
+    """
+    Meniru subset API Llama yang dipakai aplikasi (tokenize, detokenize, eval, generate,
+    save_state/load_state). Tokenizer level byte, jawaban berupa teks tetap.
+
+    Model latency (semua dalam ms):
+      load_ms               sekali saat konstruksi
+      batch_overhead_ms     per batch eval (prompt dipecah per n_batch)
+      prompt_ms_per_token   dibagi n_threads (prompt eval compute-bound)
+      decode_ms_per_token   dibagi sqrt(n_threads) (decode memory-bound)
+    """
+    def __init__(self, model_path="fake.gguf", n_ctx=4096, n_threads=4, n_batch=512,
+                 load_ms=50.0, batch_overhead_ms=2.0, prompt_ms_per_token=0.5,
+                 decode_ms_per_token=20.0, reply=None, reply_tokens=64, draft_model=None, **kwargs):
+        self.model_path = model_path
+        self._n_ctx = n_ctx
+        self.n_threads = max(1, n_threads or 1)
+        self.n_batch = max(1, n_batch)
+        self.batch_overhead_ms = batch_overhead_ms
+        self.prompt_ms_per_token = prompt_ms_per_token
+        self.decode_ms_per_token = decode_ms_per_token
+        self.reply = (reply or "Ini jawaban dari FakeLlama untuk benchmark. ").encode("utf-8")
+        self.reply_tokens = reply_tokens
+        self.input_ids = []
+        self.n_tokens = 0
+        self.verbose = False
+        self.draft_model = draft_model
+        time.sleep(load_ms / 1000)
+
+    def n_ctx(self):
+        return self._n_ctx
+
+    def token_eos(self):
+        return SPECIAL_TOKENS["<|endoftext|>"]
+
+    def token_bos(self):
+        return BOS_TOKEN
+
+    def tokenize(self, text, add_bos=True, special=False):
+        tokens = [BOS_TOKEN] if add_bos else []
+        i = 0
+        while i < len(text):
+            if special and text[i:i + 2] == b"<|":
+                end = text.find(b"|>", i)
+                name = text[i:end + 2].decode("utf-8", "replace") if end != -1 else ""
+                if name in SPECIAL_TOKENS:
+                    tokens.append(SPECIAL_TOKENS[name])
+                    i = end + 2
+                    continue
+            tokens.append(text[i] + BYTE_OFFSET)
+            i += 1
+        return tokens
+
+    def detokenize(self, tokens, prev_tokens=None):
+        return bytes(t - BYTE_OFFSET for t in tokens if t >= BYTE_OFFSET)
+
+    def set_seed(self, seed):
+        pass
+
+    def set_n_threads(self, n_threads):
+        self.n_threads = max(1, n_threads)
+
+    def reset(self):
+        self.n_tokens = 0
+
+    def _sleep_ms(self, ms):
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def eval(self, tokens):
+        if self.n_tokens + len(tokens) > self._n_ctx:
+            raise ValueError("FakeLlama: context penuh")
+        for start in range(0, len(tokens), self.n_batch):
+            batch = list(tokens[start:start + self.n_batch])
+            if len(batch) == 1:
+                self._sleep_ms(self.decode_ms_per_token / self.n_threads ** 0.5)
+            else:
+                self._sleep_ms(self.batch_overhead_ms + len(batch) * self.prompt_ms_per_token / self.n_threads)
+            del self.input_ids[self.n_tokens:]
+            self.input_ids.extend(batch)
+            self.n_tokens += len(batch)
+
+    def generate(self, tokens, reset=True, **kwargs):
+        tokens = list(tokens)
+        if reset and self.n_tokens > 0:
+            prefix = 0
+            for a, b in zip(self.input_ids[:self.n_tokens], tokens[:-1]):
+                if a != b:
+                    break
+                prefix += 1
+            self.n_tokens = prefix
+            tokens = tokens[prefix:]
+        elif reset:
+            self.reset()
+
+        produced = 0
+        n_draft = 0
+        while True:
+            self.eval(tokens)
+            drafts = tokens[len(tokens) - n_draft:] if n_draft else []
+            # Seperti Llama.generate: sample di setiap posisi draft, berhenti di mismatch pertama
+            for i in range(n_draft + 1):
+                token = self._reply_token(produced)
+                produced += 1
+                yield token
+                if i < n_draft and token != drafts[i]:
+                    self.n_tokens -= n_draft - i
+                    del self.input_ids[self.n_tokens:]
+                    break
+            tokens = [token]
+            n_draft = 0
+            if self.draft_model is not None:
+                draft = self.draft_model(self.input_ids[:self.n_tokens] + tokens)
+                draft = [int(t) for t in draft][:self._n_ctx - self.n_tokens - 1]
+                tokens.extend(draft)
+                n_draft = len(draft)
+
+    def _reply_token(self, produced):
+        if produced >= self.reply_tokens:
+            return SPECIAL_TOKENS["<|end|>"]
+        return self.reply[produced % len(self.reply)] + BYTE_OFFSET
+
+    def save_state(self):
+        return FakeState(list(self.input_ids[:self.n_tokens]), self.n_tokens)
+
+    def load_state(self, state):
+        self.input_ids = list(state.input_ids)
+        self.n_tokens = state.n_tokens
+
+
+def fake_latency_from_env():
+    """Override latency FakeLlama lewat env ARCANA_FAKE_<NAMA>_MS, misalnya ARCANA_FAKE_DECODE_MS=5"""
+    mapping = {
+        'load_ms': "ARCANA_FAKE_LOAD_MS",
+        'batch_overhead_ms': "ARCANA_FAKE_BATCH_MS",
+        'prompt_ms_per_token': "ARCANA_FAKE_PROMPT_MS",
+        'decode_ms_per_token': "ARCANA_FAKE_DECODE_MS",
+    }
+    return {key: float(os.environ[env]) for key, env in mapping.items() if env in os.environ}
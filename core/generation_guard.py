@@ -0,0 +1,93 @@
+"""
+Generation guard - batas max_tokens dari sisa context, dan berhenti lebih awal
+kalau model terjebak loop repetisi atau tidak menghasilkan teks baru
+"""
+
+
+def plan_max_tokens(gen_config, prompt_tokens, n_ctx):
+    """
+    max_tokens efektif untuk satu generasi: batas config/mode, dipotong ke sisa context
+    dikurangi margin (token draft speculative ikut dievaluasi melewati token terakhir).
+    ValueError kalau sisa context tidak cukup untuk min_tokens.
+    """
+    remaining = n_ctx - prompt_tokens - gen_config.context_margin
+    if remaining < gen_config.min_tokens:
+        raise ValueError(f"Prompt terlalu panjang: {prompt_tokens} tokens, "
+                         f"sisa context {max(0, remaining)} (n_ctx {n_ctx})")
+    return min(gen_config.max_tokens, remaining)
+
+
+class RepetitionGuard:
+    """
+    Dipanggil per token oleh stream_generate, return alasan berhenti atau None.
+
+    - 'repetition': ekor output terdiri dari >= min_repeats salinan identik satu pola
+      (periode <= max_period token) dengan panjang total >= min_span token.
+      Kandidat periode diambil dari jarak kemunculan ulang n-gram terakhir, jadi
+      pengecekan slice hanya jalan saat n-gram berulang.
+    - 'no_progress': no_progress_tokens token berturut-turut hanya berisi whitespace.
+    """
+    def __init__(self, ngram=8, min_repeats=3, min_span=48, max_period=512, no_progress_tokens=64):
+        self.ngram = ngram
+        self.min_repeats = min_repeats
+        self.min_span = min_span
+        self.max_period = max_period
+        self.no_progress_tokens = no_progress_tokens
+        self.tokens = []
+        self._last_seen = {}
+        self._blank_run = 0
+        self.reason = None
+        self.period = None
+
+    @classmethod
+    def from_config(cls, gen_config):
+        if not gen_config.use_generation_guard:
+            return None
+        return cls(
+            ngram=gen_config.repetition_ngram,
+            min_repeats=gen_config.repetition_min_repeats,
+            min_span=gen_config.repetition_min_span,
+            max_period=gen_config.repetition_max_period,
+            no_progress_tokens=gen_config.no_progress_tokens
+        )
+
+    def observe(self, token, piece):
+        """token id dan bytes hasil detokenize-nya"""
+        tokens = self.tokens
+        tokens.append(token)
+
+        self._blank_run = self._blank_run + 1 if not piece.strip() else 0
+        if self.no_progress_tokens and self._blank_run >= self.no_progress_tokens:
+            self.reason = "no_progress"
+            return self.reason
+
+        if len(tokens) < self.ngram:
+            return None
+        position = len(tokens)
+        key = tuple(tokens[-self.ngram:])
+        previous = self._last_seen.get(key)
+        self._last_seen[key] = position
+        if previous is None:
+            return None
+
+        period = position - previous
+        if period > self.max_period or self._blank_run >= period:
+            # Pola yang hanya whitespace (indentasi, baris kosong) urusan no_progress
+            return None
+        repeats = max(self.min_repeats, -(-self.min_span // period))
+        span = repeats * period
+        if position < span:
+            return None
+        tail = tokens[-span:]
+        if tail[period:] == tail[:-period]:
+            self.reason = "repetition"
+            self.period = period
+            return self.reason
+        return None
+
+    def to_dict(self):
+        return {
+            'reason': self.reason,
+            'period': self.period,
+            'tokens': len(self.tokens)
+        }
@@ -0,0 +1,252 @@
+"""
+GGUF header inspector - baca metadata dan info tensor lewat mmap tanpa memuat weights,
+lalu perkirakan kebutuhan RAM (weights + KV cache) untuk n_ctx tertentu
+"""
+
+import mmap
+import os
+import struct
+
+GGUF_MAGIC = b"GGUF"
+
+# value type GGUF -> format struct (scalar)
+SCALAR_FORMATS = {
+    0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i",
+    6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d",
+}
+TYPE_STRING = 8
+TYPE_ARRAY = 9
+
+# ggml_type -> (elemen per block, bytes per block)
+GGML_TYPE_SIZES = {
+    0: (1, 4), 1: (1, 2), 2: (32, 18), 3: (32, 20), 6: (32, 22), 7: (32, 24),
+    8: (32, 34), 9: (32, 36), 10: (256, 84), 11: (256, 110), 12: (256, 144),
+    13: (256, 176), 14: (256, 210), 15: (256, 292), 16: (256, 66), 17: (256, 74),
+    18: (256, 98), 19: (256, 50), 20: (32, 18), 21: (256, 110), 22: (256, 82),
+    23: (256, 136), 24: (1, 1), 25: (1, 2), 26: (1, 4), 27: (1, 8), 28: (1, 8),
+    29: (256, 56), 30: (1, 2),
+}
+
+# general.file_type (llama_ftype) -> nama quantization
+FILE_TYPE_NAMES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1",
+    10: "Q2_K", 11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M",
+    16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S",
+    22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M",
+    28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+}
+
+BASE_OVERHEAD_BYTES = 150 * 1024 * 1024  # compute buffer + runtime, perkiraan kasar
+
+# Tipe KV cache yang didukung (ModelConfig.type_k / type_v) -> ggml_type llama.cpp
+KV_CACHE_TYPES = {"f16": 1, "q8_0": 8, "q4_0": 2}
+
+
+def kv_type_id(name):
+    if name not in KV_CACHE_TYPES:
+        raise ValueError(f"Unknown KV cache type: {name} (pilih {', '.join(KV_CACHE_TYPES)})")
+    return KV_CACHE_TYPES[name]
+
+
+def kv_bytes_per_element(name):
+    block, block_bytes = GGML_TYPE_SIZES[kv_type_id(name)]
+    return block_bytes / block
+
+
+class GGUFError(Exception):
+    """File bukan GGUF valid atau header terpotong"""
+
+
+class _Reader:
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def unpack(self, fmt):
+        try:
+            values = struct.unpack_from(fmt, self.buf, self.pos)
+        except struct.error as e:
+            raise GGUFError(f"Header GGUF terpotong: {e}")
+        self.pos += struct.calcsize(fmt)
+        return values[0]
+
+    def string(self):
+        length = self.unpack("<Q")
+        data = self.buf[self.pos:self.pos + length]
+        self.pos += length
+        return bytes(data).decode("utf-8", errors="replace")
+
+    def value(self, value_type, keep_array=True):
+        if value_type in SCALAR_FORMATS:
+            return self.unpack(SCALAR_FORMATS[value_type])
+        if value_type == TYPE_STRING:
+            return self.string()
+        if value_type == TYPE_ARRAY:
+            item_type = self.unpack("<I")
+            count = self.unpack("<Q")
+            if not keep_array and item_type in SCALAR_FORMATS:
+                # Array besar (misalnya token scores) cukup dilompati
+                self.pos += struct.calcsize(SCALAR_FORMATS[item_type]) * count
+                return count
+            if not keep_array and item_type == TYPE_STRING:
+                for _ in range(count):
+                    length = self.unpack("<Q")
+                    self.pos += length
+                return count
+            items = [self.value(item_type) for _ in range(count)]
+            return items if keep_array else count
+        raise GGUFError(f"Tipe value GGUF tidak dikenal: {value_type}")
+
+
+class GGUFInfo:
+    """Metadata hasil inspeksi satu file GGUF"""
+    def __init__(self, path, version, metadata, tensors):
+        self.path = path
+        self.version = version
+        self.metadata = metadata
+        self.tensors = tensors  # list of (name, n_elements, ggml_type, n_bytes)
+
+    def _arch_value(self, key, default=None):
+        return self.metadata.get(f"{self.architecture}.{key}", default)
+
+    @property
+    def architecture(self):
+        return self.metadata.get("general.architecture", "unknown")
+
+    @property
+    def name(self):
+        return self.metadata.get("general.name") or os.path.splitext(os.path.basename(self.path))[0]
+
+    @property
+    def quantization(self):
+        file_type = self.metadata.get("general.file_type")
+        return FILE_TYPE_NAMES.get(file_type, f"type {file_type}" if file_type is not None else "unknown")
+
+    @property
+    def context_length(self):
+        return self._arch_value("context_length")
+
+    @property
+    def tokenizer(self):
+        return self.metadata.get("tokenizer.ggml.model", "unknown")
+
+    @property
+    def vocab_size(self):
+        return self.metadata.get("tokenizer.ggml.tokens", 0)
+
+    @property
+    def n_layers(self):
+        return self._arch_value("block_count", 0)
+
+    @property
+    def n_embd(self):
+        return self._arch_value("embedding_length", 0)
+
+    @property
+    def n_embd_kv(self):
+        """Lebar K/V per layer (lebih kecil dari n_embd kalau model pakai GQA)"""
+        n_head = self._arch_value("attention.head_count", 0)
+        n_head_kv = self._arch_value("attention.head_count_kv", n_head)
+        if not n_head:
+            return self.n_embd
+        head_dim = self._arch_value("attention.key_length", self.n_embd // n_head)
+        return head_dim * n_head_kv
+
+    @property
+    def weights_bytes(self):
+        return sum(tensor[3] for tensor in self.tensors)
+
+    def estimate_memory(self, n_ctx, n_batch=512, type_k="f16", type_v="f16", logits_all=False):
+        """
+        Perkiraan RSS (bytes): weights + KV cache (K dan V) + buffer logits + overhead.
+        logits_all (model speculative) = buffer logits untuk semua n_ctx posisi.
+        """
+        kv_element_bytes = kv_bytes_per_element(type_k) + kv_bytes_per_element(type_v)
+        kv_bytes = int(self.n_layers * n_ctx * self.n_embd_kv * kv_element_bytes)
+        logits_bytes = self.vocab_size * (n_ctx if logits_all else n_batch) * 4 * 2  # context + salinan scores Python
+        overhead = BASE_OVERHEAD_BYTES + logits_bytes
+        return {
+            'weights_bytes': self.weights_bytes,
+            'kv_bytes': kv_bytes,
+            'overhead_bytes': overhead,
+            'total_bytes': self.weights_bytes + kv_bytes + overhead
+        }
+
+    def summary(self):
+        return {
+            'name': self.name,
+            'architecture': self.architecture,
+            'quantization': self.quantization,
+            'context_length': self.context_length,
+            'tokenizer': self.tokenizer,
+            'vocab_size': self.vocab_size,
+            'n_layers': self.n_layers,
+            'tensor_count': len(self.tensors),
+            'weights_mb': round(self.weights_bytes / (1024 * 1024), 1)
+        }
+
+
+def inspect_gguf(path):
+    """Baca header GGUF lewat mmap (weights tidak disentuh)"""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            reader = _Reader(buf)
+            if bytes(buf[:4]) != GGUF_MAGIC:
+                raise GGUFError(f"{os.path.basename(path)} bukan file GGUF")
+            reader.pos = 4
+            version = reader.unpack("<I")
+            count_fmt = "<I" if version == 1 else "<Q"
+            tensor_count = reader.unpack(count_fmt)
+            kv_count = reader.unpack(count_fmt)
+
+            metadata = {}
+            for _ in range(kv_count):
+                key = reader.string()
+                value_type = reader.unpack("<I")
+                # Array (vocab, merges, scores) hanya disimpan jumlahnya
+                metadata[key] = reader.value(value_type, keep_array=False)
+
+            tensors = []
+            for _ in range(tensor_count):
+                name = reader.string()
+                n_dims = reader.unpack("<I")
+                n_elements = 1
+                for _ in range(n_dims):
+                    n_elements *= reader.unpack("<Q")
+                ggml_type = reader.unpack("<I")
+                reader.unpack("<Q")  # offset data
+                block, block_bytes = GGML_TYPE_SIZES.get(ggml_type, (1, 4))
+                tensors.append((name, n_elements, ggml_type, n_elements // block * block_bytes))
+
+    return GGUFInfo(path, version, metadata, tensors)
+
+
+def plan_model_load(info, model_config, available_bytes, min_ctx=512):
+    """
+    Cek konfigurasi sebelum load. n_ctx diturunkan ke context training model dan
+    dibagi dua sampai estimasi muat di RAM tersedia (atau target_rss_mb profil memori
+    kalau lebih kecil). Raise MemoryError kalau tetap tidak muat.
+    Return (n_ctx, estimasi, catatan).
+    """
+    notes = []
+    n_ctx = model_config.n_ctx
+    if model_config.target_rss_mb:
+        available_bytes = min(available_bytes, model_config.target_rss_mb * 1024 * 1024)
+    kv_types = (model_config.type_k, model_config.type_v, model_config.speculative)
+    if info.context_length and n_ctx > info.context_length:
+        notes.append(f"n_ctx {n_ctx} > trained context {info.context_length}")
+        n_ctx = info.context_length
+
+    estimate = info.estimate_memory(n_ctx, model_config.n_batch, *kv_types)
+    while estimate['total_bytes'] > available_bytes and n_ctx > min_ctx:
+        n_ctx = max(min_ctx, n_ctx // 2)
+        estimate = info.estimate_memory(n_ctx, model_config.n_batch, *kv_types)
+
+    if estimate['total_bytes'] > available_bytes:
+        raise MemoryError(
+            f"{info.name} butuh ~{estimate['total_bytes'] / 1024 ** 3:.1f} GB "
+            f"(n_ctx {n_ctx}), RAM tersedia/budget {available_bytes / 1024 ** 3:.1f} GB"
+        )
+    if n_ctx != model_config.n_ctx:
+        notes.append(f"n_ctx {model_config.n_ctx} -> {n_ctx} supaya muat di RAM/budget")
+    return n_ctx, estimate, notes
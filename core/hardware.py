@@ -0,0 +1,185 @@
+"""
+Hardware probe dan auto-tuning ModelConfig - physical cores, RAM, GPU offload, kalibrasi decode
+"""
+
+import hashlib
+import json
+import os
+import platform
+import time
+
+import psutil
+
+CALIBRATION_TEXT = (
+    "Arcana calibration. The quick brown fox jumps over the lazy dog. "
+    "Python list comprehension, dictionary, generator, async function. " * 6
+)
+CALIBRATION_DECODE_TOKENS = 16
+
+
+def gpu_offload_supported():
+    """Cek apakah build llama.cpp mendukung offload layer ke GPU"""
+    try:
+        import llama_cpp
+        return bool(llama_cpp.llama_supports_gpu_offload())
+    except Exception:
+        return False
+
+
+def probe_hardware(check_gpu=True):
+    """Info hardware dasar dari psutil"""
+    memory = psutil.virtual_memory()
+    logical = psutil.cpu_count(logical=True) or os.cpu_count() or 1
+    physical = psutil.cpu_count(logical=False) or logical
+    return {
+        'physical_cores': physical,
+        'logical_cores': logical,
+        'total_ram_mb': memory.total // (1024 * 1024),
+        'available_ram_mb': memory.available // (1024 * 1024),
+        'gpu_offload': gpu_offload_supported() if check_gpu else False
+    }
+
+
+def machine_fingerprint(hardware):
+    """Identitas mesin untuk cache profil (tidak berubah antar restart)"""
+    parts = [
+        platform.node(), platform.machine(), platform.processor(),
+        str(hardware['physical_cores']), str(hardware['logical_cores']), str(hardware['total_ram_mb'])
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def default_profile(hardware):
+    """Profil awal tanpa kalibrasi: thread = physical cores (tanpa SMT sibling)"""
+    return {
+        'n_threads': max(1, hardware['physical_cores']),
+        'n_gpu_layers': 20 if hardware['gpu_offload'] else 0,
+        'calibrated': False
+    }
+
+
+def set_llm_threads(llm, n_threads):
+    """Ganti jumlah thread context yang sudah dimuat"""
+    if hasattr(llm, "set_n_threads"):
+        llm.set_n_threads(n_threads)
+        return
+    import llama_cpp
+    llama_cpp.llama_set_n_threads(llm.ctx, n_threads, n_threads)
+    llm.context_params.n_threads = n_threads
+    llm.context_params.n_threads_batch = n_threads
+
+
+def thread_candidates(hardware):
+    physical = hardware['physical_cores']
+    candidates = {physical, max(1, physical - 1), max(1, physical // 2)}
+    if hardware['logical_cores'] > physical:
+        candidates.add(hardware['logical_cores'])
+    return sorted(candidates)
+
+
+def calibrate(llm, hardware, batch_candidates=(128, 256, 512)):
+    """
+    Kalibrasi singkat di model yang sudah dimuat:
+    n_batch dipilih dari kecepatan prompt eval, n_threads dari kecepatan decode.
+    """
+    tokens = llm.tokenize(CALIBRATION_TEXT.encode("utf-8"), add_bos=True)
+    original_batch = llm.n_batch
+    results = {'prompt_eval': {}, 'decode': {}}
+
+    for n_batch in batch_candidates:
+        if n_batch > original_batch:
+            continue
+        llm.n_batch = n_batch
+        llm.reset()
+        started = time.perf_counter()
+        llm.eval(tokens)
+        results['prompt_eval'][n_batch] = len(tokens) / (time.perf_counter() - started)
+    llm.n_batch = original_batch
+
+    for n_threads in thread_candidates(hardware):
+        set_llm_threads(llm, n_threads)
+        llm.reset()
+        llm.eval(tokens[:8])
+        started = time.perf_counter()
+        for _ in range(CALIBRATION_DECODE_TOKENS):
+            llm.eval([tokens[-1]])
+        results['decode'][n_threads] = CALIBRATION_DECODE_TOKENS / (time.perf_counter() - started)
+    llm.reset()
+
+    best_batch = max(results['prompt_eval'], key=results['prompt_eval'].get, default=original_batch)
+    best_threads = max(results['decode'], key=results['decode'].get)
+    set_llm_threads(llm, best_threads)
+    return {
+        'n_threads': best_threads,
+        'n_batch': best_batch,
+        'decode_tokens_per_second': round(results['decode'][best_threads], 2),
+        'calibrated': True
+    }
+
+
+class HardwareProfileCache:
+    """Profil hasil tuning disimpan per mesin di cache/hardware_profile.json"""
+    def __init__(self, cache_dir):
+        self.path = os.path.join(cache_dir, "hardware_profile.json")
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, fingerprint):
+        return self._read().get(fingerprint)
+
+    def save(self, fingerprint, profile):
+        data = self._read()
+        data[fingerprint] = profile
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class AutoTuner:
+    """
+    Alur tuning: probe() sebelum load -> pakai profil cache / default,
+    finish(llm) setelah load -> kalibrasi sekali kalau belum ada profil terkalibrasi.
+    """
+    def __init__(self, cache_dir, model_config):
+        self.cache = HardwareProfileCache(cache_dir)
+        self.model_config = model_config
+        self.hardware = None
+        self.fingerprint = None
+        self.profile = None
+
+    def probe(self):
+        self.hardware = probe_hardware(check_gpu=self.model_config.backend != "fake")
+        self.fingerprint = machine_fingerprint(self.hardware)
+        self.profile = self.cache.load(self.fingerprint) or default_profile(self.hardware)
+        applied = self.model_config.apply_hardware_profile(self.profile)
+        return applied
+
+    def needs_calibration(self):
+        return not self.profile.get('calibrated')
+
+    def finish(self, llm):
+        """Kalibrasi di model yang sudah dimuat lalu simpan profilnya"""
+        if not self.needs_calibration():
+            return self.profile
+        # RemoteLlama: kalibrasi harus jalan di proses yang memegang context llama
+        run = getattr(llm, "run_in_worker", None) or (lambda fn, *args: fn(llm, *args))
+        tuned = run(calibrate, self.hardware)
+        if 'n_batch' in self.model_config.explicit:
+            # Kandidat batch dibatasi n_batch eksplisit, hasilnya bukan optimum mesin
+            tuned.pop('n_batch')
+        self.profile = {**self.profile, **tuned, 'hardware': self.hardware}
+        self.cache.save(self.fingerprint, self.profile)
+
+        # n_threads langsung dipakai; n_batch baru berlaku di load berikutnya
+        if 'n_threads' in self.model_config.explicit:
+            run(set_llm_threads, self.model_config.n_threads)
+        else:
+            self.model_config.n_threads = tuned['n_threads']
+        return self.profile
@@ -0,0 +1,139 @@
+"""
+Full-text search history - index SQLite FTS5 di disk, diperbarui incremental dari HistoryStore
+"""
+
+import re
+import sqlite3
+import threading
+
+from core.history_store import iter_history
+
+SYNC_CHUNK = 1000
+
+
+def build_fts_query(text):
+    """Kata-kata input jadi query FTS5 (AND), kata terakhir prefix supaya bisa search-as-you-type"""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]]
+    terms.append(f'"{words[-1]}"*')
+    return " ".join(terms)
+
+
+class SearchHit:
+    """Satu hasil search: index entry di history + potongan teks yang cocok"""
+    __slots__ = ("index", "timestamp", "snippet", "rank")
+
+    def __init__(self, index, timestamp, snippet, rank):
+        self.index = index
+        self.timestamp = timestamp
+        self.snippet = snippet
+        self.rank = rank
+
+
+class HistorySearchIndex:
+    """
+    rowid = index entry di history, jadi hit langsung bisa dibuka lewat load_chat.
+    History append-only: sync() cukup menambah entry setelah `count` terakhir,
+    index dibangun ulang kalau history di-clear atau entry pertamanya berubah.
+    Tanpa FTS5 (build SQLite lama) search jatuh ke LIKE biasa.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.fts = self._create_schema()
+
+    def _create_schema(self):
+        conn = self._conn
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+                "user_message, ai_response, timestamp UNINDEXED, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            conn.commit()
+            return True
+        except sqlite3.OperationalError:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS history_fts ("
+                "rowid INTEGER PRIMARY KEY, user_message TEXT, ai_response TEXT, timestamp TEXT)"
+            )
+            conn.commit()
+            return False
+
+    def _meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def indexed_count(self):
+        with self._lock:
+            return int(self._meta("count", 0))
+
+    def sync(self, history):
+        """Index entry yang belum masuk, return jumlah entry yang ditambahkan"""
+        total = len(history)
+        first = history[0].get('timestamp', '') if total else ""
+        with self._lock:
+            count = int(self._meta("count", 0))
+            if count > total or (count and self._meta("first") != first):
+                self._conn.execute("DELETE FROM history_fts")
+                count = 0
+            added = 0
+            # Dibaca berurutan dari disk, entry lama tidak ikut tertahan di cache HistoryStore
+            entries = iter_history(history, count, total)
+            for start in range(count, total, SYNC_CHUNK):
+                rows = [(start + offset, chat.get('user_message', ''), chat.get('ai_response', ''),
+                         chat.get('timestamp', ''))
+                        for offset, chat in zip(range(min(SYNC_CHUNK, total - start)), entries)]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO history_fts (rowid, user_message, ai_response, timestamp) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                added += len(rows)
+            self._set_meta("count", total)
+            self._set_meta("first", first)
+            self._conn.commit()
+        return added
+
+    def search(self, text, limit=50):
+        """Hit terurut relevansi (BM25, pesan user diberi bobot lebih), terbaru dulu kalau tanpa FTS5"""
+        query = build_fts_query(text)
+        if query is None:
+            return []
+        with self._lock:
+            if self.fts:
+                rows = self._conn.execute(
+                    "SELECT rowid, timestamp, "
+                    "snippet(history_fts, -1, '«', '»', '…', 8), "
+                    "bm25(history_fts, 2.0, 1.0) AS score "
+                    "FROM history_fts WHERE history_fts MATCH ? ORDER BY score LIMIT ?",
+                    (query, limit)
+                ).fetchall()
+            else:
+                words = re.findall(r"\w+", text.lower())
+                where = " AND ".join("(user_message LIKE ? OR ai_response LIKE ?)" for _ in words)
+                params = [p for word in words for p in (f"%{word}%", f"%{word}%")]
+                rows = self._conn.execute(
+                    f"SELECT rowid, timestamp, substr(user_message, 1, 60), 0 FROM history_fts "
+                    f"WHERE {where} ORDER BY rowid DESC LIMIT ?",
+                    params + [limit]
+                ).fetchall()
+        return [SearchHit(index, timestamp, snippet, rank) for index, timestamp, snippet, rank in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM history_fts")
+            self._set_meta("count", 0)
+            self._set_meta("first", "")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
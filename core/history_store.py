@@ -0,0 +1,221 @@
+"""
+Chat history store untuk Phi-3 Chat App - JSONL append-only dengan index offset
+"""
+
+import hashlib
+import json
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+
+OFFSET_SIZE = 8  # uint64 per entry di file .idx
+
+
+class HistoryStore(Sequence):
+    """
+    History disimpan sebagai satu baris JSON per entry (append-only) plus file .idx
+    berisi offset byte tiap baris. Startup hanya membaca entry terbaru, entry lama
+    dibaca dari disk saat diakses.
+
+    Cache memory: `preload` entry terbaru selalu disimpan, entry lama yang dibaca
+    (scroll sidebar, hasil search, retrieval) masuk LRU berisi maksimal `cache_size` entry.
+    """
+    def __init__(self, path, preload=200, cache_size=None):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".idx"
+        self.keep_recent = preload
+        self.cache_size = preload if cache_size is None else cache_size
+        self._lock = threading.Lock()
+        self._offsets = array("Q")
+        self._cache = OrderedDict()
+        self._open()
+        self.preload(preload)
+
+    def _open(self):
+        if not os.path.exists(self.path):
+            open(self.path, "ab").close()
+        self._recover_tail()
+        if not self._load_index():
+            self._rebuild_index()
+
+    def _recover_tail(self):
+        """Buang baris terakhir yang terpotong (crash di tengah penulisan)"""
+        size = os.path.getsize(self.path)
+        if size == 0:
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # Cari newline terakhir lalu truncate sesudahnya
+            pos = size - 1
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                nl = chunk.rfind(b"\n")
+                if nl != -1:
+                    f.truncate(pos - step + nl + 1)
+                    return
+                pos -= step
+            f.truncate(0)
+
+    def _load_index(self):
+        """Baca file .idx, return False kalau tidak cocok dengan file data"""
+        if not os.path.exists(self.index_path):
+            return False
+        with open(self.index_path, "rb") as f:
+            raw = f.read()
+        offsets = array("Q")
+        offsets.frombytes(raw[:len(raw) - len(raw) % OFFSET_SIZE])
+        data_size = os.path.getsize(self.path)
+        # Index boleh tertinggal dari data, tapi tidak boleh menunjuk melewati data
+        while offsets and offsets[-1] >= data_size:
+            offsets.pop()
+        self._offsets = offsets
+        if offsets:
+            with open(self.path, "rb") as f:
+                f.seek(offsets[-1])
+                f.readline()
+                if f.tell() != data_size:
+                    return False
+        elif data_size:
+            return False
+        return True
+
+    def _rebuild_index(self):
+        offsets = array("Q")
+        with open(self.path, "rb") as f:
+            pos = 0
+            for line in f:
+                if line.strip():
+                    offsets.append(pos)
+                pos += len(line)
+        self._offsets = offsets
+        with open(self.index_path, "wb") as f:
+            f.write(offsets.tobytes())
+
+    def preload(self, count):
+        """Muat `count` entry terbaru ke memory"""
+        start = max(0, len(self._offsets) - count)
+        for i in range(start, len(self._offsets)):
+            self._read(i)
+
+    def _read(self, index):
+        with self._lock:
+            entry = self._cache.get(index)
+            if entry is not None:
+                self._cache.move_to_end(index)
+                return entry
+            with open(self.path, "rb") as f:
+                f.seek(self._offsets[index])
+                entry = json.loads(f.readline().decode("utf-8"))
+            self._cache[index] = entry
+            self._evict()
+        return entry
+
+    def _evict(self):
+        """Buang entry lama yang paling lama tidak dibaca (lock sudah dipegang)"""
+        excess = len(self._cache) - self.keep_recent - self.cache_size
+        if excess <= 0:
+            return
+        recent_start = len(self._offsets) - self.keep_recent
+        for index in list(self._cache):
+            if index < recent_start:
+                del self._cache[index]
+                excess -= 1
+                if not excess:
+                    break
+
+    def iter_entries(self, start=0, stop=None, chunk=1000):
+        """
+        Baca entry start..stop berurutan langsung dari disk tanpa mengisi cache,
+        untuk membangun index atas seluruh history tanpa menahannya di memory.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        with open(self.path, "rb") as f:
+            for begin in range(start, stop, chunk):
+                with self._lock:
+                    if begin >= len(self._offsets):
+                        return  # History di-clear di tengah iterasi
+                    f.seek(self._offsets[begin])
+                    lines = [f.readline() for _ in range(min(chunk, stop - begin))]
+                for line in lines:
+                    yield json.loads(line.decode("utf-8"))
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._read(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        return self._read(index)
+
+    def append(self, entry):
+        """Tambah satu entry: tulis baris data lalu offset-nya ke .idx"""
+        self.extend([entry])
+
+    def extend(self, entries):
+        """Tambah beberapa entry dengan satu fsync"""
+        with self._lock:
+            new_offsets = array("Q")
+            with open(self.path, "ab") as f:
+                for entry in entries:
+                    new_offsets.append(f.tell())
+                    f.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.index_path, "ab") as f:
+                f.write(new_offsets.tobytes())
+            start = len(self._offsets)
+            self._offsets.extend(new_offsets)
+            for i, entry in enumerate(entries):
+                self._cache[start + i] = entry
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            open(self.path, "wb").close()
+            open(self.index_path, "wb").close()
+            self._offsets = array("Q")
+            self._cache = OrderedDict()
+
+
+def iter_history(history, start=0, stop=None):
+    """Entry start..stop dari HistoryStore (tanpa cache) atau list biasa"""
+    if isinstance(history, HistoryStore):
+        return history.iter_entries(start, stop)
+    return iter(history[start:stop])
+
+
+def entry_key(entry):
+    """Identitas stabil satu entry history"""
+    raw = f"{entry.get('timestamp', '')}\0{entry.get('user_message', '')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def migrate_json_history(json_path, store):
+    """
+    Migrasi sekali dari chat_history.json lama ke store baru.
+    File lama di-rename menjadi .migrated supaya tidak diproses dua kali.
+    """
+    if not os.path.exists(json_path) or len(store) > 0:
+        return 0
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        entries = json.loads(content) if content.strip() else []
+    except Exception as e:
+        print(f"Error migrating history: {e}")
+        return 0
+
+    store.extend(entries)
+    os.replace(json_path, json_path + ".migrated")
+    print(f"📜 Migrated {len(entries)} history entries to {os.path.basename(store.path)}")
+    return len(entries)
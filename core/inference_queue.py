@@ -0,0 +1,149 @@
+"""
+Antrian inferensi - serialisasi akses ke satu instance Llama dengan antrian FIFO terbatas,
+cancel job yang sedang jalan, dan drop job yang masih menunggu
+"""
+
+import queue
+import threading
+import time
+
+
+class QueueFullError(Exception):
+    """Antrian penuh, request harus ditolak (HTTP 503)"""
+
+
+class InferenceJob:
+    """Satu request di antrian beserta timing-nya"""
+    def __init__(self, fn, on_start=None, on_done=None):
+        self.fn = fn
+        self.on_start = on_start
+        self.on_done = on_done
+        self.dropped = False
+        self.enqueued_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def queue_wait_ms(self):
+        end = self.started_at or time.perf_counter()
+        return (end - self.enqueued_at) * 1000
+
+    @property
+    def generation_ms(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at or time.perf_counter()
+        return (end - self.started_at) * 1000
+
+    def timings(self):
+        return {
+            'queue_wait_ms': round(self.queue_wait_ms, 1),
+            'generation_ms': round(self.generation_ms, 1)
+        }
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class InferenceQueue:
+    """
+    Satu worker thread memegang llm, job dijalankan FIFO.
+    submit() langsung gagal kalau antrian sudah berisi `maxsize` job.
+    fn(llm, job) sebaiknya mengecek job.cancelled di antara token supaya bisa dihentikan.
+    """
+    def __init__(self, llm, maxsize=8, lock=None):
+        self.llm = llm
+        self.lock = lock or threading.Lock()
+        self.current = None
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._waiting = []
+        self._waiting_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, fn, on_start=None, on_done=None):
+        """fn(llm, job) dijalankan di worker thread, callback juga dipanggil di worker thread"""
+        job = InferenceJob(fn, on_start=on_start, on_done=on_done)
+        # Masuk _waiting sebelum queue: worker bisa mengambil job sebelum submit() selesai
+        with self._waiting_lock:
+            self._waiting.append(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._waiting_lock:
+                self._waiting.remove(job)
+            raise QueueFullError(f"Inference queue full ({self._queue.maxsize} pending)")
+        return job
+
+    def pending(self):
+        with self._waiting_lock:
+            return sum(1 for job in self._waiting if not job.cancelled.is_set())
+
+    def busy(self):
+        return self.current is not None or self.pending() > 0
+
+    def cancel_current(self):
+        """Hentikan job yang sedang decoding (dicek di antara token)"""
+        job = self.current
+        if job is not None:
+            job.cancelled.set()
+        return job
+
+    def drop_pending(self):
+        """Buang semua job yang belum mulai, return jumlahnya"""
+        with self._waiting_lock:
+            waiting = [job for job in self._waiting if not job.cancelled.is_set()]
+        for job in waiting:
+            job.dropped = True
+            job.cancelled.set()
+        return len(waiting)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run_job(job)
+            except Exception as e:
+                # Satu job bermasalah tidak boleh mematikan satu-satunya worker thread
+                print(f"⚠️ Inference worker error: {e}")
+                self.current = None
+                if not job.done.is_set():
+                    job.error = job.error or e
+                    job.done.set()
+
+    def _run_job(self, job):
+        with self._waiting_lock:
+            if job in self._waiting:
+                self._waiting.remove(job)
+        if job.cancelled.is_set():
+            job.dropped = True
+            self._finish(job)
+            return
+
+        self.current = job
+        job.started_at = time.perf_counter()
+        try:
+            if job.on_start:
+                job.on_start(job)
+            with self.lock:
+                job.result = job.fn(self.llm, job)
+        except Exception as e:
+            job.error = e
+        job.finished_at = time.perf_counter()
+        self.current = None
+        self._finish(job)
+
+    def _finish(self, job):
+        job.done.set()
+        if job.on_done:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                print(f"⚠️ Job callback error: {e}")
@@ -0,0 +1,442 @@
+"""
+Worker inferensi di proses terpisah - Llama dimuat di proses anak, request lewat Pipe,
+token/teks streaming kembali lewat ring buffer shared memory
+"""
+
+import multiprocessing
+import os
+import pickle
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+RECORD_HEADER = struct.Struct("<IB")  # panjang payload, jenis record
+POSITIONS = struct.Struct("<QQ")      # write_pos, read_pos (monoton, bukan offset)
+TOKEN = struct.Struct("<i")
+
+KIND_PAD = 0
+KIND_TEXT = 1
+KIND_TOKEN = 2
+KIND_END = 3
+
+KV_FIELDS = ('type_k', 'type_v', 'flash_attn')  # Bisa turun ke f16 saat load di worker
+
+
+class WorkerCrashedError(RuntimeError):
+    """Proses worker mati di tengah request (request gagal, worker sudah di-restart)"""
+
+
+class TokenRing:
+    """
+    Ring buffer single-producer/single-consumer di shared memory.
+    Header 16 byte berisi posisi tulis (hanya ditulis worker) dan posisi baca
+    (hanya ditulis GUI), record [panjang u32][jenis u8][payload] tidak pernah
+    melewati ujung buffer - sisa ruang di ujung dilewati dengan record PAD.
+    """
+    def __init__(self, capacity=1024 * 1024, name=None):
+        self.capacity = capacity
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=POSITIONS.size + capacity)
+            POSITIONS.pack_into(self.shm.buf, 0, 0, 0)
+        else:
+            # Worker spawn berbagi resource tracker dengan GUI, unlink tetap dilakukan pemilik
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+
+    def _positions(self):
+        return POSITIONS.unpack_from(self.buf, 0)
+
+    def reset(self):
+        POSITIONS.pack_into(self.buf, 0, 0, 0)
+
+    def write(self, kind, payload=b"", should_stop=None):
+        """Tulis satu record, tunggu kalau ring penuh (backpressure). False kalau dibatalkan."""
+        size = RECORD_HEADER.size + len(payload)
+        if size > self.capacity // 2:
+            raise ValueError(f"Record {size} bytes terlalu besar untuk ring {self.capacity} bytes")
+        while True:
+            write_pos, read_pos = self._positions()
+            offset = write_pos % self.capacity
+            tail = self.capacity - offset
+            needed = size if size <= tail else tail + size
+            if self.capacity - (write_pos - read_pos) >= needed:
+                break
+            if should_stop and should_stop():
+                return False
+            time.sleep(0.0005)
+
+        if size > tail:
+            if tail >= RECORD_HEADER.size:
+                RECORD_HEADER.pack_into(self.buf, POSITIONS.size + offset, 0, KIND_PAD)
+            write_pos += tail
+            offset = 0
+        start = POSITIONS.size + offset
+        RECORD_HEADER.pack_into(self.buf, start, len(payload), kind)
+        self.buf[start + RECORD_HEADER.size:start + size] = payload
+        # Posisi tulis di-update terakhir supaya pembaca tidak melihat record setengah jadi
+        struct.pack_into("<Q", self.buf, 0, write_pos + size)
+        return True
+
+    def read(self):
+        """Ambil semua record yang sudah lengkap, [(jenis, payload)]"""
+        records = []
+        write_pos, read_pos = self._positions()
+        while read_pos < write_pos:
+            offset = read_pos % self.capacity
+            tail = self.capacity - offset
+            if tail < RECORD_HEADER.size:
+                read_pos += tail
+                continue
+            start = POSITIONS.size + offset
+            length, kind = RECORD_HEADER.unpack_from(self.buf, start)
+            if kind == KIND_PAD:
+                read_pos += tail
+                continue
+            payload = bytes(self.buf[start + RECORD_HEADER.size:start + RECORD_HEADER.size + length])
+            read_pos += RECORD_HEADER.size + length
+            records.append((kind, payload))
+        struct.pack_into("<Q", self.buf, 8, read_pos)
+        return records
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def worker_main(conn, ring_name, ring_capacity, ready, cancel, model_config, overrides):
+    """Loop proses worker: muat model, lalu layani request dari GUI satu per satu"""
+    from core.model_loader import load_llama
+    from core.streaming import stream_generate
+
+    ring = TokenRing(ring_capacity, name=ring_name)
+
+    def push(kind, payload=b""):
+        ring.write(kind, payload, should_stop=cancel.is_set)
+        ready.release()
+
+    def end_stream():
+        # END selalu ditulis (GUI tetap membaca walau dibatalkan) supaya stream tertutup
+        ring.write(KIND_END)
+        ready.release()
+
+    try:
+        llm = load_llama(model_config, **overrides)
+    except Exception as e:
+        conn.send(('error', _picklable_error(e)))
+        return
+    conn.send(('ok', {'n_ctx': llm.n_ctx(), 'token_eos': llm.token_eos(), 'pid': os.getpid(),
+                      'kv': {key: getattr(model_config, key) for key in KV_FIELDS}}))
+
+    while True:
+        try:
+            op, args = conn.recv()
+        except (EOFError, OSError):
+            break
+        if op == 'shutdown':
+            break
+        try:
+            if op == 'call':
+                name, call_args, call_kwargs = args
+                result = getattr(llm, name)(*call_args, **call_kwargs)
+            elif op == 'getattr':
+                result = getattr(llm, args)
+            elif op == 'run':
+                fn, fn_args = args
+                result = fn(llm, *fn_args)
+            elif op == 'generate':
+                tokens, kwargs = args
+                try:
+                    for token in llm.generate(tokens, **kwargs):
+                        push(KIND_TOKEN, TOKEN.pack(token))
+                        if cancel.is_set():
+                            break
+                finally:
+                    end_stream()
+                result = None
+            elif op == 'stream_generate':
+                prompt, gen_config, draft = args
+                try:
+                    result = stream_generate(
+                        llm, prompt, gen_config,
+                        on_text=lambda text: push(KIND_TEXT, text.encode("utf-8")),
+                        should_stop=cancel.is_set,
+                        draft=draft
+                    )
+                finally:
+                    end_stream()
+            else:
+                raise ValueError(f"Unknown worker op: {op}")
+            conn.send(('ok', result))
+        except Exception as e:
+            conn.send(('error', _picklable_error(e)))
+    ring.close()
+
+
+def _picklable_error(error):
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+class RemoteLlama:
+    """
+    Proxy Llama untuk model yang dimuat di proses worker. Method Llama yang dipakai aplikasi
+    (tokenize, detokenize, eval, reset, save_state/load_state, ...) diteruskan lewat Pipe;
+    generate() dan stream_generate() mengalirkan hasil lewat TokenRing.
+
+    Kalau proses worker mati, request yang sedang jalan gagal dengan WorkerCrashedError
+    dan worker dimuat ulang otomatis (KV-cache kosong, prefix cache akan mengisinya lagi).
+    """
+    def __init__(self, model_config, ring_bytes=1024 * 1024, max_restarts=3,
+                 restart_window_s=60.0, poll_s=0.01, **overrides):
+        self.model_config = model_config
+        self.model_path = overrides.get('model_path', model_config.model_path)
+        self.overrides = overrides
+        self.ring_bytes = ring_bytes
+        self.max_restarts = max_restarts
+        self.restart_window_s = restart_window_s
+        self.poll_s = poll_s
+        self.restarts = []
+        self.info = {}
+        self._mp = multiprocessing.get_context("spawn")
+        self._ring = TokenRing(ring_bytes)
+        # Semaphore, bukan Event: Condition.notify multiprocessing menunggu pembaca bangun
+        self._ready = self._mp.Semaphore(0)
+        self._cancel = self._mp.Event()
+        self._lock = threading.RLock()
+        self._process = None
+        self._conn = None
+        try:
+            self._start()
+        except Exception:
+            self._ring.close()
+            raise
+
+    # --- Lifecycle ---
+
+    def _start(self):
+        self._ring.reset()
+        while self._ready.acquire(False):
+            pass
+        self._cancel.clear()
+        parent_conn, child_conn = self._mp.Pipe()
+        self._process = self._mp.Process(
+            target=worker_main,
+            args=(child_conn, self._ring.name, self.ring_bytes, self._ready, self._cancel,
+                  self.model_config, self.overrides),
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()  # Supaya recv() dapat EOFError kalau worker mati
+        self._conn = parent_conn
+        try:
+            status, payload = self._recv()
+        except _WorkerDied as e:
+            self._stop_process()
+            raise WorkerCrashedError(f"Inference worker died while loading model: {e}")
+        if status == 'error':
+            self._stop_process()
+            raise payload
+        self.info = payload
+        # Fallback KV f16 di worker juga berlaku untuk model_config milik GUI/engine
+        for key, value in payload['kv'].items():
+            setattr(self.model_config, key, value)
+
+    def _stop_process(self):
+        if self._process is not None and self._process.is_alive():
+            self._process.terminate()
+            self._process.join(5)
+        if self._conn is not None:
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def _restart(self, reason):
+        """Muat ulang worker setelah crash, menyerah kalau terlalu sering dalam satu window"""
+        self._stop_process()
+        now = time.monotonic()
+        self.restarts = [t for t in self.restarts if now - t < self.restart_window_s]
+        if len(self.restarts) >= self.max_restarts:
+            raise WorkerCrashedError(f"Inference worker crashed {len(self.restarts) + 1}x, not restarting: {reason}")
+        self.restarts.append(now)
+        print(f"♻️ Inference worker crashed ({reason}), restarting...")
+        self._start()
+        raise WorkerCrashedError(f"Inference worker crashed: {reason}")
+
+    def alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def pid(self):
+        return self.info.get('pid')
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.send(('shutdown', None))
+                except OSError:
+                    pass
+                if self._process is not None:
+                    self._process.join(2)
+            self._stop_process()
+            if self._ring is not None:
+                self._ring.close()
+                self._ring = None
+
+    # --- RPC ---
+
+    def _recv(self):
+        try:
+            return self._conn.recv()
+        except (EOFError, OSError):
+            code = self._process.exitcode if self._process else None
+            raise _WorkerDied(f"exit code {code}")
+
+    def _request(self, op, args=None):
+        with self._lock:
+            if self._conn is None:
+                self._start()
+            try:
+                self._conn.send((op, args))
+                status, payload = self._recv()
+            except (_WorkerDied, BrokenPipeError) as e:
+                self._restart(str(e))
+            if status == 'error':
+                raise payload
+            return payload
+
+    def _records(self, op, args, should_stop=None):
+        """
+        Kirim request streaming lalu yield record ring sampai END, return balasan akhirnya.
+        Selama stream berjalan worker tidak melayani RPC lain.
+        """
+        with self._lock:
+            self._cancel.clear()
+            finished = False
+            try:
+                self._conn.send((op, args))
+                while not finished:
+                    for kind, payload in self._ring.read():
+                        if kind == KIND_END:
+                            finished = True
+                        else:
+                            yield kind, payload
+                    if finished:
+                        break
+                    if should_stop and should_stop():
+                        self._cancel.set()
+                    if not self._wait_ready() and not self._process.is_alive():
+                        raise _WorkerDied(f"exit code {self._process.exitcode}")
+                status, payload = self._recv()
+            except (_WorkerDied, BrokenPipeError) as e:
+                finished = True  # Worker baru tidak punya stream yang perlu dikuras
+                self._restart(str(e))
+            finally:
+                if not finished and self.alive():
+                    # Consumer berhenti lebih awal: hentikan worker dan buang sisa record
+                    self._cancel.set()
+                    self._drain_until_end()
+            if status == 'error':
+                raise payload
+            return payload
+
+    def _wait_ready(self):
+        """Tunggu sinyal record baru dari worker, False kalau timeout"""
+        if not self._ready.acquire(timeout=self.poll_s):
+            return False
+        while self._ready.acquire(False):
+            pass
+        return True
+
+    def _drain_until_end(self):
+        while True:
+            if any(kind == KIND_END for kind, _ in self._ring.read()):
+                break
+            if not self._wait_ready() and not self._process.is_alive():
+                return
+        try:
+            self._recv()
+        except _WorkerDied:
+            pass
+
+    # --- API Llama ---
+
+    def n_ctx(self):
+        return self.info['n_ctx']
+
+    def token_eos(self):
+        return self.info['token_eos']
+
+    def tokenize(self, *args, **kwargs):
+        return self._request('call', ('tokenize', args, kwargs))
+
+    def detokenize(self, *args, **kwargs):
+        return self._request('call', ('detokenize', args, kwargs))
+
+    def eval(self, tokens):
+        return self._request('call', ('eval', (list(tokens),), {}))
+
+    def reset(self):
+        return self._request('call', ('reset', (), {}))
+
+    def set_seed(self, seed):
+        return self._request('call', ('set_seed', (seed,), {}))
+
+    def save_state(self):
+        return self._request('call', ('save_state', (), {}))
+
+    def load_state(self, state):
+        return self._request('call', ('load_state', (state,), {}))
+
+    @property
+    def n_tokens(self):
+        return self._request('getattr', 'n_tokens')
+
+    @property
+    def input_ids(self):
+        return self._request('run', (_input_ids, ()))
+
+    def run_in_worker(self, fn, *args):
+        """Jalankan fn(llm, *args) di proses worker (fn harus bisa di-pickle: fungsi level modul)"""
+        return self._request('run', (fn, args))
+
+    def generate(self, tokens, **kwargs):
+        """
+        Generator token seperti Llama.generate(). Worker berhenti saat generator ditutup;
+        jangan memanggil method lain (misalnya detokenize) di dalam loop-nya.
+        """
+        for kind, payload in self._records('generate', (list(tokens), kwargs)):
+            if kind == KIND_TOKEN:
+                yield TOKEN.unpack(payload)[0]
+
+    def stream_generate(self, prompt, gen_config, on_text=None, should_stop=None, draft=None):
+        """
+        Seluruh loop stream_generate() (tokenize, sampling, detokenize, stop string) jalan
+        di worker, GUI hanya menerima potongan teks yang sudah aman ditampilkan.
+        """
+        records = self._records('stream_generate', (prompt, gen_config, draft), should_stop=should_stop)
+        while True:
+            try:
+                kind, payload = next(records)
+            except StopIteration as stop:
+                return stop.value
+            if kind == KIND_TEXT and on_text:
+                on_text(payload.decode("utf-8"))
+
+
+class _WorkerDied(Exception):
+    pass
+
+
+def _input_ids(llm):
+    return list(llm.input_ids[:llm.n_tokens])
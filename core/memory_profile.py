@@ -0,0 +1,121 @@
+"""
+Profil memori - pilih profil (mmap/mlock, tipe KV cache, n_ctx) dan cek budget RSS-nya
+dengan peak RSS hasil psutil selama satu generasi uji
+"""
+
+import json
+import os
+import time
+
+import psutil
+
+from config.settings import GenerationConfig, MEMORY_PROFILES, auto_memory_profile
+from config.prompts import get_system_prompt, get_chat_prompt
+from core.streaming import stream_generate
+from core.telemetry import ResourceSampler
+
+TEST_MESSAGE = "Write a short Python function that reverses a list, then explain it in two sentences."
+
+
+def resolve_memory_profile(name):
+    """Nama profil dari AppConfig.memory_profile, "auto" dipilih dari total RAM"""
+    if name == "auto":
+        return auto_memory_profile(psutil.virtual_memory().total)
+    if name not in MEMORY_PROFILES:
+        print(f"⚠️ Unknown memory profile '{name}', using auto")
+        return auto_memory_profile(psutil.virtual_memory().total)
+    return name
+
+
+def measure_peak_rss(llm, system_prompt=None, max_tokens=32, interval_s=0.02):
+    """
+    Generasi uji (greedy, max_tokens pendek) sambil sampling RSS proses ini + proses anak
+    (worker inferensi). KV cache dialokasikan penuh saat context dibuat dan generasi
+    menyentuh semua weights, jadi peak di sini mendekati peak saat chat biasa.
+    """
+    gen_config = GenerationConfig()
+    gen_config.max_tokens = max_tokens
+    gen_config.temperature = 0.0
+    gen_config.use_generation_guard = False
+    prompt = get_chat_prompt(system_prompt or get_system_prompt("english", "coding"), TEST_MESSAGE)
+
+    sampler = ResourceSampler(idle_interval=interval_s, busy_interval=interval_s)
+    sampler.set_busy(True)
+    since = time.perf_counter()
+    sampler.start()
+    try:
+        result = stream_generate(llm, prompt, gen_config)
+    finally:
+        sampler.stop()
+    summary = sampler.summarize(since)
+    return {
+        'peak_rss_mb': summary.get('peak_rss_mb', 0.0),
+        'samples': summary.get('samples', 0),
+        'test_tokens': result.completion_tokens,
+        'test_ms': round(result.total_ms, 1)
+    }
+
+
+class MemoryProfileStore:
+    """
+    cache/memory_profile.json: profil terakhir yang dipilih di sidebar dan hasil cek budget
+    per kombinasi model + profil + konfigurasi KV (cek diulang kalau salah satunya berubah).
+    """
+    def __init__(self, cache_dir):
+        self.path = os.path.join(cache_dir, "memory_profile.json")
+        self.data = {'selected': None, 'checks': {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def selected(self):
+        return self.data.get('selected')
+
+    def select(self, name):
+        self.data['selected'] = name
+        self._save()
+
+    def check_for(self, key):
+        return self.data['checks'].get(key)
+
+    def record_check(self, key, check):
+        self.data['checks'][key] = check
+        self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def check_memory_budget(llm, model_config, system_prompt=None):
+    """Bandingkan peak RSS generasi uji dengan target_rss_mb profil aktif"""
+    check = measure_peak_rss(llm, system_prompt)
+    check.update({
+        'profile': model_config.memory_profile,
+        'target_rss_mb': model_config.target_rss_mb,
+        'n_ctx': llm.n_ctx(),
+        'type_k': model_config.type_k,
+        'type_v': model_config.type_v,
+        'use_mmap': model_config.use_mmap,
+        'use_mlock': model_config.use_mlock,
+        'checked_at': time.strftime("%Y-%m-%dT%H:%M:%S")
+    })
+    check['within_budget'] = not model_config.target_rss_mb or check['peak_rss_mb'] <= model_config.target_rss_mb
+    return check
+
+
+def describe_check(check):
+    """Satu baris untuk status bar / log"""
+    peak_gb = check['peak_rss_mb'] / 1024
+    if not check['target_rss_mb']:
+        return f"🧠 Peak RAM {peak_gb:.2f} GB ({check['profile']})"
+    target_gb = check['target_rss_mb'] / 1024
+    if check['within_budget']:
+        return f"🧠 Peak RAM {peak_gb:.2f} / {target_gb:.1f} GB ({check['profile']})"
+    return f"⚠️ Peak RAM {peak_gb:.2f} GB > {target_gb:.1f} GB budget ({check['profile']}), try a smaller profile"
@@ -0,0 +1,33 @@
+"""
+Helper statistik latency dan throughput untuk batch runner dan benchmark
+"""
+
+
+def percentile(values, pct):
+    """Percentile dengan interpolasi linear (pct 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize_results(results, wall_seconds=None):
+    """Ringkasan GenerationResult: total token, tokens/sec, p50/p95 latency"""
+    latencies = [r.total_ms for r in results]
+    first_tokens = [r.first_token_ms for r in results if r.first_token_ms is not None]
+    completion_tokens = sum(r.completion_tokens for r in results)
+    generation_seconds = sum(latencies) / 1000
+    return {
+        'requests': len(results),
+        'prompt_tokens': sum(r.prompt_tokens for r in results),
+        'completion_tokens': completion_tokens,
+        'tokens_per_second': round(completion_tokens / generation_seconds, 2) if generation_seconds else 0.0,
+        'latency_p50_ms': round(percentile(latencies, 50), 1),
+        'latency_p95_ms': round(percentile(latencies, 95), 1),
+        'first_token_p50_ms': round(percentile(first_tokens, 50), 1),
+        'first_token_p95_ms': round(percentile(first_tokens, 95), 1),
+        'wall_seconds': round(wall_seconds, 2) if wall_seconds is not None else None
+    }
@@ -0,0 +1,69 @@
+"""
+Model loader bersama untuk GUI, server, dan batch runner
+"""
+
+from core.gguf import kv_type_id
+
+
+def import_backend(model_config):
+    """
+    Return class model sesuai model_config.backend.
+    "fake" memakai FakeLlama (benchmark / CI tanpa model).
+    """
+    if model_config.backend == "fake":
+        from core.fake_llama import FakeLlama
+        return FakeLlama
+    # Import berat, jadi baru dilakukan saat model benar-benar dimuat
+    from llama_cpp import Llama
+    return Llama
+
+
+def load_llama(model_config, **overrides):
+    """
+    Buat instance Llama dari ModelConfig, overrides untuk parameter tambahan.
+    Kalau KV terkuantisasi ditolak backend, model_config ikut diubah ke f16.
+    """
+    Llama = import_backend(model_config)
+    if model_config.backend == "fake":
+        from core.fake_llama import fake_latency_from_env
+        overrides = {**fake_latency_from_env(), **overrides}
+
+    params = {
+        'model_path': model_config.model_path,
+        'n_ctx': model_config.n_ctx,
+        'n_threads': model_config.n_threads,
+        'n_batch': model_config.n_batch,
+        'n_gpu_layers': model_config.n_gpu_layers,
+        'use_mmap': model_config.use_mmap,
+        'use_mlock': model_config.use_mlock,
+        'type_k': kv_type_id(model_config.type_k),
+        'type_v': kv_type_id(model_config.type_v),
+        'flash_attn': model_config.flash_attn,
+        'verbose': model_config.verbose
+    }
+    if model_config.speculative:
+        # Draft hanya bisa dipasang saat konstruksi: Llama menyiapkan logits semua posisi
+        # (logits_all) untuk batch verifikasi. Draft per generasi dipasang ke slot ini.
+        from core.speculative import DraftSlot
+        params['draft_model'] = DraftSlot()
+    params.update(overrides)
+    try:
+        return Llama(**params)
+    except ValueError as e:
+        if params['type_v'] == kv_type_id("f16") and params['type_k'] == kv_type_id("f16"):
+            raise
+        # Build llama.cpp / backend GPU tanpa dukungan KV terkuantisasi + flash attention
+        print(f"⚠️ Quantized KV cache unavailable ({e}), falling back to f16")
+        params.update(type_k=kv_type_id("f16"), type_v=kv_type_id("f16"), flash_attn=False)
+        llm = Llama(**params)
+        # Tipe efektif ditulis balik supaya estimasi RAM, tag snapshot KV, dan laporan profil
+        # memakai cache f16 yang benar-benar dialokasikan
+        model_config.type_k = model_config.type_v = "f16"
+        model_config.flash_attn = False
+        return llm
+
+
+def load_worker_llama(model_config, ring_kb=1024, **overrides):
+    """Seperti load_llama, tapi model dimuat di proses worker (RemoteLlama)"""
+    from core.inference_worker import RemoteLlama
+    return RemoteLlama(model_config, ring_bytes=ring_kb * 1024, **overrides)
@@ -0,0 +1,119 @@
+"""
+Model registry - scan file GGUF di folder model/ dan simpan model yang baru dipakai dalam budget RAM (LRU)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from core.gguf import inspect_gguf, GGUFError
+
+
+def estimate_model_ram(path, n_ctx=4096, n_batch=512, type_k="f16", type_v="f16", logits_all=False):
+    """Perkiraan RAM dari header GGUF, fallback ukuran file + 20% kalau header tidak terbaca"""
+    if not os.path.exists(path):
+        return 0  # Backend fake tidak punya file model
+    try:
+        return inspect_gguf(path).estimate_memory(n_ctx, n_batch, type_k, type_v, logits_all)['total_bytes']
+    except (OSError, ValueError, GGUFError):
+        return int(os.path.getsize(path) * 1.2)
+
+
+class ModelRegistry:
+    """Daftar model GGUF yang tersedia, key = nama file tanpa .gguf"""
+    def __init__(self, model_dir):
+        self.model_dir = model_dir
+        self.models = OrderedDict()
+
+    def scan(self):
+        self.models = OrderedDict()
+        if os.path.isdir(self.model_dir):
+            for name in sorted(os.listdir(self.model_dir)):
+                if name.lower().endswith(".gguf"):
+                    self.models[os.path.splitext(name)[0]] = os.path.join(self.model_dir, name)
+        return list(self.models.keys())
+
+    def path_for(self, name):
+        return self.models.get(name)
+
+    @staticmethod
+    def name_for(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+
+class ModelPool:
+    """
+    Model yang sudah dimuat, diurutkan LRU. Model aktif tidak pernah di-evict;
+    model lain dibuang dari yang paling lama tidak dipakai sampai total estimasi RAM
+    masuk budget.
+    """
+    def __init__(self, loader, ram_budget_bytes, estimate=estimate_model_ram):
+        self.loader = loader
+        self.ram_budget_bytes = ram_budget_bytes
+        self.estimate = estimate
+        self.active = None
+        self._models = OrderedDict()  # path -> (llm, estimated_bytes)
+        self._lock = threading.Lock()
+
+    def resident(self):
+        return list(self._models.keys())
+
+    def used_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def acquire(self, path):
+        """Return model untuk path, muat kalau belum resident (dipanggil dari background thread)"""
+        with self._lock:
+            if path in self._models:
+                self._models.move_to_end(path)
+                return self._models[path][0]
+            size = self.estimate(path)
+            self._evict(size)
+
+        llm = self.loader(path)
+        with self._lock:
+            self._models[path] = (llm, size)
+        return llm
+
+    def activate(self, path):
+        """Tandai model aktif lalu buang model lain yang melebihi budget"""
+        with self._lock:
+            self.active = path
+            if path in self._models:
+                self._models.move_to_end(path)
+            self._evict(0)
+
+    def release(self, path):
+        """Unload satu model (misalnya supaya bisa dimuat ulang dengan n_ctx lain)"""
+        with self._lock:
+            entry = self._models.pop(path, None)
+            if self.active == path:
+                self.active = None
+        if entry and hasattr(entry[0], "close"):
+            entry[0].close()
+
+    def reestimate(self, path):
+        """Hitung ulang estimasi RAM model resident setelah konfigurasi efektifnya berubah"""
+        with self._lock:
+            if path in self._models:
+                self._models[path] = (self._models[path][0], self.estimate(path))
+
+    def clear(self):
+        """Unload semua model (termasuk yang aktif)"""
+        with self._lock:
+            self.active = None
+            models, self._models = list(self._models.values()), OrderedDict()
+        for llm, _ in models:
+            if hasattr(llm, "close"):
+                llm.close()
+
+    def _evict(self, incoming_bytes):
+        for path in list(self._models.keys()):
+            if self.used_bytes() + incoming_bytes <= self.ram_budget_bytes:
+                break
+            if path == self.active:
+                continue
+            llm, _ = self._models.pop(path)
+            print(f"♻️ Unloading model {ModelRegistry.name_for(path)}")
+            if hasattr(llm, "close"):
+                llm.close()
@@ -0,0 +1,114 @@
+"""
+Prefix KV-cache untuk system prompt - evaluasi sekali per model, simpan state llama ke disk
+"""
+
+import hashlib
+import os
+import pickle
+
+from core.streaming import tokenize_prompt
+
+FINGERPRINT_CHUNK = 4 * 1024 * 1024
+
+
+def kv_config_tag(model_config, n_ctx=None):
+    """State KV (prefix / sesi) hanya valid untuk n_ctx/n_batch/tipe KV/logits_all yang sama"""
+    tag = f"ctx{n_ctx or model_config.n_ctx}-b{model_config.n_batch}"
+    if (model_config.type_k, model_config.type_v) != ("f16", "f16"):
+        # Tag f16 tidak berubah supaya snapshot yang sudah ada tetap terpakai
+        tag += f"-k{model_config.type_k}-v{model_config.type_v}"
+    if model_config.speculative:
+        # Ukuran scores di LlamaState ikut logits_all
+        tag += "-spec"
+    return tag
+
+
+def model_fingerprint(model_path):
+    """Hash model dari ukuran file + 4 MB awal dan akhir (header GGUF ikut ter-hash)"""
+    digest = hashlib.sha256()
+    if not os.path.exists(model_path):
+        # Backend fake tidak punya file model
+        digest.update(model_path.encode("utf-8"))
+        return digest.hexdigest()[:16]
+    size = os.path.getsize(model_path)
+    digest.update(str(size).encode())
+    with open(model_path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_CHUNK))
+        if size > FINGERPRINT_CHUNK:
+            f.seek(max(FINGERPRINT_CHUNK, size - FINGERPRINT_CHUNK))
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    return digest.hexdigest()[:16]
+
+
+def prompt_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def has_prefix(llm, tokens):
+    """Cek apakah state llm saat ini sudah diawali tokens"""
+    n = len(tokens)
+    if llm.n_tokens < n:
+        return False
+    return list(llm.input_ids[:n]) == list(tokens)
+
+
+class PrefixStateCache:
+    """
+    Simpan snapshot state llama setelah system prompt di-evaluasi.
+    Key: hash model + tag konfigurasi context + hash prompt.
+    """
+    def __init__(self, cache_dir, model_path, config_tag=""):
+        self.cache_dir = os.path.join(cache_dir, "prefix")
+        self.model_hash = model_fingerprint(model_path)
+        self.config_tag = config_tag
+        self.stats = {'live': 0, 'disk': 0, 'miss': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def state_path(self, system_prompt):
+        name = f"{self.model_hash}-{self.config_tag}-{prompt_hash(system_prompt)}.state"
+        return os.path.join(self.cache_dir, name)
+
+    def prepare(self, llm, system_prompt):
+        """
+        Pastikan KV-cache llm berisi system prompt sebelum generasi.
+        Return sumber prefix: 'live', 'disk', atau 'miss'.
+        """
+        prefix_tokens = tokenize_prompt(llm, system_prompt)
+        if has_prefix(llm, prefix_tokens):
+            self.stats['live'] += 1
+            return 'live'
+
+        path = self.state_path(system_prompt)
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    state = pickle.load(f)
+                llm.load_state(state)
+                if has_prefix(llm, prefix_tokens):
+                    self.stats['disk'] += 1
+                    return 'disk'
+            except Exception as e:
+                print(f"⚠️ Prefix cache rusak, evaluasi ulang: {e}")
+            self._remove(path)
+
+        llm.reset()
+        llm.eval(prefix_tokens)
+        self._save(path, llm.save_state())
+        self.stats['miss'] += 1
+        return 'miss'
+
+    def _save(self, path, state):
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Could not save prefix cache: {e}")
+            self._remove(tmp_path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,107 @@
+"""
+Response cache untuk Phi-3 Chat App - LRU di memory + tier disk, key = prompt + parameter sampling
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def make_cache_key(prompt, generation_kwargs, model_id=""):
+    """Key deterministik dari prompt final + kwargs generasi (stream tidak mempengaruhi output)"""
+    params = {k: v for k, v in generation_kwargs.items() if k != 'stream'}
+    payload = json.dumps({'model': model_id, 'prompt': prompt, 'params': params},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU response di memory dengan batas jumlah entry, entry juga ditulis ke disk
+    (satu file JSON per key) dengan batas total ukuran file.
+    """
+    def __init__(self, cache_dir, max_entries=256, max_disk_bytes=64 * 1024 * 1024):
+        self.cache_dir = os.path.join(cache_dir, "responses")
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # mtime dipakai sebagai urutan LRU di disk
+        except (OSError, ValueError):
+            self.stats['misses'] += 1
+            return None
+
+        self.stats['disk_hits'] += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        tmp_path = self._path(key) + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+            self._trim_disk()
+        except OSError as e:
+            print(f"⚠️ Could not write response cache: {e}")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _trim_disk(self):
+        """Hapus file paling lama dipakai sampai total ukuran di bawah batas"""
+        files = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_disk_bytes:
+            return
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_disk_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
@@ -0,0 +1,104 @@
+"""
+Retrieval history - index BM25 in-memory atas turn lama, dipakai memilih turn yang relevan untuk context
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+from core.history_store import iter_history
+
+TOKEN_RE = re.compile(r"\w{2,}")
+
+
+def tokenize_text(text):
+    """Token leksikal sederhana: kata >= 2 karakter, lowercase (identifier kode tetap utuh)"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index BM25 yang ditambah incremental per entry (history append-only).
+    Term yang muncul di lebih dari `max_df_ratio` dokumen dilewati saat query
+    (baru berlaku setelah index berisi `min_df_docs` dokumen; di history pendek
+    batas itu membuang hampir semua term) dan hanya `max_query_terms` term dengan
+    IDF tertinggi yang dinilai, supaya latency tetap beberapa ms di 10k+ entry.
+    """
+    def __init__(self, k1=1.2, b=0.75, max_df_ratio=0.25, min_df_docs=20, max_query_terms=12):
+        self.k1 = k1
+        self.b = b
+        self.max_df_ratio = max_df_ratio
+        self.min_df_docs = min_df_docs
+        self.max_query_terms = max_query_terms
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.postings = {}
+        self.doc_lengths = []
+        self.total_length = 0
+        self.first = None
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def _add(self, chat):
+        doc_id = len(self.doc_lengths)
+        # Pesan user dihitung dua kali: topik turn biasanya ada di pertanyaannya
+        terms = tokenize_text(chat.get('user_message', '')) * 2 + tokenize_text(chat.get('ai_response', ''))
+        for term, freq in Counter(terms).items():
+            self.postings.setdefault(term, {})[doc_id] = freq
+        self.doc_lengths.append(len(terms))
+        self.total_length += len(terms)
+
+    def sync(self, history):
+        """Tambahkan entry yang belum ter-index, bangun ulang kalau history di-clear/berubah"""
+        total = len(history)
+        first = history[0].get('timestamp', '') if total else None
+        with self._lock:
+            if len(self.doc_lengths) > total or (self.doc_lengths and self.first != first):
+                self._reset()
+            self.first = first
+            added = 0
+            # Dibaca berurutan dari disk, entry lama tidak ikut tertahan di cache HistoryStore
+            for chat in iter_history(history, len(self.doc_lengths), total):
+                self._add(chat)
+                added += 1
+        return added
+
+    def search(self, query, top_k=3, exclude_from=None, exclude_before=0, min_score=1.0):
+        """
+        [(index, score)] terurut skor tertinggi. Entry dengan index >= exclude_from
+        (window turn terbaru yang memang selalu dikirim) dan index < exclude_before
+        (turn yang sudah masuk rolling summary) tidak ikut.
+        """
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+            limit = n_docs if exclude_from is None else min(exclude_from, n_docs)
+            max_df = self.max_df_ratio * n_docs if n_docs >= self.min_df_docs else n_docs
+
+            weighted = []
+            for term in set(tokenize_text(query)):
+                postings = self.postings.get(term)
+                if not postings or len(postings) > max_df:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                weighted.append((idf, postings))
+            weighted = heapq.nlargest(self.max_query_terms, weighted, key=lambda item: item[0])
+
+            scores = {}
+            k1, b = self.k1, self.b
+            for idf, postings in weighted:
+                for doc_id, freq in postings.items():
+                    if doc_id >= limit or doc_id < exclude_before:
+                        continue
+                    norm = k1 * (1 - b + b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (k1 + 1) / (freq + norm)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(doc_id, score) for doc_id, score in best if score >= min_score]
@@ -0,0 +1,129 @@
+"""
+Snapshot KV-cache per sesi - state llama setelah turn terakhir, dikompresi dan dibatasi total ukuran disk
+"""
+
+import json
+import os
+import pickle
+import zlib
+
+import numpy as np
+
+
+def compact_state(state):
+    """
+    LlamaState menyimpan logits untuk semua n_tokens baris, padahal generate() selalu
+    meng-eval ulang minimal satu token sebelum sampling. Cukup simpan baris terakhir.
+    """
+    scores = getattr(state, "scores", None)
+    if isinstance(scores, np.ndarray) and scores.ndim == 2 and len(scores) > 1:
+        state.scores_rows = len(scores)
+        state.scores = scores[-1:].copy()
+    return state
+
+
+def expand_state(state):
+    rows = getattr(state, "scores_rows", None)
+    if rows:
+        state.scores = np.broadcast_to(state.scores[-1], (rows, state.scores.shape[1]))
+        del state.scores_rows
+    return state
+
+
+class SessionStateCache:
+    """
+    cache/sessions/<session>.kv (pickle LlamaState, zlib) + <session>.json (metadata).
+    Snapshot hanya dipakai kalau model, konfigurasi context, dan history sesi
+    masih sama persis dengan saat snapshot diambil.
+    """
+    def __init__(self, cache_dir, max_disk_bytes=2 * 1024 ** 3, compress_level=1):
+        self.cache_dir = os.path.join(cache_dir, "sessions")
+        self.max_disk_bytes = max_disk_bytes
+        self.compress_level = compress_level
+        self.stats = {'saved': 0, 'restored': 0, 'stale': 0, 'evicted': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, session_id):
+        base = os.path.join(self.cache_dir, session_id)
+        return base + ".kv", base + ".json"
+
+    def save(self, session_id, llm, meta):
+        """Snapshot state llm untuk sesi ini, return ukuran file (0 kalau tidak muat di budget)"""
+        kv_path, meta_path = self._paths(session_id)
+        state = compact_state(llm.save_state())
+        blob = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), self.compress_level)
+        if len(blob) > self.max_disk_bytes:
+            self.drop(session_id)
+            return 0
+
+        meta = dict(meta, n_tokens=getattr(state, "n_tokens", None), bytes=len(blob))
+        tmp_path = kv_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, kv_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        self.stats['saved'] += 1
+        self._evict(keep=session_id)
+        return len(blob)
+
+    def load(self, session_id, llm, meta):
+        """
+        Restore snapshot ke llm kalau masih cocok dengan `meta` saat ini.
+        Return 'restored', 'missing', atau 'stale:<field>' (llm tidak disentuh).
+        """
+        kv_path, meta_path = self._paths(session_id)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return 'missing'
+
+        for field, value in meta.items():
+            if saved.get(field) != value:
+                self.stats['stale'] += 1
+                self.drop(session_id)
+                return f"stale:{field}"
+
+        try:
+            with open(kv_path, "rb") as f:
+                state = pickle.loads(zlib.decompress(f.read()))
+            llm.load_state(expand_state(state))
+        except Exception as e:
+            print(f"⚠️ Session snapshot rusak: {e}")
+            self.drop(session_id)
+            return 'missing'
+        os.utime(kv_path)  # Dipakai = paling baru untuk eviction
+        self.stats['restored'] += 1
+        return 'restored'
+
+    def drop(self, session_id):
+        for path in self._paths(session_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def disk_usage(self):
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".kv"):
+                total += os.path.getsize(os.path.join(self.cache_dir, name))
+        return total
+
+    def _evict(self, keep=None):
+        """Hapus snapshot yang paling lama tidak dipakai sampai total di bawah budget"""
+        snapshots = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".kv"):
+                path = os.path.join(self.cache_dir, name)
+                snapshots.append((os.path.getmtime(path), os.path.getsize(path), name[:-3]))
+        total = sum(size for _, size, _ in snapshots)
+        for _, size, session_id in sorted(snapshots):
+            if total <= self.max_disk_bytes:
+                break
+            if session_id == keep:
+                continue
+            self.drop(session_id)
+            total -= size
+            self.stats['evicted'] += 1
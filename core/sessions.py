@@ -0,0 +1,97 @@
+"""
+Sesi percakapan bernama - satu HistoryStore per sesi, daftar sesi di sessions/sessions.json
+"""
+
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+
+from core.history_store import HistoryStore
+
+DEFAULT_SESSION = "default"
+
+
+def slugify(name):
+    slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+    return slug[:32] or "session"
+
+
+class SessionManager:
+    """
+    Sesi 'default' tetap memakai chat_history.jsonl lama supaya history yang ada tidak pindah,
+    sesi lain disimpan sebagai sessions/<id>.jsonl (+ .idx dan .search.db).
+    """
+    def __init__(self, root_dir, default_history_path):
+        self.root_dir = root_dir
+        self.default_history_path = default_history_path
+        self.index_path = os.path.join(root_dir, "sessions.json")
+        self.sessions = {}
+        self.active = DEFAULT_SESSION
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.sessions = data.get('sessions', {})
+            self.active = data.get('active', DEFAULT_SESSION)
+        except (OSError, ValueError):
+            self.sessions = {}
+        if DEFAULT_SESSION not in self.sessions:
+            self.sessions[DEFAULT_SESSION] = {'name': "Default", 'created': datetime.now().isoformat()}
+        if self.active not in self.sessions:
+            self.active = DEFAULT_SESSION
+
+    def _save(self):
+        os.makedirs(self.root_dir, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'active': self.active, 'sessions': self.sessions}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def history_path(self, session_id):
+        if session_id == DEFAULT_SESSION:
+            return self.default_history_path
+        return os.path.join(self.root_dir, f"{session_id}.jsonl")
+
+    def search_index_path(self, session_id):
+        return os.path.splitext(self.history_path(session_id))[0] + ".search.db"
+
+    def open_history(self, session_id, preload=200):
+        os.makedirs(os.path.dirname(self.history_path(session_id)) or ".", exist_ok=True)
+        return HistoryStore(self.history_path(session_id), preload=preload)
+
+    def create(self, name):
+        """Buat sesi baru, return id-nya (nama dibuat unik karena dipakai di combobox)"""
+        base, suffix = name.strip() or "Session", 2
+        name = base
+        while self.id_for_name(name):
+            name = f"{base} ({suffix})"
+            suffix += 1
+        session_id = f"{slugify(name)}-{uuid.uuid4().hex[:6]}"
+        self.sessions[session_id] = {'name': name, 'created': datetime.now().isoformat()}
+        self._save()
+        return session_id
+
+    def set_active(self, session_id):
+        if session_id not in self.sessions:
+            raise KeyError(f"Unknown session: {session_id}")
+        self.active = session_id
+        self.sessions[session_id]['opened'] = datetime.now().isoformat()
+        self._save()
+
+    def names(self):
+        """Nama tampilan sesi, urut waktu dibuat"""
+        ordered = sorted(self.sessions.items(), key=lambda item: item[1].get('created', ''))
+        return [info['name'] for _, info in ordered]
+
+    def id_for_name(self, name):
+        for session_id, info in self.sessions.items():
+            if info['name'] == name:
+                return session_id
+        return None
+
+    def name_for(self, session_id):
+        return self.sessions.get(session_id, {}).get('name', session_id)
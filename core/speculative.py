@@ -0,0 +1,120 @@
+"""
+Prompt-lookup speculative decoding - draft diambil dari n-gram yang sudah ada di prompt/konteks,
+lalu diverifikasi sekaligus dalam satu batch eval oleh Llama.generate()
+"""
+
+import numpy as np
+
+
+def find_prompt_lookup_draft(input_ids, max_ngram_size=3, min_ngram_size=1, num_pred_tokens=10):
+    """
+    Cari kemunculan terakhir n-gram penutup input_ids di bagian sebelumnya,
+    return token yang mengikutinya (np.intc, bisa kosong).
+    """
+    ids = np.asarray(input_ids, dtype=np.intc)
+    for ngram_size in range(min(max_ngram_size, len(ids) - 1), min_ngram_size - 1, -1):
+        pattern = ids[-ngram_size:]
+        # Window terakhir (suffix itu sendiri) tidak ikut supaya selalu ada lanjutan
+        windows = np.lib.stride_tricks.sliding_window_view(ids[:-1], ngram_size)
+        matches = np.nonzero(np.all(windows == pattern, axis=1))[0]
+        if len(matches):
+            start = matches[-1] + ngram_size
+            return ids[start:start + num_pred_tokens]
+    return np.array([], dtype=np.intc)
+
+
+class PromptLookupDraft:
+    """
+    Draft per generasi yang dipasang ke DraftSlot model, sekaligus menghitung acceptance.
+    observe(token) dipanggil untuk setiap token hasil generate() supaya draft yang diterima tercatat.
+    """
+    def __init__(self, max_ngram_size=3, num_pred_tokens=10):
+        self.max_ngram_size = max_ngram_size
+        self.num_pred_tokens = num_pred_tokens
+        self.calls = 0
+        self.drafted = 0
+        self.accepted = 0
+        self._pending = []
+        self._pos = 0
+
+    def __call__(self, input_ids, /, **kwargs):
+        draft = find_prompt_lookup_draft(input_ids, self.max_ngram_size, num_pred_tokens=self.num_pred_tokens)
+        self.calls += 1
+        self.drafted += len(draft)
+        self._pending = draft.tolist()
+        self._pos = 0
+        return draft
+
+    def observe(self, token):
+        """Token ke-i setelah draft dibandingkan dengan draft[i], mismatch = sisa draft ditolak"""
+        if self._pos < len(self._pending):
+            if token == self._pending[self._pos]:
+                self.accepted += 1
+                self._pos += 1
+            else:
+                self._pending = []
+
+    @property
+    def acceptance_rate(self):
+        return self.accepted / self.drafted if self.drafted else 0.0
+
+    def to_dict(self):
+        return {
+            'draft_calls': self.calls,
+            'drafted_tokens': self.drafted,
+            'accepted_tokens': self.accepted,
+            'acceptance_rate': round(self.acceptance_rate, 3)
+        }
+
+
+def speculation_blocker(gen_config):
+    """
+    Alasan speculative decoding tidak bisa dipakai, None kalau aman.
+    Penalty sampling llama.cpp ikut membaca token draft yang belum diverifikasi,
+    jadi output hanya identik dengan decoding biasa kalau penalty netral.
+    """
+    if gen_config.repeat_penalty != 1.0:
+        return "repeat_penalty"
+    if gen_config.frequency_penalty or gen_config.presence_penalty:
+        return "frequency/presence penalty"
+    return None
+
+
+class DraftSlot:
+    """
+    draft_model tetap untuk Llama(draft_model=...) yang dimuat untuk speculative decoding.
+    Llama membuat buffer logits semua posisi (logits_all) saat konstruksi, jadi draft tidak
+    boleh dipasang ke context yang sudah jalan. Draft per generasi (PromptLookupDraft)
+    dipasang ke slot ini; slot kosong = tanpa draft, generate() berjalan seperti biasa.
+    """
+    def __init__(self):
+        self.draft = None
+
+    def __call__(self, input_ids, /, **kwargs):
+        if self.draft is None:
+            return np.array([], dtype=np.intc)
+        return self.draft(input_ids, **kwargs)
+
+
+class DecodeSpeedTracker:
+    """Rata-rata bergerak decode tok/s dengan dan tanpa speculation, untuk melaporkan speedup"""
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.speeds = {True: None, False: None}
+
+    def record(self, speculative, tokens_per_second):
+        if tokens_per_second <= 0:
+            return
+        previous = self.speeds[speculative]
+        if previous is None:
+            self.speeds[speculative] = tokens_per_second
+        else:
+            self.speeds[speculative] = previous + self.alpha * (tokens_per_second - previous)
+
+    def speedup(self):
+        if not self.speeds[True] or not self.speeds[False]:
+            return None
+        return self.speeds[True] / self.speeds[False]
+
+    def reset(self):
+        self.speeds = {True: None, False: None}
@@ -0,0 +1,71 @@
+"""
+Startup timing report - ukur tiap tahap cold start supaya regresi kelihatan
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+
+class StartupTimer:
+    """
+    Catat durasi tahap startup (ms). t0 sebaiknya diambil di baris paling awal main.py,
+    sebelum import berat.
+    """
+    PHASES = ("import", "ui_build", "window_visible", "history_load",
+              "llama_import", "model_mmap", "first_token")
+
+    def __init__(self, t0=None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.phases = {}
+        self._started = {}
+        self.finished = False
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.t0) * 1000
+
+    def mark(self, name):
+        """Tahap yang diukur dari t0 (misalnya import, window_visible)"""
+        self.phases[name] = round(self.elapsed_ms(), 1)
+
+    def start(self, name):
+        self._started[name] = time.perf_counter()
+
+    def stop(self, name):
+        started = self._started.pop(name, None)
+        if started is not None:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def report(self):
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'phases_ms': {name: self.phases[name] for name in self.PHASES if name in self.phases},
+            'total_ms': round(self.elapsed_ms(), 1)
+        }
+
+    def describe(self, report=None):
+        report = report or self.report()
+        parts = [f"{name} {ms:.0f}ms" for name, ms in report['phases_ms'].items()]
+        return " | ".join(parts) + f" | total {report['total_ms']:.0f}ms"
+
+    def finish(self, path, keep=20):
+        """Simpan report ke JSON (report terakhir + riwayat `keep` run)"""
+        if self.finished:
+            return None
+        self.finished = True
+        report = self.report()
+        data = {'runs': []}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        runs = (data.get('runs') or [])[-(keep - 1):] + [report]
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({'last': report, 'runs': runs}, f, indent=2)
+        except OSError as e:
+            print(f"⚠️ Could not write startup report: {e}")
+        return report
@@ -0,0 +1,279 @@
+"""
+Streaming generation untuk Phi-3 Chat App - token loop, UTF-8 aman, dan batch flush ke UI
+"""
+
+import codecs
+import threading
+import time
+
+from core.telemetry import reset_llama_timings, read_llama_timings
+from core.speculative import DraftSlot
+from core.generation_guard import plan_max_tokens, RepetitionGuard
+
+
+class StreamDecoder:
+    """Decode bytes token secara incremental dan potong output pada stop string"""
+    def __init__(self, stop_strings=None):
+        self.stop_strings = [s for s in (stop_strings or []) if s]
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+        self.text = ""
+        self.stopped = False
+
+    def feed(self, data):
+        """Masukkan bytes baru, return teks yang sudah aman untuk ditampilkan"""
+        if self.stopped:
+            return ""
+        self._pending += self._decoder.decode(data)
+        return self._drain(final=False)
+
+    def flush(self):
+        """Keluarkan sisa teks di akhir generasi"""
+        if self.stopped:
+            return ""
+        self._pending += self._decoder.decode(b"", final=True)
+        return self._drain(final=True)
+
+    def _drain(self, final):
+        stop_at = -1
+        for stop in self.stop_strings:
+            idx = self._pending.find(stop)
+            if idx != -1 and (stop_at == -1 or idx < stop_at):
+                stop_at = idx
+
+        if stop_at != -1:
+            out = self._pending[:stop_at]
+            self._pending = ""
+            self.stopped = True
+        elif final:
+            out = self._pending
+            self._pending = ""
+        else:
+            # Tahan suffix yang mungkin awal dari stop string
+            keep = self._holdback_length()
+            out = self._pending[:len(self._pending) - keep]
+            self._pending = self._pending[len(self._pending) - keep:]
+
+        self.text += out
+        return out
+
+    def _holdback_length(self):
+        keep = 0
+        for stop in self.stop_strings:
+            for size in range(min(len(stop) - 1, len(self._pending)), keep, -1):
+                if self._pending.endswith(stop[:size]):
+                    keep = size
+                    break
+        return keep
+
+
+class GenerationResult:
+    """Hasil satu kali generasi beserta timing-nya"""
+    def __init__(self):
+        self.text = ""
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.finish_reason = None
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.llama_timings = None  # Timing llama.cpp kalau backend menyediakannya
+        self.speculative = None    # Statistik draft kalau speculative decoding aktif
+        self.max_tokens = None     # Batas token setelah disesuaikan dengan sisa context
+        self.guard = None          # Detail generation guard kalau berhenti karena repetisi/no progress
+
+    @property
+    def first_token_ms(self):
+        if self.first_token_at is None:
+            return None
+        return (self.first_token_at - self.started_at) * 1000
+
+    @property
+    def total_ms(self):
+        end = self.finished_at or time.perf_counter()
+        return (end - self.started_at) * 1000
+
+    @property
+    def tokens_per_second(self):
+        if self.first_token_at is None or self.completion_tokens < 2:
+            return 0.0
+        decode_s = (self.finished_at or time.perf_counter()) - self.first_token_at
+        return (self.completion_tokens - 1) / decode_s if decode_s > 0 else 0.0
+
+    @property
+    def prompt_eval_ms(self):
+        """Waktu evaluasi prompt dari llama.cpp, fallback ke waktu sampai token pertama"""
+        if self.llama_timings:
+            return self.llama_timings['prompt_eval_ms']
+        return self.first_token_ms
+
+    @property
+    def decode_tokens_per_second(self):
+        if self.llama_timings and self.llama_timings['decode_ms'] > 0:
+            return self.llama_timings['decode_tokens'] * 1000 / self.llama_timings['decode_ms']
+        return self.tokens_per_second
+
+    def to_dict(self):
+        return {
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'finish_reason': self.finish_reason,
+            'first_token_ms': round(self.first_token_ms, 1) if self.first_token_ms is not None else None,
+            'total_ms': round(self.total_ms, 1),
+            'tokens_per_second': round(self.tokens_per_second, 2),
+            'prompt_eval_ms': round(self.prompt_eval_ms, 1) if self.prompt_eval_ms is not None else None,
+            'prompt_eval_tokens': self.llama_timings['prompt_eval_tokens'] if self.llama_timings else None,
+            'decode_tokens_per_second': round(self.decode_tokens_per_second, 2),
+            'speculative': self.speculative,
+            'max_tokens': self.max_tokens,
+            'guard': self.guard
+        }
+
+
+def tokenize_prompt(llm, prompt):
+    """Tokenize prompt termasuk special token Phi-3 (<|user|>, <|end|>, ...)"""
+    return llm.tokenize(prompt.encode("utf-8"), add_bos=True, special=True)
+
+
+def get_stop_token_ids(llm, stop_strings):
+    """Stop string yang merupakan satu special token juga dicek per token id"""
+    stop_ids = {llm.token_eos()}
+    for stop in stop_strings:
+        try:
+            tokens = llm.tokenize(stop.encode("utf-8"), add_bos=False, special=True)
+        except Exception:
+            continue
+        if len(tokens) == 1:
+            stop_ids.add(tokens[0])
+    return stop_ids
+
+
+def warmup_first_token(llm, prompt):
+    """Sample satu token dari prompt (dipakai untuk mengukur/memanaskan startup)"""
+    tokens = tokenize_prompt(llm, prompt)
+    for token in llm.generate(tokens, temp=0.0):
+        return token
+
+
+def stream_generate(llm, prompt, gen_config, on_text=None, should_stop=None, draft=None):
+    """
+    Generate token demi token dari llm.generate().
+    on_text dipanggil dengan potongan teks yang sudah aman (UTF-8 utuh, tanpa stop string).
+    draft (PromptLookupDraft) mengaktifkan speculative decoding kalau llm dimuat dengan
+    DraftSlot (ModelConfig.speculative), selain itu diabaikan.
+    """
+    if hasattr(llm, "stream_generate"):
+        # Model di proses worker (RemoteLlama): loop yang sama dijalankan di sana
+        return llm.stream_generate(prompt, gen_config, on_text=on_text, should_stop=should_stop, draft=draft)
+
+    result = GenerationResult()
+    tokens = tokenize_prompt(llm, prompt)
+    result.prompt_tokens = len(tokens)
+
+    max_tokens = plan_max_tokens(gen_config, len(tokens), llm.n_ctx())
+    result.max_tokens = max_tokens
+    guard = RepetitionGuard.from_config(gen_config)
+
+    if gen_config.seed != -1 and hasattr(llm, "set_seed"):
+        llm.set_seed(gen_config.seed)
+
+    stop_ids = get_stop_token_ids(llm, gen_config.stop_tokens)
+    decoder = StreamDecoder(gen_config.stop_tokens)
+    has_timings = reset_llama_timings(llm)
+
+    def emit(text):
+        if not text:
+            return
+        if result.first_token_at is None:
+            result.first_token_at = time.perf_counter()
+        if on_text:
+            on_text(text)
+
+    slot = getattr(llm, "draft_model", None)
+    if not isinstance(slot, DraftSlot):
+        draft = None
+    if draft is not None:
+        slot.draft = draft
+
+    result.finish_reason = "length"
+    try:
+        for token in llm.generate(tokens, **gen_config.get_sampling_kwargs()):
+            if draft is not None:
+                draft.observe(token)
+
+            if token in stop_ids:
+                result.finish_reason = "stop"
+                break
+
+            result.completion_tokens += 1
+            piece = llm.detokenize([token])
+            emit(decoder.feed(piece))
+
+            if decoder.stopped:
+                result.finish_reason = "stop"
+                break
+            if guard is not None and guard.observe(token, piece):
+                # Loop degeneratif: hentikan sekarang daripada menghabiskan sisa max_tokens
+                result.finish_reason = guard.reason
+                result.guard = guard.to_dict()
+                break
+            if result.completion_tokens >= max_tokens:
+                break
+            if should_stop and should_stop():
+                result.finish_reason = "cancelled"
+                break
+    finally:
+        if draft is not None:
+            slot.draft = None
+            result.speculative = draft.to_dict()
+
+    emit(decoder.flush())
+    result.text = decoder.text
+    result.finished_at = time.perf_counter()
+    if has_timings:
+        result.llama_timings = read_llama_timings(llm)
+    return result
+
+
+class TextFlushBatcher:
+    """
+    Kumpulkan potongan teks dari thread generasi lalu flush ke UI maksimal sekali per frame.
+    schedule biasanya window.after, sink dipanggil di UI thread.
+    """
+    def __init__(self, schedule, sink, interval_ms=33):
+        self._schedule = schedule
+        self._sink = sink
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._scheduled = False
+        self._last_flush = 0.0
+        self.first_flush_at = None
+        self.flush_count = 0
+
+    def push(self, text):
+        """Dipanggil dari thread generasi"""
+        if not text:
+            return
+        with self._lock:
+            self._chunks.append(text)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        elapsed_ms = (time.perf_counter() - self._last_flush) * 1000
+        delay = max(0, int(self.interval_ms - elapsed_ms))
+        self._schedule(delay, self.flush)
+
+    def flush(self):
+        """Tulis semua teks yang tertunda dalam satu panggilan sink"""
+        with self._lock:
+            text = "".join(self._chunks)
+            self._chunks = []
+            self._scheduled = False
+        if not text:
+            return
+        self._last_flush = time.perf_counter()
+        if self.first_flush_at is None:
+            self.first_flush_at = self._last_flush
+        self.flush_count += 1
+        self._sink(text)
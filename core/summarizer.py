@@ -0,0 +1,136 @@
+"""
+Rolling summary - turn lama di luar window dipadatkan jadi satu ringkasan saat model idle
+"""
+
+import json
+import os
+import threading
+
+from config.settings import GenerationConfig
+from core.history_store import entry_key
+from core.streaming import stream_generate
+
+SUMMARY_SYSTEM_PROMPT = (
+    "<|system|>\nYou maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the new turns into the current summary. Keep names, decisions, facts, code identifiers "
+    "and open questions; drop greetings and filler. Write in the same language as the conversation. "
+    "Reply with the updated summary only, at most {max_words} words.<|end|>\n"
+)
+
+
+def conversation_id(chat_history):
+    """Percakapan diidentifikasi dari entry pertamanya, clear history = percakapan baru"""
+    if not chat_history or len(chat_history) == 0:
+        return None
+    return entry_key(chat_history[0])
+
+
+def build_summary_prompt(summary, turns, max_words=150, max_chars=1500):
+    """Prompt untuk menggabungkan turn baru ke ringkasan yang sudah ada"""
+    lines = []
+    for chat in turns:
+        lines.append(f"User: {chat['user_message'][:max_chars]}")
+        lines.append(f"Assistant: {chat['ai_response'][:max_chars]}")
+    new_turns = "\n".join(lines)
+    return (f"{SUMMARY_SYSTEM_PROMPT.format(max_words=max_words)}"
+            f"<|user|>\nCurrent summary:\n{summary or '(empty)'}\n\nNew turns:\n{new_turns}<|end|>\n"
+            f"<|assistant|>\n")
+
+
+class SummaryState:
+    """Ringkasan satu percakapan: `covered` entry tertua sudah masuk ke `summary`"""
+    def __init__(self, covered=0, last_key=None, summary=""):
+        self.covered = covered
+        self.last_key = last_key
+        self.summary = summary
+
+    def to_dict(self):
+        return {'covered': self.covered, 'last_key': self.last_key, 'summary': self.summary}
+
+
+class RollingSummarizer:
+    """
+    Ringkasan disimpan per percakapan di cache/summaries.json.
+    Valid selama entry terakhir yang diringkas masih sama (history append-only),
+    kalau history berubah ringkasan dibuang dan dibangun ulang.
+    """
+    def __init__(self, cache_dir, keep_recent=3, chunk_turns=2, max_tokens=256, max_conversations=20):
+        self.path = os.path.join(cache_dir, "summaries.json")
+        self.keep_recent = keep_recent
+        self.chunk_turns = chunk_turns
+        self.max_conversations = max_conversations
+        self.gen_config = GenerationConfig()
+        self.gen_config.temperature = 0.2
+        self.gen_config.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._states = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            return {cid: SummaryState(**state) for cid, state in raw.items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Percakapan yang paling lama tidak disentuh dibuang duluan (dict menjaga urutan insert)
+        while len(self._states) > self.max_conversations:
+            self._states.pop(next(iter(self._states)))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({cid: state.to_dict() for cid, state in self._states.items()},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def state_for(self, chat_history):
+        """SummaryState yang masih valid untuk history ini (baru kalau cache basi)"""
+        cid = conversation_id(chat_history)
+        if cid is None:
+            return SummaryState()
+        with self._lock:
+            state = self._states.get(cid)
+        if state is None or state.covered > len(chat_history):
+            return SummaryState()
+        if state.covered and entry_key(chat_history[state.covered - 1]) != state.last_key:
+            return SummaryState()
+        return state
+
+    def context_for(self, chat_history):
+        """(summary, turn yang belum diringkas) untuk dipakai get_chat_prompt"""
+        state = self.state_for(chat_history)
+        if not state.covered:
+            return "", chat_history
+        return state.summary, chat_history[state.covered:]
+
+    def pending_turns(self, chat_history):
+        """Jumlah turn di luar window yang belum masuk ringkasan"""
+        state = self.state_for(chat_history)
+        return max(0, len(chat_history) - self.keep_recent - state.covered)
+
+    def needs_update(self, chat_history):
+        return self.pending_turns(chat_history) >= self.chunk_turns
+
+    def step(self, llm, chat_history, should_stop=None):
+        """
+        Ringkas satu chunk turn lama. Return True kalau ringkasan maju,
+        False kalau tidak ada yang perlu diringkas atau dibatalkan di tengah jalan.
+        """
+        state = self.state_for(chat_history)
+        end = min(len(chat_history) - self.keep_recent, state.covered + self.chunk_turns)
+        if end <= state.covered:
+            return False
+
+        turns = chat_history[state.covered:end]
+        prompt = build_summary_prompt(state.summary, turns, max_words=self.gen_config.max_tokens * 3 // 5)
+        result = stream_generate(llm, prompt, self.gen_config, should_stop=should_stop)
+        if result.finish_reason == "cancelled" or not result.text.strip():
+            return False
+
+        cid = conversation_id(chat_history)
+        with self._lock:
+            self._states.pop(cid, None)
+            self._states[cid] = SummaryState(end, entry_key(chat_history[end - 1]), result.text.strip())
+            self._save()
+        return True
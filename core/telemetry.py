@@ -0,0 +1,204 @@
+"""
+Telemetry - sampling RSS/CPU/thread proses via psutil, timing llama per generasi, dan file metrics bergulir
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import psutil
+
+
+def reset_llama_timings(llm):
+    """Nol-kan counter timing llama.cpp sebelum generasi (no-op untuk backend tanpa ctx)"""
+    ctx = getattr(llm, "ctx", None)
+    if ctx is None:
+        return False
+    try:
+        import llama_cpp
+        llama_cpp.llama_reset_timings(ctx)
+        return True
+    except (ImportError, AttributeError):
+        return False
+
+
+def read_llama_timings(llm):
+    """Timing prompt-eval dan decode dari llama.cpp, None kalau tidak tersedia"""
+    ctx = getattr(llm, "ctx", None)
+    if ctx is None:
+        return None
+    try:
+        import llama_cpp
+        timings = llama_cpp.llama_get_timings(ctx)
+    except (ImportError, AttributeError):
+        return None
+    return {
+        'prompt_eval_ms': timings.t_p_eval_ms,
+        'prompt_eval_tokens': timings.n_p_eval,
+        'decode_ms': timings.t_eval_ms,
+        'decode_tokens': timings.n_eval
+    }
+
+
+class ResourceSample:
+    """Satu titik sampling resource proses"""
+    __slots__ = ("at", "rss_bytes", "cpu_percent", "threads", "busy")
+
+    def __init__(self, at, rss_bytes, cpu_percent, threads, busy):
+        self.at = at
+        self.rss_bytes = rss_bytes
+        self.cpu_percent = cpu_percent
+        self.threads = threads
+        self.busy = busy
+
+    def to_dict(self):
+        return {
+            'rss_mb': round(self.rss_bytes / 1024 ** 2, 1),
+            'cpu_percent': round(self.cpu_percent, 1),
+            'threads': self.threads,
+            'busy': self.busy
+        }
+
+
+class ResourceSampler:
+    """
+    Thread background yang sampling proses ini (plus proses anak, misalnya worker
+    inferensi) setiap `idle_interval` detik, lebih rapat (`busy_interval`) selama generasi berjalan.
+    on_sample(sample) dipanggil di thread sampler.
+    """
+    def __init__(self, idle_interval=1.0, busy_interval=0.25, on_sample=None, keep=600):
+        self.idle_interval = idle_interval
+        self.busy_interval = busy_interval
+        self.on_sample = on_sample
+        self.samples = deque(maxlen=keep)
+        self.latest = None
+        self._process = psutil.Process(os.getpid())
+        self._children = {}
+        self._busy = threading.Event()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._process.cpu_percent(None)  # Panggilan pertama selalu 0.0
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def set_busy(self, busy):
+        """Tandai generasi mulai/selesai, sampler langsung pindah interval"""
+        if busy:
+            self._busy.set()
+        else:
+            self._busy.clear()
+        self._wake.set()
+
+    def sample(self):
+        with self._process.oneshot():
+            rss = self._process.memory_info().rss
+            cpu = self._process.cpu_percent(None)
+            threads = self._process.num_threads()
+        for child in self._child_processes():
+            try:
+                with child.oneshot():
+                    rss += child.memory_info().rss
+                    cpu += child.cpu_percent(None)
+                    threads += child.num_threads()
+            except psutil.Error:
+                self._children.pop(child.pid, None)
+        sample = ResourceSample(time.perf_counter(), rss, cpu, threads, self._busy.is_set())
+        self.samples.append(sample)
+        self.latest = sample
+        return sample
+
+    def _child_processes(self):
+        """Objek Process anak disimpan antar sample supaya cpu_percent punya titik awal"""
+        current = {child.pid: child for child in self._process.children(recursive=True)}
+        for pid in list(self._children):
+            if pid not in current:
+                del self._children[pid]
+        for pid, child in current.items():
+            if pid not in self._children:
+                child.cpu_percent(None)
+                self._children[pid] = child
+        return list(self._children.values())
+
+    def summarize(self, since):
+        """Peak RSS, rata-rata CPU dan thread maksimum sejak perf_counter `since`"""
+        window = [s for s in list(self.samples) if s.at >= since]
+        if not window:
+            return {}
+        return {
+            'samples': len(window),
+            'peak_rss_mb': round(max(s.rss_bytes for s in window) / 1024 ** 2, 1),
+            'avg_cpu_percent': round(sum(s.cpu_percent for s in window) / len(window), 1),
+            'max_threads': max(s.threads for s in window)
+        }
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                sample = self.sample()
+                if self.on_sample:
+                    self.on_sample(sample)
+            except psutil.Error as e:
+                print(f"⚠️ Telemetry sample error: {e}")
+            interval = self.busy_interval if self._busy.is_set() else self.idle_interval
+            self._wake.wait(interval)
+            self._wake.clear()
+
+
+class MetricsLog:
+    """
+    File JSONL bergulir untuk analisis offline.
+    Kalau ukurannya lewat max_bytes, file lama dipindah ke <path>.1 (satu backup).
+    """
+    def __init__(self, path, max_bytes=2 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def write(self, kind, record):
+        line = json.dumps({'type': kind, 'time': datetime.now().isoformat(), **record}, ensure_ascii=False)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"⚠️ Metrics log error: {e}")
+
+
+def format_resource_line(sample):
+    """Teks singkat untuk sidebar"""
+    if sample is None:
+        return "📊 Sampling..."
+    return (f"📊 RAM {sample.rss_bytes / 1024 ** 3:.2f} GB · "
+            f"CPU {sample.cpu_percent:.0f}% · {sample.threads} thr")
+
+
+def format_generation_line(metrics):
+    """Ringkasan generasi terakhir untuk sidebar"""
+    if not metrics:
+        return "⚡ No generation yet"
+    prompt_eval = metrics.get('prompt_eval_ms')
+    prompt_eval = f"{prompt_eval:.0f} ms" if prompt_eval is not None else "-"
+    line = (f"⚡ {metrics.get('prompt_tokens', 0)} prompt tok · eval {prompt_eval}\n"
+            f"   {metrics.get('completion_tokens', 0)} tok · "
+            f"{metrics.get('decode_tokens_per_second', 0.0):.1f} tok/s")
+    speculative = metrics.get('speculative')
+    if speculative:
+        line += f"\n🎯 Draft accept {speculative['acceptance_rate']:.0%}"
+        if speculative.get('speedup'):
+            line += f" · x{speculative['speedup']:.2f} decode"
+    return line
@@ -1,14 +1,34 @@
+import time
+STARTUP_T0 = time.perf_counter()  # Diambil sebelum import berat untuk startup report
+
 import customtkinter as ctk
-import json
+import multiprocessing
 import os
 import sys
 import threading
 from datetime import datetime
-from llama_cpp import Llama
 
 # Import config modules
-from config.settings import ModelConfig, GenerationConfig, AppConfig
-from config.prompts import get_system_prompt, get_chat_prompt, PRESET_CONFIGS
+from config.settings import ModelConfig, GenerationConfig, AppConfig, MEMORY_PROFILES
+from config.prompts import get_system_prompt, PRESET_CONFIGS
+from core.engine import ArcanaEngine
+from core.memory_profile import describe_check
+from core.streaming import warmup_first_token, TextFlushBatcher
+from core.model_loader import import_backend
+from core.startup import StartupTimer
+from core.response_cache import ResponseCache, make_cache_key
+from core.model_registry import ModelRegistry
+from core.history_store import migrate_json_history, entry_key
+from core.sessions import SessionManager, DEFAULT_SESSION
+from core.session_state import SessionStateCache
+from core.history_index import HistorySearchIndex
+from core.retrieval import BM25Index
+from core.inference_queue import QueueFullError
+from core.inference_worker import WorkerCrashedError
+from core.summarizer import RollingSummarizer
+from core.telemetry import ResourceSampler, MetricsLog, format_resource_line, format_generation_line
+from ui.transcript import TranscriptRenderer
+from ui.history_list import VirtualHistoryList, format_history_preview, format_search_hit
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -31,7 +51,10 @@ class MagicalTheme:
     HOVER_PURPLE = "#7A4BA8"
 
 class Phi3ChatApp:
-    def __init__(self):
+    def __init__(self, startup_t0=None):
+        self.startup = StartupTimer(startup_t0)
+        self.startup.mark("import")
+        
         # Load configurations
         self.model_config = ModelConfig()
         self.gen_config = GenerationConfig()
@@ -54,17 +77,79 @@ class Phi3ChatApp:
             print(f"⚠️ Could not load icon: {e}")
         
         # Application state
-        self.llm = None
+        # Model, antrian generasi, dan prompt building ada di engine, GUI hanya client
+        self.engine = ArcanaEngine(self.model_config, self.gen_config, self.app_config)
+        self.model_registry = ModelRegistry(self.model_config.model_dir)
+        self.model_registry.scan()
+        self.is_switching_model = False
+        self.response_cache = ResponseCache(
+            self.app_config.cache_dir,
+            max_entries=self.app_config.response_cache_entries,
+            max_disk_bytes=self.app_config.response_cache_disk_mb * 1024 * 1024
+        )
+        self.telemetry = ResourceSampler(
+            idle_interval=self.app_config.telemetry_interval_s,
+            busy_interval=self.app_config.telemetry_busy_interval_s,
+            on_sample=self.on_resource_sample
+        )
+        self.metrics_log = MetricsLog(
+            os.path.join(self.app_config.cache_dir, "metrics.jsonl"),
+            max_bytes=self.app_config.metrics_log_mb * 1024 * 1024
+        )
+        self.last_logged_sample_at = 0.0
+        self.summarizer = None
+        if self.app_config.use_rolling_summary:
+            self.summarizer = RollingSummarizer(
+                self.app_config.cache_dir,
+                keep_recent=self.app_config.summary_keep_recent,
+                chunk_turns=self.app_config.summary_chunk_turns,
+                max_tokens=self.app_config.summary_max_tokens
+            )
+        self.summary_job = None
+        self.summary_timer = None
         self.chat_history = []
+        self.sessions = SessionManager(resource_path("sessions"), resource_path("chat_history.jsonl"))
+        self.session_states = SessionStateCache(
+            self.app_config.cache_dir,
+            max_disk_bytes=self.app_config.session_state_disk_mb * 1024 * 1024
+        )
+        self.kv_owner = None  # Sesi yang turn terakhirnya masih ada di KV-cache llm
+        self.last_session_save_at = 0.0
+        self.history_index = None
+        self.retriever = BM25Index() if self.app_config.use_retrieval else None
+        self.search_hits = []
+        self.search_timer = None
         self.is_loading = False
         self.is_generating = False
         self.current_system_prompt = get_system_prompt(
             self.app_config.language, 
             self.app_config.mode
         )
+        self.engine.apply_preset(self.app_config.language, self.app_config.mode)
         
-        self.load_history()
+        self.startup.start("ui_build")
         self.setup_ui()
+        self.startup.stop("ui_build")
+        
+        # Window tampil dulu, history dan model dimuat setelah mainloop jalan
+        self.window.after(0, self.finish_startup)
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def finish_startup(self):
+        """Tahap startup setelah window tampil"""
+        self.window.update_idletasks()
+        self.startup.mark("window_visible")
+        
+        self.startup.start("history_load")
+        self.load_history()
+        self.update_history_display()
+        self.startup.stop("history_load")
+        
+        thread = threading.Thread(target=self.open_history_indexes)
+        thread.daemon = True
+        thread.start()
+        
+        self.telemetry.start()
         self.load_model_async()
     
     def setup_custom_theme(self):
@@ -76,17 +161,36 @@ class Phi3ChatApp:
         """Load model di thread terpisah"""
         def load():
             self.is_loading = True
-            self.update_status("🔮 Loading magical model...")
             
             try:
-                self.llm = Llama(
-                    model_path=self.model_config.model_path,
-                    n_ctx=self.model_config.n_ctx,
-                    n_threads=self.model_config.n_threads,
-                    n_batch=self.model_config.n_batch,
-                    n_gpu_layers=self.model_config.n_gpu_layers,
-                    verbose=False
+                if not self.app_config.inference_process:
+                    # Dengan worker process, llama.cpp hanya diimport di proses worker
+                    self.update_status("📦 Importing llama.cpp...")
+                    self.startup.start("llama_import")
+                    import_backend(self.model_config)
+                    self.startup.stop("llama_import")
+                
+                self.engine.load_model(
+                    self.model_config.model_path,
+                    system_prompt=self.current_system_prompt,
+                    on_status=self.update_status,
+                    timer=self.startup
                 )
+                self.kv_owner = None
+                
+                if not self.startup.finished:
+                    self.update_status("🔥 Warming up...")
+                    self.startup.start("first_token")
+                    with self.engine.lock:
+                        warmup_first_token(self.engine.llm, self.current_system_prompt)
+                    self.startup.stop("first_token")
+                    report = self.startup.finish(os.path.join(self.app_config.cache_dir, "startup_report.json"))
+                    print(f"⏱️ Startup: {self.startup.describe(report)}")
+                
+                with self.engine.lock:
+                    self.restore_session_state(self.engine.llm, self.sessions.active)
+                
+                self.window.after(0, self.update_memory_info)
                 self.update_status("✨ Model ready! Let's chat...")
                 print("🎉 Model loaded successfully!")
                 
@@ -100,6 +204,129 @@ class Phi3ChatApp:
         thread.daemon = True
         thread.start()
     
+    def switch_model(self, name):
+        """Ganti model dari sidebar tanpa restart, chat tetap jalan di model lama sampai selesai dimuat"""
+        path = self.model_registry.path_for(name)
+        if not path or path == self.model_config.model_path:
+            return
+        if self.is_loading or self.is_switching_model:
+            self.show_temp_message("⏳ Another model is still loading...")
+            self.model_var.set(ModelRegistry.name_for(self.model_config.model_path))
+            return
+        
+        def load():
+            self.is_switching_model = True
+            self.update_status(f"🔄 Loading {name}...")
+            try:
+                self.engine.load_model(path, system_prompt=self.current_system_prompt)
+                self.kv_owner = None  # KV-cache model baru belum berisi turn sesi manapun
+                self.update_status(f"✨ {name} ready!")
+                print(f"🔄 Switched model to {name}")
+            except Exception as e:
+                self.update_status(f"❌ Error: {str(e)}")
+                print(f"❌ Error switching model: {e}")
+                self.window.after(0, lambda: self.model_var.set(
+                    ModelRegistry.name_for(self.model_config.model_path)))
+            self.is_switching_model = False
+        
+        thread = threading.Thread(target=load)
+        thread.daemon = True
+        thread.start()
+    
+    def switch_memory_profile(self, name):
+        """Ganti profil memori dari sidebar: model aktif dimuat ulang dengan n_ctx / KV cache profil"""
+        if name == self.model_config.memory_profile:
+            return
+        if self.is_loading or self.is_switching_model or self.engine.queue.busy():
+            self.show_temp_message("⏳ Wait for the current answer or model load before changing memory profile...")
+            self.memory_var.set(self.model_config.memory_profile)
+            return
+        
+        def load():
+            self.is_switching_model = True
+            self.update_status(f"🧠 Applying memory profile {name}...")
+            try:
+                self.engine.set_memory_profile(name, system_prompt=self.current_system_prompt,
+                                               on_status=self.update_status)
+                self.kv_owner = None
+                check = self.engine.memory_check
+                self.update_status(describe_check(check) if check else f"✨ Memory profile {name} ready!")
+                print(f"🧠 Switched memory profile to {name} (n_ctx {self.engine.n_ctx()})")
+            except Exception as e:
+                self.update_status(f"❌ Error: {str(e)}")
+                print(f"❌ Error switching memory profile: {e}")
+            self.window.after(0, self.update_memory_info)
+            self.is_switching_model = False
+        
+        thread = threading.Thread(target=load)
+        thread.daemon = True
+        thread.start()
+    
+    def update_memory_info(self):
+        """Deskripsi profil aktif + hasil cek peak RAM terakhir"""
+        profile = self.model_config.memory_profile
+        self.memory_var.set(profile)
+        text = f"{MEMORY_PROFILES[profile]['description']}\nContext {self.engine.n_ctx()} · KV {self.model_config.type_k}"
+        check = self.engine.memory_check
+        if check:
+            text += f"\nPeak {check['peak_rss_mb'] / 1024:.2f} GB"
+            if check['target_rss_mb']:
+                text += f" / {check['target_rss_mb'] / 1024:.1f} GB {'✅' if check['within_budget'] else '⚠️'}"
+        self.memory_info.configure(text=text)
+    
+    def warm_prefix(self, system_prompt):
+        """Siapkan KV-cache system prompt (restore dari disk atau evaluasi sekali)"""
+        source = self.engine.warm_prefix(system_prompt)
+        if source not in (None, 'live'):
+            # KV-cache sudah diganti prefix, turn terakhir sesi tidak ada lagi di sana
+            self.kv_owner = None
+    
+    def session_meta(self, history):
+        """Kunci validitas snapshot sesi: model, konfigurasi context, dan turn terakhir"""
+        total = len(history)
+        return {
+            'model_id': self.engine.model_id,
+            'config_tag': self.engine.kv_config_tag(),
+            'history_len': total,
+            'last_key': entry_key(history[total - 1]) if total else None,
+        }
+    
+    def save_session_state(self, llm, session_id, history):
+        """Snapshot KV sesi, hanya kalau KV-cache llm memang berisi turn terakhir sesi ini"""
+        if self.kv_owner != session_id or not len(history):
+            return
+        start = time.perf_counter()
+        size = self.session_states.save(session_id, llm, self.session_meta(history))
+        print(f"💾 Session '{self.sessions.name_for(session_id)}' snapshot: "
+              f"{size / 1024 ** 2:.1f} MB in {(time.perf_counter() - start) * 1000:.0f} ms")
+    
+    def restore_session_state(self, llm, session_id):
+        """Restore snapshot KV sesi, kalau stale/tidak ada prompt di-evaluasi ulang seperti biasa"""
+        if not len(self.chat_history):
+            return 'missing'
+        start = time.perf_counter()
+        result = self.session_states.load(session_id, llm, self.session_meta(self.chat_history))
+        if result == 'restored':
+            self.kv_owner = session_id
+            print(f"⚡ Session '{self.sessions.name_for(session_id)}' restored "
+                  f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        elif result != 'missing':
+            print(f"♻️ Session snapshot {result}, will re-evaluate prompt")
+        return result
+    
+    def on_resource_sample(self, sample):
+        """Dipanggil di thread sampler: update sidebar dan tulis sample ke metrics log"""
+        if sample.busy or sample.at - self.last_logged_sample_at >= self.app_config.metrics_log_interval_s:
+            self.last_logged_sample_at = sample.at
+            self.metrics_log.write("resources", sample.to_dict())
+        self.window.after(0, self.update_telemetry_display)
+    
+    def update_telemetry_display(self):
+        self.telemetry_info.configure(
+            text=f"{format_resource_line(self.telemetry.latest)}\n"
+                 f"{format_generation_line(self.last_generation_metrics)}"
+        )
+    
     def update_status(self, message):
         """Update status di UI"""
         def update():
@@ -108,25 +335,18 @@ class Phi3ChatApp:
         self.window.after(0, update)
     
     def load_history(self):
-        """Load chat history"""
+        """Load chat history sesi aktif (hanya entry terbaru yang dibaca saat startup)"""
         try:
-            history_file = resource_path("chat_history.json")
-            if os.path.exists(history_file):
-                with open(history_file, "r", encoding="utf-8") as f:
-                    self.chat_history = json.load(f)
+            self.chat_history = self.sessions.open_history(
+                self.sessions.active,
+                preload=self.app_config.history_preload
+            )
+            if self.sessions.active == DEFAULT_SESSION:
+                migrate_json_history(resource_path("chat_history.json"), self.chat_history)
         except Exception as e:
             print(f"Error loading history: {e}")
             self.chat_history = []
     
-    def save_history(self):
-        """Save chat history"""
-        try:
-            history_file = resource_path("chat_history.json")
-            with open(history_file, "w", encoding="utf-8") as f:
-                json.dump(self.chat_history, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error saving history: {e}")
-    
     def setup_ui(self):
         """Setup user interface dengan theme magical"""
         # Main container
@@ -168,10 +388,49 @@ class Phi3ChatApp:
                                     text_color=MagicalTheme.TEXT_PRIMARY)
         settings_title.pack(anchor="w", pady=(0, 10))
         
+        # Session selection
+        session_label = ctk.CTkLabel(settings_frame, text="Session:",
+                                   text_color=MagicalTheme.TEXT_SECONDARY)
+        session_label.pack(anchor="w", pady=(5, 0))
+        
+        self.session_var = ctk.StringVar(value=self.sessions.name_for(self.sessions.active))
+        self.session_combo = ctk.CTkComboBox(settings_frame,
+                                           values=self.sessions.names(),
+                                           variable=self.session_var,
+                                           command=self.switch_session,
+                                           fg_color=MagicalTheme.CARD_BG,
+                                           button_color=MagicalTheme.ACCENT_PURPLE,
+                                           border_color=MagicalTheme.ACCENT_PURPLE)
+        self.session_combo.pack(fill="x", pady=2)
+        
+        new_session_btn = ctk.CTkButton(settings_frame, text="➕ New Session",
+                                      command=self.new_session,
+                                      height=28,
+                                      fg_color="transparent",
+                                      border_width=1,
+                                      border_color=MagicalTheme.ACCENT_PURPLE)
+        new_session_btn.pack(fill="x", pady=(2, 0))
+        
+        # Model selection
+        model_label = ctk.CTkLabel(settings_frame, text="Model:",
+                                 text_color=MagicalTheme.TEXT_SECONDARY)
+        model_label.pack(anchor="w", pady=(5, 0))
+        
+        model_names = list(self.model_registry.models) or [ModelRegistry.name_for(self.model_config.model_path)]
+        self.model_var = ctk.StringVar(value=ModelRegistry.name_for(self.model_config.model_path))
+        model_combo = ctk.CTkComboBox(settings_frame,
+                                    values=model_names,
+                                    variable=self.model_var,
+                                    command=self.switch_model,
+                                    fg_color=MagicalTheme.CARD_BG,
+                                    button_color=MagicalTheme.ACCENT_PURPLE,
+                                    border_color=MagicalTheme.ACCENT_PURPLE)
+        model_combo.pack(fill="x", pady=2)
+        
         # Language selection
         lang_label = ctk.CTkLabel(settings_frame, text="Language:",
                                 text_color=MagicalTheme.TEXT_SECONDARY)
-        lang_label.pack(anchor="w", pady=(5, 0))
+        lang_label.pack(anchor="w", pady=(10, 0))
         
         self.lang_var = ctk.StringVar(value=self.app_config.language)
         lang_combo = ctk.CTkComboBox(settings_frame, 
@@ -198,6 +457,38 @@ class Phi3ChatApp:
                                    border_color=MagicalTheme.ACCENT_PURPLE)
         mode_combo.pack(fill="x", pady=2)
         
+        # Memory profile selection (model dimuat ulang dengan n_ctx / KV cache baru)
+        memory_label = ctk.CTkLabel(settings_frame, text="Memory:",
+                                  text_color=MagicalTheme.TEXT_SECONDARY)
+        memory_label.pack(anchor="w", pady=(10, 0))
+        
+        self.memory_var = ctk.StringVar(value=self.model_config.memory_profile)
+        memory_combo = ctk.CTkComboBox(settings_frame,
+                                     values=list(MEMORY_PROFILES),
+                                     variable=self.memory_var,
+                                     command=self.switch_memory_profile,
+                                     fg_color=MagicalTheme.CARD_BG,
+                                     button_color=MagicalTheme.ACCENT_PURPLE,
+                                     border_color=MagicalTheme.ACCENT_PURPLE)
+        memory_combo.pack(fill="x", pady=2)
+        
+        self.memory_info = ctk.CTkLabel(settings_frame,
+                                      text=MEMORY_PROFILES[self.model_config.memory_profile]['description'],
+                                      text_color=MagicalTheme.TEXT_SECONDARY,
+                                      font=ctk.CTkFont(size=10),
+                                      justify="left")
+        self.memory_info.pack(anchor="w")
+        
+        # Opt-in cache jawaban walau sampling tidak deterministik
+        self.cache_var = ctk.BooleanVar(value=self.gen_config.cache_responses)
+        cache_check = ctk.CTkCheckBox(settings_frame, text="Reuse cached answers",
+                                    variable=self.cache_var,
+                                    command=self.update_cache_setting,
+                                    text_color=MagicalTheme.TEXT_SECONDARY,
+                                    fg_color=MagicalTheme.ACCENT_PURPLE,
+                                    hover_color=MagicalTheme.HOVER_PURPLE)
+        cache_check.pack(anchor="w", pady=(10, 0))
+        
         # Quick Presets dengan style card
         presets_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
         presets_frame.pack(pady=15, padx=15, fill="x")
@@ -228,6 +519,15 @@ class Phi3ChatApp:
                                         text_color=MagicalTheme.TEXT_SECONDARY)
         self.settings_info.pack(pady=15, padx=15)
         
+        # Telemetry live: resource proses dan generasi terakhir
+        self.telemetry_info = ctk.CTkLabel(self.sidebar,
+                                         text=f"{format_resource_line(None)}\n{format_generation_line(None)}",
+                                         font=ctk.CTkFont(size=11),
+                                         text_color=MagicalTheme.TEXT_SECONDARY,
+                                         justify="left")
+        self.telemetry_info.pack(pady=(0, 10), padx=15, anchor="w")
+        self.last_generation_metrics = None
+        
         # History section
         history_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
         history_frame.pack(pady=10, padx=15, fill="both", expand=True)
@@ -237,8 +537,27 @@ class Phi3ChatApp:
                                    text_color=MagicalTheme.TEXT_PRIMARY)
         history_title.pack(anchor="w", pady=(0, 8))
         
-        self.history_frame = ctk.CTkScrollableFrame(history_frame, 
-                                                  fg_color=MagicalTheme.CARD_BG)
+        self.search_var = ctk.StringVar()
+        self.search_entry = ctk.CTkEntry(history_frame,
+                                       textvariable=self.search_var,
+                                       placeholder_text="🔍 Search history...",
+                                       fg_color=MagicalTheme.DARK_BG,
+                                       border_color=MagicalTheme.ACCENT_PURPLE,
+                                       text_color=MagicalTheme.TEXT_PRIMARY,
+                                       height=30,
+                                       corner_radius=8)
+        self.search_entry.pack(fill="x", pady=(0, 8))
+        self.search_entry.bind("<KeyRelease>", lambda e: self.schedule_search())
+        self.search_entry.bind("<Escape>", lambda e: self.clear_search())
+        
+        self.history_frame = VirtualHistoryList(history_frame,
+                                                self.chat_history,
+                                                on_select=self.load_chat,
+                                                colors={
+                                                    'bg': MagicalTheme.CARD_BG,
+                                                    'hover': MagicalTheme.HOVER_PURPLE,
+                                                    'text': MagicalTheme.TEXT_SECONDARY
+                                                })
         self.history_frame.pack(fill="both", expand=True)
         
         # Action buttons
@@ -272,6 +591,12 @@ class Phi3ChatApp:
                                          corner_radius=10)
         self.chat_display.pack(fill="both", expand=True, padx=15, pady=15)
         self.chat_display.configure(state="disabled")
+        self.transcript = TranscriptRenderer(
+            self.chat_display,
+            max_lines=self.app_config.transcript_max_lines,
+            chunk_chars=self.app_config.transcript_chunk_chars,
+            banner_color=MagicalTheme.TEXT_SECONDARY
+        )
         
         # Input area dengan style magical
         self.input_frame = ctk.CTkFrame(self.chat_frame, 
@@ -287,6 +612,8 @@ class Phi3ChatApp:
                                      corner_radius=10)
         self.user_input.pack(side="left", fill="x", expand=True, padx=(0, 10))
         self.user_input.bind("<Return>", lambda e: self.send_message())
+        # Shift+Enter: batalkan jawaban yang sedang jalan dan antrian, kirim pesan ini sekarang
+        self.user_input.bind("<Shift-Return>", lambda e: self.send_message(supersede=True))
         
         self.send_btn = ctk.CTkButton(self.input_frame, text="✨ Send", 
                                     command=self.send_message,
@@ -297,6 +624,18 @@ class Phi3ChatApp:
                                     corner_radius=10)
         self.send_btn.pack(side="right")
         
+        self.stop_btn = ctk.CTkButton(self.input_frame, text="⏹ Stop",
+                                    command=self.stop_generation,
+                                    fg_color=MagicalTheme.CARD_BG,
+                                    hover_color=MagicalTheme.HOVER_PURPLE,
+                                    border_color=MagicalTheme.ACCENT_PURPLE,
+                                    border_width=1,
+                                    height=40,
+                                    width=70,
+                                    corner_radius=10,
+                                    state="disabled")
+        self.stop_btn.pack(side="right", padx=(0, 10))
+        
         self.update_history_display()
     
     def update_prompt_settings(self, *args):
@@ -312,6 +651,17 @@ class Phi3ChatApp:
         self.settings_info.configure(
             text=f"✨ {self.app_config.mode.title()} Mode\n🔤 {self.app_config.language.title()}"
         )
+        self.engine.apply_preset(self.app_config.language, self.app_config.mode)
+        
+        # Siapkan prefix baru di background supaya pesan berikutnya langsung cepat
+        if self.engine.llm and not self.is_loading:
+            thread = threading.Thread(target=self.warm_prefix, args=(self.current_system_prompt,))
+            thread.daemon = True
+            thread.start()
+    
+    def update_cache_setting(self):
+        """Toggle opt-in response cache"""
+        self.gen_config.cache_responses = self.cache_var.get()
     
     def apply_preset(self, preset_id):
         """Apply preset configuration"""
@@ -323,16 +673,26 @@ class Phi3ChatApp:
     
     def show_about(self):
         """Show about information"""
-        about_text = """
+        if self.engine.model_info:
+            info = self.engine.model_info.summary()
+            model_text = f"""Model: {info['name']}
+Architecture: {info['architecture']}
+Context: {self.engine.n_ctx()} tokens (trained {info['context_length']})
+Quantization: {info['quantization']}
+Tokenizer: {info['tokenizer']} ({info['vocab_size']} tokens)
+Weights: {info['weights_mb'] / 1024:.2f} GB"""
+        else:
+            model_text = f"""Model: {ModelRegistry.name_for(self.model_config.model_path)}
+Context: {self.model_config.n_ctx} tokens"""
+        
+        about_text = f"""
 ARCANA AI was developed by Al Musawiru.
 
 Version: 1.0
-Model: Phi-3-mini-4k-instruct-q4
-Context: 4K tokens
-Quantization: Q4_0
+{model_text}
 
 Features:
-• Non-streaming responses (Stable)
+• Streaming responses
 • Dark purple magical theme
 • Multiple language support (ID/EN)
 • Coding & general modes
@@ -361,30 +721,68 @@ Thank you for using
         close_btn.pack(pady=10)
     
     def update_history_display(self):
-        """Update history sidebar dengan style magical"""
-        for widget in self.history_frame.winfo_children():
-            widget.destroy()
+        """Update history sidebar (rebind semua baris yang terlihat)"""
+        if self.search_var.get().strip():
+            self.run_search()
+            return
+        self.history_frame.items = self.chat_history
+        self.history_frame.formatter = format_history_preview
+        self.history_frame.on_select = self.load_chat
+        self.history_frame.reset()
+    
+    def open_history_indexes(self):
+        """Bangun index retrieval dan buka index full-text di background"""
+        if self.retriever:
+            start = time.perf_counter()
+            try:
+                added = self.retriever.sync(self.chat_history)
+                print(f"🔎 Retrieval index: {added} entries in {(time.perf_counter() - start) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"⚠️ Retrieval index error: {e}")
+                self.retriever = None
         
-        for i, chat in enumerate(self.chat_history):
-            preview = chat.get('user_message', '')[:25] + "..." if len(chat.get('user_message', '')) > 25 else chat.get('user_message', '')
-            timestamp = chat.get('timestamp', '')[:16]
-            
-            history_btn = ctk.CTkButton(
-                self.history_frame, 
-                text=f"📄 {timestamp}\n{preview}",
-                command=lambda idx=i: self.load_chat(idx),
-                height=50,
-                anchor="w",
-                fg_color=MagicalTheme.CARD_BG,
-                hover_color=MagicalTheme.HOVER_PURPLE,
-                text_color=MagicalTheme.TEXT_SECONDARY,
-                corner_radius=8
-            )
-            history_btn.pack(fill="x", pady=2, padx=5)
+        try:
+            index = HistorySearchIndex(self.sessions.search_index_path(self.sessions.active))
+            start = time.perf_counter()
+            added = index.sync(self.chat_history)
+            print(f"🔍 Search index: {index.indexed_count()} entries "
+                  f"(+{added} in {(time.perf_counter() - start) * 1000:.0f} ms, fts5={index.fts})")
+            previous, self.history_index = self.history_index, index
+            if previous:
+                previous.close()
+        except Exception as e:
+            print(f"⚠️ Search index unavailable: {e}")
+    
+    def schedule_search(self):
+        """Debounce ketikan supaya query hanya jalan saat user berhenti sebentar"""
+        if self.search_timer is not None:
+            self.window.after_cancel(self.search_timer)
+        self.search_timer = self.window.after(150, self.run_search)
+    
+    def clear_search(self):
+        self.search_var.set("")
+        self.run_search()
+    
+    def run_search(self):
+        """Tampilkan hit search di sidebar, query kosong = kembali ke history biasa"""
+        self.search_timer = None
+        query = self.search_var.get().strip()
+        if not query or not self.history_index:
+            self.search_hits = []
+            self.history_frame.items = self.chat_history
+            self.history_frame.formatter = format_history_preview
+            self.history_frame.on_select = self.load_chat
+        else:
+            self.search_hits = self.history_index.search(query)
+            self.history_frame.items = self.search_hits
+            self.history_frame.formatter = format_search_hit
+            self.history_frame.on_select = lambda i: self.load_chat(self.search_hits[i].index)
+        self.history_frame.first = 0
+        self.history_frame.reset()
     
-    def send_message(self):
-        """Send message dengan non-streaming response"""
-        if self.is_loading or not self.llm:
+    def send_message(self, supersede=False):
+        """Masukkan pesan ke antrian generasi, dijawab FIFO setelah pesan sebelumnya selesai"""
+        if self.is_loading or not self.engine.llm:
             self.show_temp_message("🔮 Model is still loading magic...")
             return
             
@@ -392,126 +790,394 @@ Thank you for using
         if not user_text:
             return
         
-        if self.is_generating:
-            self.show_temp_message("⏳ Still generating previous message...")
+        if supersede:
+            self.stop_generation()
+        self.cancel_summary()
+        
+        # Snapshot setting saat pesan dikirim, bukan saat giliran generasinya tiba
+        system_prompt = self.current_system_prompt
+        settings = {
+            'language': self.app_config.language,
+            'mode': self.app_config.mode,
+            'model': ModelRegistry.name_for(self.model_config.model_path)
+        }
+        
+        try:
+            self.engine.submit(
+                lambda llm, job: self.run_generation(llm, job, user_text, system_prompt, settings),
+                on_done=lambda job: self.window.after(0, lambda: self.finalize_response(job, user_text))
+            )
+        except QueueFullError:
+            self.show_temp_message("⏳ Too many messages waiting, please wait for Arcana to catch up...")
             return
         
-        # Disable input selama processing
-        self.user_input.configure(state="disabled")
-        self.send_btn.configure(state="disabled")
-        
-        # Add user message
-        self.chat_display.configure(state="normal")
-        self.chat_display.insert("end", f"👤 You: {user_text}\n\n")
-        self.chat_display.see("end")
-        
-        # Show thinking indicator
-        self.chat_display.insert("end", "🤖 Arcana: Thinking...")
-        self.chat_display.see("end")
-        self.window.update()
-        
-        # Format prompt
-        formatted_prompt = get_chat_prompt(
-            self.current_system_prompt, 
-            user_text, 
-            self.chat_history
+        self.user_input.delete(0, "end")
+        pending = self.engine.queue.pending()
+        if self.is_generating and pending:
+            self.update_status(f"⏳ Queued ({pending} waiting): {user_text[:40]}")
+        self.update_queue_controls()
+    
+    def stop_generation(self):
+        """Hentikan jawaban yang sedang jalan (di antara token) dan buang pesan yang masih antre"""
+        dropped, job = self.engine.cancel_all()
+        if job or dropped:
+            print(f"⏹ Stop: current={'yes' if job else 'no'}, dropped {dropped} queued")
+    
+    def update_queue_controls(self):
+        """Stop hanya aktif selama ada yang sedang dijawab atau antre"""
+        busy = self.is_generating or self.engine.queue.pending() > 0
+        self.stop_btn.configure(state="normal" if busy else "disabled")
+    
+    def begin_response(self, user_text):
+        """Tampilkan pesan user dan indikator Thinking saat gilirannya dimulai"""
+        self.is_generating = True
+        self.update_queue_controls()
+        
+        self.transcript.append(f"👤 You: {user_text}\n\n")
+        self.transcript.end_message()
+        self.transcript.append("🤖 Arcana: Thinking...")
+    
+    def run_generation(self, llm, job, user_text, system_prompt, settings):
+        """Jalankan satu giliran di worker antrian (engine.lock sudah dipegang), return chat entry"""
+        batcher = TextFlushBatcher(
+            self.window.after,
+            lambda text: self.append_stream_text(batcher, text),
+            interval_ms=self.app_config.stream_flush_ms
+        )
+        job.batcher = batcher
+        self.window.after(0, lambda: self.begin_response(user_text))
+        
+        # Prompt dibangun saat giliran tiba supaya jawaban pesan sebelumnya ikut jadi konteks
+        summary, history = "", self.chat_history
+        if self.summarizer:
+            summary, history = self.summarizer.context_for(self.chat_history)
+        retrieved, max_recent = None, None
+        if self.retriever:
+            max_recent = self.app_config.retrieval_recent_turns
+            # Turn yang sudah diringkas tidak perlu diambil ulang utuh
+            covered = len(self.chat_history) - len(history)
+            retrieved = self.retrieve_turns(user_text, max_recent, covered)
+        formatted_prompt = self.engine.build_prompt(
+            user_text,
+            history,
+            system_prompt,
+            summary=summary,
+            retrieved=retrieved,
+            max_recent=max_recent,
+            retrieval_budget=self.app_config.retrieval_budget_tokens
         )
+        if summary:
+            print(f"📝 Summary covers {len(self.chat_history) - len(history)} older turns")
+        
+        # Jawaban dari cache kalau sampling deterministik (atau user opt-in)
+        cache_key = None
+        cached = None
+        if self.gen_config.use_response_cache():
+            cache_key = make_cache_key(formatted_prompt, self.gen_config.get_generation_kwargs(), self.engine.model_id)
+            cached = self.response_cache.get(cache_key)
         
-        def generate_response():
+        # KV-cache hanya berisi turn ini kalau generate() benar-benar jalan; cache hit tidak
+        # menyentuh llm, isinya bisa prompt summarizer atau prefix baru
+        self.kv_owner = None
+        if cached:
+            ai_response = cached['text']
+            metrics = {}
+        else:
+            on_text = batcher.push if self.gen_config.stream else None
+            draft = self.engine.make_draft(settings['language'], settings['mode'])
+            since = time.perf_counter()
+            self.telemetry.set_busy(True)
             try:
-                # NON-STREAMING response
-                response = self.llm(
-                    formatted_prompt,
-                    max_tokens=self.gen_config.max_tokens,
-                    temperature=self.gen_config.temperature,
-                    top_p=self.gen_config.top_p,
-                    stop=self.gen_config.stop_tokens,
-                    stream=False
-                )
-                
-                ai_response = response['choices'][0]['text'].strip()
-                self.window.after(0, lambda: self.finalize_response(user_text, ai_response, None))
-                
-            except Exception as e:
-                error_msg = str(e)
-                self.window.after(0, lambda: self.finalize_response(user_text, None, error_msg))
+                result = self.engine.generate(llm, formatted_prompt, system_prompt,
+                                              on_text=on_text, should_stop=job.cancelled.is_set, draft=draft)
+            finally:
+                self.telemetry.set_busy(False)
+            if cache_key and result.finish_reason in ("stop", "length"):
+                self.response_cache.put(cache_key, {
+                    'text': result.text.strip(),
+                    'finish_reason': result.finish_reason,
+                    'created': datetime.now().isoformat()
+                })
+            ai_response = result.text.strip()
+            metrics = result.to_dict()
+            if batcher.first_flush_at is not None:
+                # Time-to-first-visible-token: dari mulai generasi sampai teks muncul di layar
+                metrics['first_visible_ms'] = round((batcher.first_flush_at - result.started_at) * 1000, 1)
+            speedup = self.engine.decode_speed.speedup()
+            if metrics['speculative'] and speedup:
+                metrics['speculative']['speedup'] = round(speedup, 2)
+            metrics['resources'] = self.telemetry.summarize(since)
+            self.last_generation_metrics = metrics
+            self.metrics_log.write("generation", {**metrics, **settings})
+            self.window.after(0, self.update_telemetry_display)
         
-        thread = threading.Thread(target=generate_response)
-        thread.daemon = True
-        thread.start()
+        # Disimpan di worker (bukan di UI) supaya giliran berikutnya sudah melihat entry ini
+        chat_entry = {
+            'timestamp': datetime.now().isoformat(),
+            'user_message': user_text,
+            'ai_response': ai_response,
+            'settings': settings,
+            'metrics': metrics,
+            'metadata': {
+                'cache_hit': bool(cached),
+                'stopped': job.cancelled.is_set()
+            }
+        }
+        self.chat_history.append(chat_entry)
+        if not cached:
+            self.kv_owner = self.sessions.active
+        return chat_entry
     
-    def finalize_response(self, user_text, ai_response, error):
-        """Finalize non-streaming response"""
-        self.is_generating = False
+    def retrieve_turns(self, user_text, recent_turns, covered=0):
+        """
+        Turn lama paling relevan dengan pesan baru (di luar window terbaru dan di luar
+        `covered` turn pertama yang sudah masuk ringkasan), [(index, chat)]
+        """
+        start = time.perf_counter()
+        self.retriever.sync(self.chat_history)
+        hits = self.retriever.search(
+            user_text,
+            top_k=self.app_config.retrieval_top_k,
+            exclude_from=len(self.chat_history) - recent_turns,
+            exclude_before=covered
+        )
+        if hits:
+            print(f"🔎 Retrieved turns {[index for index, _ in hits]} "
+                  f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return [(index, self.chat_history[index]) for index, _ in hits]
+    
+    def append_stream_text(self, batcher, text):
+        """Tulis potongan teks streaming ke chat_display (dipanggil dari batcher)"""
+        if batcher.flush_count == 1:
+            # Flush pertama: ganti "Thinking..." dengan awal jawaban
+            self.transcript.delete_last_line()
+            self.transcript.append("🤖 Arcana: ")
+            text = text.lstrip()
+        
+        self.transcript.append(text)
+    
+    def finalize_response(self, job, user_text):
+        """Finalize response setelah satu giliran selesai, dibatalkan, atau dibuang dari antrian"""
+        self.is_generating = self.engine.queue.current is not None
+        self.update_queue_controls()
         
-        self.chat_display.configure(state="normal")
+        if job.dropped:
+            # Di status, bukan di transcript, supaya tidak menyela jawaban yang sedang streaming
+            self.update_status(f"🗑️ Dropped queued message: {user_text[:40]}")
+            return
         
-        # Hapus "Thinking..." text
-        self.chat_display.delete("end-1l", "end")
+        # Tulis sisa teks yang belum sempat di-flush
+        batcher = job.batcher
+        batcher.flush()
+        streamed = batcher.flush_count > 0
+        error = job.error
+        chat_entry = job.result
+        if isinstance(error, WorkerCrashedError):
+            # Worker sudah dimuat ulang dengan KV-cache kosong
+            self.kv_owner = None
         
-        if error:
-            self.chat_display.insert("end", f"🤖 Arcana: ❌ Error: {error}\n\n")
+        if streamed:
+            self.transcript.append("\n\n")
+            if error:
+                self.transcript.append(f"🤖 Arcana: ❌ Error: {error}\n\n")
         else:
-            self.chat_display.insert("end", f"🤖 Arcana: {ai_response}\n\n")
+            # Hapus "Thinking..." text
+            self.transcript.delete_last_line()
             
-            # Save ke history
-            chat_entry = {
-                'timestamp': datetime.now().isoformat(),
-                'user_message': user_text,
-                'ai_response': ai_response,
-                'settings': {
-                    'language': self.app_config.language,
-                    'mode': self.app_config.mode
-                }
-            }
-            self.chat_history.append(chat_entry)
-            self.save_history()
-            self.update_history_display()
+            if error:
+                self.transcript.append(f"🤖 Arcana: ❌ Error: {error}\n\n")
+            else:
+                self.transcript.append(f"🤖 Arcana: {chat_entry['ai_response']}\n\n")
         
-        self.chat_display.see("end")
-        self.chat_display.configure(state="disabled")
+        if not error and chat_entry['metadata']['stopped']:
+            self.transcript.append("💡 ⏹ Stopped\n\n")
+        elif not error and chat_entry['metrics'].get('guard'):
+            reason = chat_entry['metrics']['finish_reason'].replace("_", " ")
+            self.transcript.append(f"💡 ✂️ Stopped early: {reason} detected\n\n")
+        self.transcript.end_message()
+        
+        if not error:
+            metrics = chat_entry['metrics']
+            if metrics.get('first_visible_ms') is not None:
+                self.update_status(
+                    f"✨ First token {metrics['first_visible_ms']:.0f} ms · {metrics['tokens_per_second']:.1f} tok/s"
+                )
+            if self.history_index:
+                self.history_index.sync(self.chat_history)
+            if self.search_var.get().strip():
+                self.run_search()
+            else:
+                self.history_frame.append_item()
         
-        # Re-enable input
-        self.user_input.configure(state="normal")
-        self.send_btn.configure(state="normal")
         self.user_input.focus()
-        self.user_input.delete(0, "end")
+        if not error:
+            self.schedule_session_save()
+        self.schedule_summary()
+    
+    def schedule_session_save(self):
+        """
+        Snapshot KV sesi aktif lewat antrian generasi setelah giliran selesai, supaya turn
+        terakhir tidak hilang kalau aplikasi crash. Dilewati kalau masih ada pesan antre
+        (giliran berikutnya yang menyimpan) atau snapshot terakhir belum lewat
+        session_save_interval_s; sisanya tertangkap saat pindah sesi / menutup window.
+        """
+        now = time.perf_counter()
+        if self.engine.queue.busy() or now - self.last_session_save_at < self.app_config.session_save_interval_s:
+            return
+        self.last_session_save_at = now
+        session_id, history = self.sessions.active, self.chat_history
+        
+        def save(llm, job):
+            self.save_session_state(llm, session_id, history)
+        
+        def done(job):
+            if job.error:
+                print(f"⚠️ Session snapshot error: {job.error}")
+        
+        try:
+            self.engine.submit(save, on_done=done)
+        except QueueFullError:
+            pass
+    
+    def schedule_summary(self):
+        """Jadwalkan peringkasan turn lama setelah model idle beberapa saat"""
+        if not self.summarizer:
+            return
+        if self.summary_timer is not None:
+            self.window.after_cancel(self.summary_timer)
+        self.summary_timer = self.window.after(self.app_config.summary_idle_ms, self.start_summary_job)
+    
+    def start_summary_job(self):
+        """Ringkas satu chunk di antrian generasi, dibatalkan begitu user mengirim pesan"""
+        self.summary_timer = None
+        if self.is_loading or not self.engine.llm or self.engine.queue.busy():
+            return
+        if not self.summarizer.needs_update(self.chat_history):
+            return
+        
+        def summarize(llm, job):
+            self.kv_owner = None
+            return self.summarizer.step(llm, self.chat_history, should_stop=job.cancelled.is_set)
+        
+        def done(job):
+            if job.error:
+                print(f"⚠️ Summary error: {job.error}")
+            elif job.result:
+                print(f"📝 Summary updated ({self.summarizer.pending_turns(self.chat_history)} turns pending)")
+                self.window.after(0, self.schedule_summary)
+        
+        try:
+            self.summary_job = self.engine.submit(summarize, on_done=done)
+        except QueueFullError:
+            pass
+    
+    def cancel_summary(self):
+        """Pesan user selalu didahulukan dari peringkasan background"""
+        if self.summary_timer is not None:
+            self.window.after_cancel(self.summary_timer)
+            self.summary_timer = None
+        if self.summary_job is not None and not self.summary_job.done.is_set():
+            self.summary_job.cancelled.set()
+        self.summary_job = None
     
     def show_temp_message(self, message):
         """Tampilkan temporary message"""
-        self.chat_display.configure(state="normal")
-        self.chat_display.insert("end", f"💡 {message}\n\n")
-        self.chat_display.see("end")
-        self.chat_display.configure(state="disabled")
+        self.transcript.append(f"💡 {message}\n\n")
+        self.transcript.end_message()
     
     def load_chat(self, index):
         """Load chat dari history"""
         if 0 <= index < len(self.chat_history):
             chat = self.chat_history[index]
             
-            self.chat_display.configure(state="normal")
-            self.chat_display.delete("1.0", "end")
-            
-            self.chat_display.insert("end", f"👤 You: {chat['user_message']}\n\n")
-            self.chat_display.insert("end", f"🤖 Arcana: {chat['ai_response']}\n\n")
-            
-            self.chat_display.configure(state="disabled")
-            self.chat_display.see("end")
+            self.transcript.clear()
+            self.transcript.append(f"👤 You: {chat['user_message']}\n\n")
+            self.transcript.end_message()
+            self.transcript.append(f"🤖 Arcana: {chat['ai_response']}\n\n")
+            self.transcript.end_message()
+    
+    def new_session(self):
+        """Buat sesi baru dari dialog nama lalu langsung pindah ke sesi itu"""
+        dialog = ctk.CTkInputDialog(text="Session name:", title="New Session")
+        name = dialog.get_input()
+        if not name or not name.strip():
+            return
+        session_id = self.sessions.create(name)
+        self.session_combo.configure(values=self.sessions.names())
+        self.switch_session(self.sessions.name_for(session_id))
+    
+    def switch_session(self, name):
+        """
+        Ganti sesi aktif: history dan transcript langsung diganti di UI thread,
+        snapshot KV sesi lama disimpan dan sesi baru di-restore lewat antrian generasi.
+        """
+        session_id = self.sessions.id_for_name(name)
+        if not session_id or session_id == self.sessions.active:
+            return
+        if self.engine.queue.busy():
+            self.update_status("⏳ Wait for the current answer before switching sessions")
+            self.session_var.set(self.sessions.name_for(self.sessions.active))
+            return
+        
+        self.cancel_summary()
+        previous_id, previous_history = self.sessions.active, self.chat_history
+        self.sessions.set_active(session_id)
+        self.load_history()
+        self.search_var.set("")
+        self.update_history_display()
+        
+        self.transcript.clear()
+        for chat in self.chat_history[-self.app_config.session_resume_turns:]:
+            self.transcript.append(f"👤 You: {chat['user_message']}\n\n")
+            self.transcript.end_message()
+            self.transcript.append(f"🤖 Arcana: {chat['ai_response']}\n\n")
+            self.transcript.end_message()
+        
+        thread = threading.Thread(target=self.open_history_indexes)
+        thread.daemon = True
+        thread.start()
+        
+        def swap(llm, job):
+            self.save_session_state(llm, previous_id, previous_history)
+            return self.restore_session_state(llm, session_id)
+        
+        if self.engine.llm:
+            try:
+                self.engine.submit(swap)
+            except QueueFullError:
+                pass
+        self.update_status(f"📂 Session: {name}")
+        print(f"📂 Switched session to {name} ({len(self.chat_history)} turns)")
+    
+    def on_close(self):
+        """Simpan snapshot KV sesi aktif sebelum window ditutup"""
+        self.cancel_summary()
+        self.engine.cancel_all()
+        if self.engine.llm:
+            try:
+                with self.engine.lock:
+                    self.save_session_state(self.engine.llm, self.sessions.active, self.chat_history)
+            except Exception as e:
+                print(f"⚠️ Session snapshot error: {e}")
+        self.engine.shutdown()
+        self.window.destroy()
     
     def clear_history(self):
         """Clear chat history"""
-        self.chat_history = []
-        self.save_history()
+        self.cancel_summary()
+        self.chat_history.clear()
+        self.session_states.drop(self.sessions.active)
+        if self.history_index:
+            self.history_index.clear()
+        self.search_var.set("")
         self.update_history_display()
-        
-        self.chat_display.configure(state="normal")
-        self.chat_display.delete("1.0", "end")
-        self.chat_display.configure(state="disabled")
+        self.transcript.clear()
     
     def run(self):
         """Run aplikasi"""
         self.window.mainloop()
 
 if __name__ == "__main__":
-    app = Phi3ChatApp()
+    multiprocessing.freeze_support()  # Worker inferensi di build PyInstaller
+    app = Phi3ChatApp(startup_t0=STARTUP_T0)
     app.run()
\ No newline at end of file
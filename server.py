@@ -0,0 +1,259 @@
+"""
+Headless server OpenAI-compatible untuk Arcana AI - /v1/completions dan /v1/chat/completions
+
+Usage: python server.py --port 8765
+"""
+
+import argparse
+import json
+import os
+import queue
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config.settings import ModelConfig, GenerationConfig, AppConfig
+from config.prompts import get_messages_prompt, get_active_preset
+from core.streaming import stream_generate
+from core.model_loader import load_llama
+from core.hardware import AutoTuner
+from core.prefix_cache import PrefixStateCache, kv_config_tag
+from core.memory_profile import resolve_memory_profile
+from core.context_packer import ContextPacker, make_token_counter
+from core.inference_queue import InferenceQueue, QueueFullError
+
+
+class ArcanaServer(ThreadingHTTPServer):
+    """HTTP server yang memegang model, antrian inferensi, dan cache prefix"""
+    daemon_threads = True
+
+    def __init__(self, address, llm, model_config, app_config, queue_size=8):
+        super().__init__(address, ArcanaRequestHandler)
+        self.llm = llm
+        self.model_config = model_config
+        self.app_config = app_config
+        self.model_name = os.path.splitext(os.path.basename(model_config.model_path))[0]
+        self.inference = InferenceQueue(llm, maxsize=queue_size)
+        self.packer = ContextPacker(make_token_counter(llm), model_config.n_ctx)
+        self.prefix_cache = None
+        if app_config.use_prefix_cache:
+            self.prefix_cache = PrefixStateCache(
+                app_config.cache_dir,
+                model_config.model_path,
+                config_tag=kv_config_tag(model_config, llm.n_ctx())
+            )
+
+
+class ArcanaRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ArcanaAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message, error_type):
+        self.send_json(status, {'error': {'message': message, 'type': error_type}})
+
+    def do_GET(self):
+        if self.path == "/v1/models":
+            self.send_json(200, {
+                'object': "list",
+                'data': [{'id': self.server.model_name, 'object': "model", 'owned_by': "local"}]
+            })
+        elif self.path == "/health":
+            self.send_json(200, {'status': "ok", 'queue_pending': self.server.inference.pending()})
+        else:
+            self.send_error_json(404, f"Unknown path {self.path}", "not_found")
+
+    def do_POST(self):
+        if self.path not in ("/v1/completions", "/v1/chat/completions"):
+            self.send_error_json(404, f"Unknown path {self.path}", "not_found")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self.send_error_json(400, f"Invalid JSON: {e}", "invalid_request_error")
+            return
+
+        try:
+            self.handle_completion(body, chat=self.path == "/v1/chat/completions")
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_error_json(400, str(e), "invalid_request_error")
+
+    def handle_completion(self, body, chat):
+        server = self.server
+        gen_config = GenerationConfig()
+        language = body.get('language', server.app_config.language)
+        mode = body.get('mode', server.app_config.mode)
+        # Tanpa max_tokens di request, batas per mode dari preset supaya worst-case latency terprediksi
+        preset = get_active_preset(language, mode) or {}
+        gen_config.max_tokens = preset.get("max_tokens", gen_config.max_tokens)
+        gen_config.apply_request_params(body)
+
+        if chat:
+            system_prompt, prompt = get_messages_prompt(
+                body['messages'],
+                language,
+                mode,
+                server.packer,
+                gen_config.max_tokens
+            )
+        else:
+            system_prompt = None
+            prompt = body['prompt']
+            if isinstance(prompt, list):
+                prompt = prompt[0]
+
+        chunks = queue.Queue()
+
+        def work(llm, job):
+            if system_prompt and server.prefix_cache:
+                server.prefix_cache.prepare(llm, system_prompt)
+            return stream_generate(
+                llm, prompt, gen_config,
+                on_text=chunks.put if gen_config.stream else None,
+                should_stop=job.cancelled.is_set
+            )
+
+        try:
+            job = server.inference.submit(work)
+        except QueueFullError as e:
+            self.send_error_json(503, str(e), "server_busy")
+            return
+
+        request_id = ("chatcmpl-" if chat else "cmpl-") + uuid.uuid4().hex[:24]
+        if gen_config.stream:
+            self.stream_response(job, chunks, request_id, chat)
+        else:
+            self.full_response(job, request_id, chat)
+        print(f"⚡ {self.path} wait {job.queue_wait_ms:.0f} ms, generation {job.generation_ms:.0f} ms")
+
+    def build_payload(self, request_id, chat, text, finish_reason, delta=False):
+        if chat:
+            choice = {'index': 0, 'finish_reason': finish_reason}
+            if delta:
+                choice['delta'] = {'content': text} if text else {}
+            else:
+                choice['message'] = {'role': "assistant", 'content': text}
+            obj = "chat.completion.chunk" if delta else "chat.completion"
+        else:
+            choice = {'index': 0, 'text': text, 'logprobs': None, 'finish_reason': finish_reason}
+            obj = "text_completion"
+        return {
+            'id': request_id,
+            'object': obj,
+            'created': int(time.time()),
+            'model': self.server.model_name,
+            'choices': [choice]
+        }
+
+    def usage_and_timings(self, job, result):
+        timings = job.timings()
+        timings.update({
+            'first_token_ms': result.to_dict()['first_token_ms'],
+            'tokens_per_second': result.to_dict()['tokens_per_second']
+        })
+        usage = {
+            'prompt_tokens': result.prompt_tokens,
+            'completion_tokens': result.completion_tokens,
+            'total_tokens': result.prompt_tokens + result.completion_tokens
+        }
+        return usage, timings
+
+    def full_response(self, job, request_id, chat):
+        try:
+            result = job.wait()
+        except Exception as e:
+            self.send_error_json(500, str(e), "server_error")
+            return
+        usage, timings = self.usage_and_timings(job, result)
+        payload = self.build_payload(request_id, chat, result.text.strip(), result.finish_reason)
+        payload['usage'] = usage
+        payload['timings'] = timings
+        self.send_json(200, payload, headers={
+            'X-Queue-Wait-Ms': f"{timings['queue_wait_ms']:.1f}",
+            'X-Generation-Ms': f"{timings['generation_ms']:.1f}"
+        })
+
+    def write_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def stream_response(self, job, chunks, request_id, chat):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        try:
+            if chat:
+                first = self.build_payload(request_id, chat, None, None, delta=True)
+                first['choices'][0]['delta'] = {'role': "assistant"}
+                self.write_event(first)
+
+            while not (job.done.is_set() and chunks.empty()):
+                try:
+                    text = chunks.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                self.write_event(self.build_payload(request_id, chat, text, None, delta=True))
+
+            if job.error:
+                self.write_event({'error': {'message': str(job.error), 'type': "server_error"}})
+            else:
+                final = self.build_payload(request_id, chat, "", job.result.finish_reason, delta=True)
+                final['usage'], final['timings'] = self.usage_and_timings(job, job.result)
+                self.write_event(final)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client putus - hentikan decoding supaya CPU langsung bebas
+            job.cancelled.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arcana AI headless OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Maksimum request yang menunggu sebelum dibalas 503")
+    parser.add_argument("--memory-profile", default=AppConfig().memory_profile,
+                        help="Profil memori (performance, standard, 8gb, 4gb, auto)")
+    args = parser.parse_args()
+
+    model_config = ModelConfig()
+    app_config = AppConfig()
+    print(f"🧠 Memory profile: {model_config.apply_memory_profile(resolve_memory_profile(args.memory_profile))}")
+
+    auto_tuner = None
+    if app_config.auto_tune:
+        auto_tuner = AutoTuner(app_config.cache_dir, model_config)
+        print(f"🔧 Hardware profile: {auto_tuner.probe()}")
+
+    print("🔮 Loading magical model...")
+    llm = load_llama(model_config)
+    if auto_tuner and auto_tuner.needs_calibration():
+        print("🔧 Calibrating for this machine...")
+        auto_tuner.finish(llm)
+    server = ArcanaServer((args.host, args.port), llm, model_config, app_config, queue_size=args.queue_size)
+    print(f"✨ Arcana server ready on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
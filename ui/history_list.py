@@ -0,0 +1,156 @@
+"""
+Virtualized history sidebar - widget hanya dibuat untuk baris yang terlihat lalu dipakai ulang saat scroll
+"""
+
+import customtkinter as ctk
+
+
+def format_history_preview(chat):
+    """Teks tombol history: timestamp + 25 karakter pertama pesan user"""
+    user_message = chat.get('user_message', '')
+    preview = user_message[:25] + "..." if len(user_message) > 25 else user_message
+    timestamp = chat.get('timestamp', '')[:16]
+    return f"📄 {timestamp}\n{preview}"
+
+
+def format_search_hit(hit):
+    """Teks tombol hasil search: timestamp + potongan teks yang cocok"""
+    snippet = " ".join(hit.snippet.split())
+    snippet = snippet[:60] + "..." if len(snippet) > 60 else snippet
+    return f"🔍 {hit.timestamp[:16]}\n{snippet}"
+
+
+class VirtualHistoryList(ctk.CTkFrame):
+    """
+    List history tervirtualisasi. `items` cukup Sequence (list atau HistoryStore),
+    jumlah CTkButton = jumlah baris yang muat di viewport + 1.
+    formatter mengubah satu item jadi teks tombol (default preview entry history).
+    """
+    def __init__(self, master, items, on_select, colors, row_height=54, formatter=format_history_preview, **kwargs):
+        super().__init__(master, fg_color=colors['bg'], **kwargs)
+        self.items = items
+        self.on_select = on_select
+        self.formatter = formatter
+        self.colors = colors
+        self.row_height = row_height
+        self.first = 0
+        self._rows = []
+        self._row_index = []
+        self._visible_rows = 1
+
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.pack(side="left", fill="both", expand=True)
+        # Ukuran viewport tidak boleh ikut membesar karena jumlah tombol di dalamnya
+        self.viewport.pack_propagate(False)
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.viewport.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.viewport)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", lambda e: self.scroll_rows(-1), add="+")
+        widget.bind("<Button-5>", lambda e: self.scroll_rows(1), add="+")
+
+    def _make_row(self):
+        btn = ctk.CTkButton(
+            self.viewport,
+            text="",
+            height=self.row_height - 4,
+            anchor="w",
+            fg_color=self.colors['bg'],
+            hover_color=self.colors['hover'],
+            text_color=self.colors['text'],
+            corner_radius=8
+        )
+        self._bind_wheel(btn)
+        return btn
+
+    def _on_resize(self, event):
+        self._visible_rows = max(1, event.height // self.row_height)
+        needed = self._visible_rows + 1
+        while len(self._rows) < needed:
+            self._rows.append(self._make_row())
+            self._row_index.append(None)
+        self.first = min(self.first, self.max_first())
+        self.refresh()
+
+    def _on_wheel(self, event):
+        self.scroll_rows(-1 if event.delta > 0 else 1)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.first = int(round(float(args[1]) * len(self.items)))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self._visible_rows
+            self.first += step
+        self.first = max(0, min(self.first, self.max_first()))
+        self.refresh()
+
+    def max_first(self):
+        return max(0, len(self.items) - self._visible_rows)
+
+    def scroll_rows(self, step):
+        first = max(0, min(self.first + step, self.max_first()))
+        if first != self.first:
+            self.first = first
+            self.refresh()
+
+    def at_end(self):
+        return self.first >= self.max_first() - 1
+
+    def refresh(self):
+        """Ikat ulang tombol pool ke index yang terlihat, hanya yang berubah"""
+        total = len(self.items)
+        for slot, btn in enumerate(self._rows):
+            index = self.first + slot
+            if index >= total:
+                if self._row_index[slot] is not None:
+                    btn.pack_forget()
+                    self._row_index[slot] = None
+                continue
+            if self._row_index[slot] != index:
+                btn.configure(
+                    text=self.formatter(self.items[index]),
+                    command=lambda idx=index: self.on_select(idx)
+                )
+                if self._row_index[slot] is None:
+                    # Slot kosong selalu di ekor pool, jadi urutan pack tetap benar
+                    btn.pack(fill="x", pady=2, padx=5)
+                self._row_index[slot] = index
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.items)
+        if total == 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        start = self.first / total
+        end = min(1.0, (self.first + self._visible_rows) / total)
+        self.scrollbar.set(start, end)
+
+    def append_item(self):
+        """Dipanggil setelah satu entry ditambah ke items - hanya satu baris yang di-bind"""
+        follow = self.at_end()
+        if follow:
+            self.first = self.max_first()
+        visible_end = self.first + len(self._rows)
+        if len(self.items) - 1 < visible_end or follow:
+            self.refresh()
+        else:
+            self._update_scrollbar()
+
+    def reset(self):
+        """Bind ulang semua baris (misalnya setelah clear history)"""
+        self.first = min(self.first, self.max_first())
+        self._row_index = [None] * len(self._rows)
+        for btn in self._rows:
+            btn.pack_forget()
+        self.refresh()
+
+    def rows_created(self):
+        return len(self._rows)
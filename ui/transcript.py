@@ -0,0 +1,177 @@
+"""
+Transcript chat_display - jumlah baris live dibatasi, pesan lama dipangkas tapi bisa dimuat ulang,
+teks panjang disisipkan per potongan di idle callback supaya mainloop tetap responsif
+"""
+
+import time
+from collections import deque
+
+BANNER_TAG = "transcript_banner"
+
+
+class TranscriptRenderer:
+    """
+    Semua perubahan chat_display lewat sini. Operasi dijalankan berurutan lewat antrian:
+    langsung kalau antrian kosong dan teksnya pendek, sisanya satu potongan per after_idle.
+
+    Pesan = blok teks yang ditutup end_message(). Kalau baris live lewat max_lines,
+    pesan tertua dipindah ke `trimmed` dan banner di baris pertama menawarkan memuatnya lagi.
+    Selama pesan yang dimuat ulang masih dibaca (user belum kembali ke bawah), pemangkasan
+    ditunda supaya pesan itu tidak langsung dipangkas lagi oleh jawaban berikutnya.
+    """
+    def __init__(self, textbox, max_lines=2000, chunk_chars=2000, banner_color="#B0B0B0"):
+        self.textbox = textbox
+        self.max_lines = max_lines
+        self.chunk_chars = chunk_chars
+        self.trimmed = []
+        self.stats = {'ops': 0, 'chunks': 0, 'max_op_ms': 0.0, 'trimmed_messages': 0}
+        self._ops = deque()
+        self._scheduled = False
+        self._line_counts = deque()
+        self._start_line = 1
+        self._banner = False
+        self._hold_trim = False  # True setelah reload_earlier sampai user kembali ke bawah
+
+        self.textbox.tag_config(BANNER_TAG, foreground=banner_color)
+        self.textbox.tag_bind(BANNER_TAG, "<Button-1>", lambda e: self.reload_earlier())
+
+    # --- API publik, dipanggil di UI thread ---
+
+    def append(self, text):
+        """Tambahkan teks di akhir pesan yang sedang terbuka"""
+        for start in range(0, len(text), self.chunk_chars):
+            self._ops.append(("insert", text[start:start + self.chunk_chars]))
+        self._pump()
+
+    def delete_last_line(self):
+        """Hapus baris terakhir (misalnya indikator Thinking...)"""
+        self._ops.append(("delete_last_line", None))
+        self._pump()
+
+    def end_message(self):
+        """Tutup pesan yang sedang terbuka, lalu pangkas pesan tertua kalau lewat batas"""
+        self._ops.append(("end_message", None))
+        self._pump()
+
+    def clear(self):
+        """Kosongkan transcript termasuk operasi yang belum sempat jalan"""
+        self._ops.clear()
+        self._line_counts.clear()
+        self.trimmed = []
+        self._banner = False
+        self._hold_trim = False
+        self._edit(lambda: self.textbox.delete("1.0", "end"))
+        self._start_line = 1
+
+    def pending(self):
+        return len(self._ops)
+
+    def live_lines(self):
+        return self._line_number("end-1c") - (1 if self._banner else 0)
+
+    def reload_earlier(self, count=10):
+        """Muat ulang `count` pesan terakhir yang dipangkas ke atas transcript"""
+        if not self.trimmed:
+            return
+        restored = self.trimmed[-count:]
+        del self.trimmed[-count:]
+        text = "".join(restored)
+
+        def restore():
+            line = 2 if self._banner else 1
+            self.textbox.insert(f"{line}.0", text)
+            for message in reversed(restored):
+                self._line_counts.appendleft(message.count("\n"))
+            self._start_line += text.count("\n")
+            self._hold_trim = True
+            self._update_banner()
+        self._edit(restore)
+        self.textbox.see("1.0")
+
+    # --- Internal ---
+
+    def _line_number(self, index):
+        return int(self.textbox.index(index).split(".")[0])
+
+    def _edit(self, fn):
+        self.textbox.configure(state="normal")
+        try:
+            fn()
+        finally:
+            self.textbox.configure(state="disabled")
+
+    def _pump(self):
+        """Jalankan operasi pertama sekarang, sisanya dijadwalkan per idle callback"""
+        if not self._scheduled and self._ops:
+            self._run_next()
+
+    def _run_next(self):
+        self._scheduled = False
+        if not self._ops:
+            return
+        start = time.perf_counter()
+        follow = self._at_bottom()
+        if follow:
+            # User sudah kembali ke bawah: pesan yang dimuat ulang boleh dipangkas lagi
+            self._hold_trim = False
+
+        def run():
+            # Operasi kecil berurutan digabung, berhenti setelah satu potongan teks penuh
+            budget = self.chunk_chars
+            while self._ops and budget > 0:
+                op, arg = self._ops.popleft()
+                if op == "insert":
+                    self.textbox.insert("end", arg)
+                    budget -= max(1, len(arg))
+                    self.stats['chunks'] += 1
+                elif op == "delete_last_line":
+                    self.textbox.delete("end-1l", "end")
+                elif op == "end_message":
+                    self._close_message()
+                self.stats['ops'] += 1
+        self._edit(run)
+
+        if follow:
+            self.textbox.see("end")
+        self.stats['max_op_ms'] = max(self.stats['max_op_ms'], (time.perf_counter() - start) * 1000)
+
+        if self._ops:
+            self._scheduled = True
+            self.textbox.after_idle(self._run_next)
+
+    def _at_bottom(self):
+        try:
+            return self.textbox.yview()[1] >= 0.999
+        except Exception:
+            return True
+
+    def _close_message(self):
+        end_line = self._line_number("end-1c")
+        self._line_counts.append(end_line - self._start_line)
+        self._start_line = end_line
+        self._trim()
+
+    def _trim(self):
+        """Pindahkan pesan tertua ke `trimmed` sampai baris live di bawah max_lines"""
+        if self._hold_trim:
+            return
+        removed = 0
+        while self._line_counts and self.live_lines() > self.max_lines and len(self._line_counts) > 1:
+            count = self._line_counts.popleft()
+            first = 2 if self._banner else 1
+            self.trimmed.append(self.textbox.get(f"{first}.0", f"{first + count}.0"))
+            self.textbox.delete(f"{first}.0", f"{first + count}.0")
+            self._start_line -= count
+            removed += 1
+            self._update_banner()
+        self.stats['trimmed_messages'] += removed
+
+    def _update_banner(self):
+        if self._banner:
+            self.textbox.delete("1.0", "2.0")
+            self._start_line -= 1
+            self._banner = False
+        if self.trimmed:
+            self.textbox.insert("1.0", f"⬆ {len(self.trimmed)} earlier messages hidden · click to show\n", BANNER_TAG)
+            self._start_line += 1
+            self._banner = True